@@ -1,44 +1,11 @@
 import os
 import json
-from langchain_groq import ChatGroq
-from langchain_core.messages import HumanMessage, SystemMessage
+import threading
+from collections import OrderedDict
+from agent.llm import get_client, run_sync, llm_stats
 
 
-def run_agent(signals: dict) -> dict:
-    """Takes all analysis signals and uses Groq LLM to synthesize a final verdict."""
-    # FIX: typos in key names were causing silent 50.0 defaults
-    efficientnet_score = signals.get("efficientnet_score", 50)
-    clip_score         = signals.get("clip_score", 50)
-    freq_score         = signals.get("freq_score", 50)
-    ensemble_score     = signals.get("ensemble_score", 50)
-    exif               = signals.get("exif", {})
-    search_results     = signals.get("search_results", [])
-    filename           = signals.get("filename", "unknown")
-
-    # EXIF summary — differentiate between "expected no EXIF" (webp/png from web)
-    # vs genuinely suspicious stripping on camera-format files
-    stripped = exif.get("stripped", True)
-    stripped_expected = exif.get("stripped_expected", False)
-    if not stripped:
-        exif_summary = (
-            f"EXIF intact — camera: {exif.get('camera')}, "
-            f"software: {exif.get('software')}, date: {exif.get('date_taken')}"
-        )
-    elif stripped_expected:
-        exif_summary = (
-            "No EXIF metadata — expected for this file format (WebP/PNG from web). "
-            "Not a manipulation signal on its own."
-        )
-    else:
-        exif_summary = "EXIF metadata completely stripped — moderate manipulation signal"
-
-    search_summary = (
-        f"{len(search_results)} web sources found matching this image"
-        if search_results
-        else "No matching sources found on the web"
-    )
-
-    system_prompt = """You are TruthLens, a media forensics AI agent specialized in detecting AI-generated and manipulated images.
+SIGNAL_GUIDE = """You are TruthLens, a media forensics AI agent specialized in detecting AI-generated and manipulated images.
 
 SIGNAL INTERPRETATION GUIDE:
 - CNN Score (Swin detector): trained on a fixed dataset of known AI generators.
@@ -64,8 +31,9 @@ DECISION RULES (apply in order, first match wins):
 7.  NEVER let a lone CNN spike override clear agreement from CLIP + frequency
 8.  False positives on real people are worse than false negatives — err toward INCONCLUSIVE when unsure
 
+"""
 
-Respond ONLY with a valid JSON object in this exact format:
+VERDICT_FORMAT = """
 {
   "verdict": "LIKELY AI GENERATED" | "LIKELY REAL" | "INCONCLUSIVE",
   "confidence": <integer 0-100>,
@@ -78,8 +46,71 @@ Respond ONLY with a valid JSON object in this exact format:
   ]
 }"""
 
+SYSTEM_PROMPT = SIGNAL_GUIDE + """
+Respond ONLY with a valid JSON object in this exact format:""" + VERDICT_FORMAT
+
+# Several images per request: the guide once, one verdict object per image
+BATCH_SYSTEM_PROMPT = SIGNAL_GUIDE + """
+You will receive signals for several images, each under an "IMAGE <id>" header.
+Judge every image independently, applying the rules above to its own signals only.
+Respond ONLY with a valid JSON array holding one object per image, in the order given,
+each with the image's integer "id" plus the fields of this format:""" + VERDICT_FORMAT
+
+
+def _read_signals(signals: dict) -> tuple:
+    # FIX: typos in key names were causing silent 50.0 defaults
+    efficientnet_score = signals.get("efficientnet_score", 50)
+    clip_score         = signals.get("clip_score", 50)
+    freq_score         = signals.get("freq_score", 50)
+    ensemble_score     = signals.get("ensemble_score", 50)
+    exif               = signals.get("exif", {})
+    search_results     = signals.get("search_results", [])
+
+    # EXIF summary — differentiate between "expected no EXIF" (webp/png from web)
+    # vs genuinely suspicious stripping on camera-format files
+    stripped = exif.get("stripped", True)
+    stripped_expected = exif.get("stripped_expected", False)
+    if not stripped:
+        exif_summary = (
+            f"EXIF intact — camera: {exif.get('camera')}, "
+            f"software: {exif.get('software')}, date: {exif.get('date_taken')}"
+        )
+    elif stripped_expected:
+        exif_summary = (
+            "No EXIF metadata — expected for this file format (WebP/PNG from web). "
+            "Not a manipulation signal on its own."
+        )
+    else:
+        exif_summary = "EXIF metadata completely stripped — moderate manipulation signal"
+
+    search_summary = (
+        f"{len(search_results)} web sources found matching this image"
+        if search_results
+        else "No matching sources found on the web"
+    )
+    return efficientnet_score, clip_score, freq_score, ensemble_score, exif_summary, search_summary
+
+
+def _video_summary(signals: dict) -> str:
+    """Temporal context for a video's scores — empty for still images."""
+    video = signals.get("video")
+    if not video:
+        return ""
+    return (
+        f"Scores above are the most suspicious {video['window_frames']}-frame window "
+        f"(t={video['window_start']:.1f}–{video['window_end']:.1f}s) of {video['frames']} sampled frames; "
+        f"whole-clip mean ensemble {video['mean_ensemble']:.1f}%; "
+        f"{video['suspicious_share']:.0%} of frames flagged suspicious. "
+        "A high window over a low mean points to a manipulated segment, not a fully generated clip."
+    )
+
 
-    user_prompt = f"""Analyze the following signals for image: {filename}
+def build_user_prompt(signals: dict) -> str:
+    efficientnet_score, clip_score, freq_score, ensemble_score, exif_summary, search_summary = _read_signals(signals)
+    filename = signals.get("filename", "unknown")
+    video_summary = _video_summary(signals)
+    video_block = f"\nSIGNAL 7 — Video Timeline: {video_summary}\n" if video_summary else ""
+    return f"""Analyze the following signals for image: {filename}
 
 SIGNAL 1 — EfficientNet CNN Score: {efficientnet_score:.1f}%
 (Visual artifact detector — 0% = real, 100% = AI-generated)
@@ -96,39 +127,324 @@ SIGNAL 4 — Weighted Ensemble Score: {ensemble_score:.1f}%
 SIGNAL 5 — EXIF Metadata: {exif_summary}
 
 SIGNAL 6 — Reverse Image Search: {search_summary}
-
+{video_block}
 Reason through signal agreements and conflicts, then produce your verdict JSON."""
 
-    try:
-        llm = ChatGroq(
-            model="llama-3.3-70b-versatile",
-            temperature=0.1,
-            api_key=os.getenv("GROQ_API_KEY"),
+
+def build_batch_prompt(signals_list: list) -> str:
+    """One compact signal block per image — the guide explains each signal once, in the system prompt."""
+    blocks = []
+    for i, signals in enumerate(signals_list, start=1):
+        efficientnet_score, clip_score, freq_score, ensemble_score, exif_summary, search_summary = _read_signals(signals)
+        blocks.append(
+            f"IMAGE {i}: {signals.get('filename', 'unknown')}\n"
+            f"CNN: {efficientnet_score:.1f}% | CLIP: {clip_score:.1f}% | "
+            f"Frequency: {freq_score:.1f}% | Ensemble: {ensemble_score:.1f}%\n"
+            f"EXIF: {exif_summary}\n"
+            f"Reverse search: {search_summary}" +
+            (f"\nVideo: {_video_summary(signals)}" if signals.get("video") else "")
         )
+    return (f"Analyze the following {len(signals_list)} images.\n\n" + "\n\n".join(blocks) +
+            f"\n\nReturn the JSON array of {len(signals_list)} verdicts, ids 1-{len(signals_list)}.")
 
-        messages = [
-            SystemMessage(content=system_prompt),
-            HumanMessage(content=user_prompt),
-        ]
 
-        response = llm.invoke(messages)
-        content = response.content.strip()
+VERDICT_FIELDS = {"verdict", "confidence", "summary", "reasoning"}
+
+
+def _strip_fences(content: str) -> str:
+    content = content.strip()
+    # Strip markdown code fences if present
+    if content.startswith("```"):
+        content = content.split("```")[1]
+        if content.startswith("json"):
+            content = content[4:]
+    return content.strip()
+
+
+def parse_verdict(content: str) -> dict:
+    """The verdict JSON from an LLM reply; raises ValueError if it isn't one."""
+    verdict = json.loads(_strip_fences(content))
+    if not isinstance(verdict, dict) or not VERDICT_FIELDS <= verdict.keys():
+        raise ValueError("verdict JSON is missing fields")
+    return verdict
+
+
+def parse_verdicts(content: str, count: int) -> list:
+    """
+    `count` verdicts from a batched reply, matched to images by "id" (or by
+    position when ids are missing). Malformed, duplicate or missing entries
+    come back as None; raises ValueError only if the reply isn't a JSON array.
+    """
+    items = json.loads(_strip_fences(content))
+    if isinstance(items, dict) and isinstance(items.get("verdicts"), list):
+        items = items["verdicts"]   # {"verdicts": [...]} wrapper
+    if not isinstance(items, list):
+        raise ValueError("batched verdicts are not a JSON array")
+
+    verdicts = [None] * count
+    for position, item in enumerate(items):
+        if not isinstance(item, dict) or not VERDICT_FIELDS <= item.keys():
+            continue
+        index = item.get("id", position + 1)
+        index = index - 1 if isinstance(index, int) else -1
+        if 0 <= index < count and verdicts[index] is None:
+            verdicts[index] = {key: value for key, value in item.items() if key != "id"}
+    return verdicts
+
+
+class VerdictStream:
+    """
+    Follows a verdict JSON while the LLM is still writing it. feed() takes the
+    next chunk of raw text and returns what is new in the "summary" string and
+    in each "reasoning" entry:
+
+        [{"field": "summary", "text": "..."}, {"field": "reasoning", "index": 0, "text": "..."}]
+
+    Unfinished strings are read up to the last complete character, so every
+    delta is final text — deltas concatenated per field rebuild the values.
+    """
+
+    def __init__(self):
+        self.text = ""
+        self._sent = {}
+
+    def feed(self, chunk: str) -> list:
+        self.text += chunk
+        deltas = []
+        summary = _partial_field(self.text, "summary")
+        if summary:
+            deltas += self._delta(("summary", None), summary[0])
+        for index, step in enumerate(_partial_field(self.text, "reasoning", array=True)):
+            deltas += self._delta(("reasoning", index), step)
+        return deltas
+
+    def _delta(self, slot: tuple, value: str) -> list:
+        sent = self._sent.get(slot, 0)
+        if len(value) <= sent:
+            return []
+        self._sent[slot] = len(value)
+        field, index = slot
+        delta = {"field": field, "text": value[sent:]}
+        if index is not None:
+            delta["index"] = index
+        return [delta]
+
+
+_WHITESPACE = " \t\r\n"
+
+
+def _partial_field(text: str, name: str, array: bool = False) -> list:
+    """The string value(s) of "name" so far — a one-item list, or every array item when array=True."""
+    key = text.find(f'"{name}"')
+    if key < 0:
+        return []
+    i = text.find(":", key) + 1
+    if i == 0:
+        return []
+    while i < len(text) and text[i] in _WHITESPACE:
+        i += 1
+    if array:
+        if i >= len(text) or text[i] != "[":
+            return []
+        i += 1
+    values = []
+    while i < len(text):
+        while i < len(text) and text[i] in _WHITESPACE + ",":
+            i += 1
+        if i >= len(text) or text[i] != '"':
+            break   # end of the array, or not a string
+        value, i, closed = _partial_string(text, i + 1)
+        values.append(value)
+        if not closed or not array:
+            break
+    return values
+
+
+def _partial_string(text: str, start: int) -> tuple:
+    """Decodes the JSON string starting after its opening quote: (value, end index, closed)."""
+    i = start
+    while i < len(text):
+        if text[i] == "\\":
+            i += 2
+        elif text[i] == '"':
+            return json.loads(text[start - 1:i + 1]), i + 1, True
+        else:
+            i += 1
+    # Unterminated — decode what's there, minus a trailing half-written escape
+    raw = text[start:]
+    for cut in range(len(raw), max(len(raw) - 6, -1), -1):
+        try:
+            value = json.loads(f'"{raw[:cut]}"')
+        except ValueError:
+            continue
+        # A \uD83D high surrogate waits for its low half — the pair is one character
+        if value and "\ud800" <= value[-1] <= "\udbff":
+            value = value[:-1]
+        return value, len(text), False
+    return "", len(text), False
+
+
+class VerdictCache:
+    """
+    LRU of LLM verdicts keyed on everything the prompt shows the LLM: the
+    signal vector rounded to `step` points, the EXIF, reverse-search and
+    video timeline summaries, and the filename — the summary and reasoning
+    that come back name the image, so they are never served for another
+    one. Fallback verdicts are never stored.
+    """
+
+    def __init__(self, max_entries: int = 1024, step: float = 1.0):
+        self.max_entries = max_entries
+        self.step = step
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+
+    def key(self, signals: dict) -> tuple:
+        *scores, exif_summary, search_summary = _read_signals(signals)
+        step = self.step or 1.0
+        return (tuple(round(score / step) for score in scores) +
+                (exif_summary, search_summary, _video_summary(signals), signals.get("filename", "unknown")))
+
+    def get(self, key: tuple):
+        if self.max_entries <= 0:
+            return None
+        with self._lock:
+            verdict = self._entries.get(key)
+            if verdict is None:
+                self._misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self._hits += 1
+        # Callers may modify their verdict — hand out copies
+        return {**verdict, "reasoning": list(verdict["reasoning"])}
+
+    def put(self, key: tuple, verdict: dict):
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[key] = {**verdict, "reasoning": list(verdict["reasoning"])}
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_rate": round(self._hits / lookups, 3) if lookups else 0.0,
+            }
+
 
-        # Strip markdown code fences if present
-        if content.startswith("```"):
-            content = content.split("```")[1]
-            if content.startswith("json"):
-                content = content[4:]
+verdict_cache = VerdictCache(
+    max_entries=int(os.getenv("TRUTHLENS_AGENT_CACHE_SIZE", "1024")),
+    step=float(os.getenv("TRUTHLENS_AGENT_CACHE_STEP", "1")),
+)
 
-        return json.loads(content.strip())
 
-    except json.JSONDecodeError as e:
+async def run_agent(signals: dict, on_delta=None) -> dict:
+    """
+    Takes all analysis signals and uses the LLM to synthesize a final verdict.
+    With `on_delta` (an async callback), the completion is streamed and each
+    VerdictStream delta of the summary / reasoning text is passed to it as it
+    arrives; the returned verdict is still the fully parsed one.
+    """
+    key = verdict_cache.key(signals)
+    cached = verdict_cache.get(key)
+    if cached is not None:
+        return cached
+    return await _ask(signals, key, on_delta)
+
+
+async def _complete(messages: list, on_delta) -> str:
+    if on_delta is None:
+        return await get_client().chat(messages)
+    stream = VerdictStream()
+    async for chunk in get_client().stream(messages):
+        for delta in stream.feed(chunk):
+            await on_delta(delta)
+    return stream.text
+
+
+async def _ask(signals: dict, key: tuple, on_delta=None) -> dict:
+    ensemble_score = signals.get("ensemble_score", 50)
+    messages = [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "user", "content": build_user_prompt(signals)},
+    ]
+    try:
+        verdict = parse_verdict(await _complete(messages, on_delta))
+    except ValueError as e:   # includes json.JSONDecodeError
         print(f"[TruthLens] Agent JSON parse error: {e}")
         return fallback_verdict(ensemble_score)
     except Exception as e:
         print(f"[TruthLens] Agent error: {e}")
         return fallback_verdict(ensemble_score)
 
+    verdict_cache.put(key, verdict)
+    return verdict
+
+
+async def run_agent_batch(signals_list: list) -> list:
+    """
+    Verdicts for several jobs from one LLM request — the system prompt is sent
+    once and the reply is a JSON array mapped back to each job by id. Cached
+    signal vectors skip the request; any verdict the reply lacks or garbles
+    falls back to fallback_verdict for that job alone. Suitable as an async
+    MicroBatcher batch_fn.
+    """
+    keys = [verdict_cache.key(signals) for signals in signals_list]
+    verdicts = [verdict_cache.get(key) for key in keys]
+    missing = [i for i, verdict in enumerate(verdicts) if verdict is None]
+    if len(missing) == 1:
+        # Nothing to share — the single-image prompt is the better one
+        i = missing[0]
+        verdicts[i] = await _ask(signals_list[i], keys[i])
+    elif missing:
+        messages = [
+            {"role": "system", "content": BATCH_SYSTEM_PROMPT},
+            {"role": "user", "content": build_batch_prompt([signals_list[i] for i in missing])},
+        ]
+        try:
+            parsed = parse_verdicts(await get_client().chat(messages), len(missing))
+        except ValueError as e:   # includes json.JSONDecodeError
+            print(f"[TruthLens] Agent batch JSON parse error: {e}")
+            parsed = [None] * len(missing)
+        except Exception as e:
+            print(f"[TruthLens] Agent batch error: {e}")
+            parsed = [None] * len(missing)
+
+        fallbacks = 0
+        for i, verdict in zip(missing, parsed):
+            if verdict is None:
+                fallbacks += 1
+                verdicts[i] = fallback_verdict(signals_list[i].get("ensemble_score", 50))
+            else:
+                verdict_cache.put(keys[i], verdict)
+                verdicts[i] = verdict
+        if fallbacks:
+            print(f"[TruthLens] Agent batch: {fallbacks}/{len(missing)} verdicts fell back to rules")
+    return verdicts
+
+
+def run_agent_batch_sync(signals_list: list) -> list:
+    """Blocking run_agent_batch, for callers without an event loop (the bulk CLI)."""
+    return run_sync(run_agent_batch(signals_list))
+
+
+def run_agent_sync(signals: dict) -> dict:
+    """Blocking run_agent, for callers without an event loop (the bulk CLI)."""
+    return run_sync(run_agent(signals))
+
+
+def agent_stats() -> dict:
+    return {"llm": llm_stats(), "cache": verdict_cache.stats()}
+
 
 def fallback_verdict(ensemble_score: float) -> dict:
     if ensemble_score > 65:
@@ -152,3 +468,40 @@ def fallback_verdict(ensemble_score: float) -> dict:
             "Note: LLM agent unavailable, fallback used",
         ],
     }
+
+
+# Decision rules 1a/1b of the agent prompt. When either matches, the LLM is bound
+# to the same verdict, so the fast path can answer without calling it.
+CLIP_STRONG_AI   = 80
+CLIP_STRONG_REAL = 35
+FREQ_CLEAN       = 30
+
+
+def rule_verdict(clip_score: float, freq_score: float, ensemble_score: float) -> dict:
+    """Verdict from the decisive rules alone, or None when the signals need the agent."""
+    if clip_score > CLIP_STRONG_AI:
+        verdict = "LIKELY AI GENERATED"
+        confidence = round(clip_score)
+        rule = f"Rule 1a: CLIP {clip_score:.0f}% > {CLIP_STRONG_AI}% → likely AI generated, whatever the CNN says"
+    elif clip_score < CLIP_STRONG_REAL and freq_score < FREQ_CLEAN:
+        verdict = "LIKELY REAL"
+        confidence = round(100 - max(clip_score, freq_score))
+        rule = (f"Rule 1b: CLIP {clip_score:.0f}% < {CLIP_STRONG_REAL}% and frequency "
+                f"{freq_score:.0f}% < {FREQ_CLEAN}% → likely real, whatever the CNN says")
+    else:
+        return None
+
+    return {
+        "verdict": verdict,
+        "confidence": confidence,
+        "summary": (
+            f"CLIP ({clip_score:.0f}%) and frequency ({freq_score:.0f}%) signals are decisive: "
+            f"{verdict.lower()}. Rule-based verdict; ensemble score {ensemble_score:.0f}%."
+        ),
+        "reasoning": [
+            f"CLIP: {clip_score:.0f}% | Frequency: {freq_score:.0f}% | Ensemble: {ensemble_score:.0f}%",
+            rule,
+            f"Final verdict: {verdict}",
+            "Note: decided by rule without the LLM agent",
+        ],
+    }
@@ -0,0 +1,211 @@
+import asyncio
+import json
+import os
+import random
+import threading
+import weakref
+import httpx
+
+# Any OpenAI-compatible chat completions endpoint — Groq by default; point it at a
+# local stand-in (llama.cpp server, vLLM, Ollama, ...) for testing.
+BASE_URL        = os.getenv("TRUTHLENS_LLM_BASE_URL", "https://api.groq.com/openai/v1")
+MODEL           = os.getenv("TRUTHLENS_LLM_MODEL", "llama-3.3-70b-versatile")
+# Deadline for one chat() call, retries and backoff included
+TIMEOUT         = float(os.getenv("TRUTHLENS_LLM_TIMEOUT", "20"))
+RETRIES         = int(os.getenv("TRUTHLENS_LLM_RETRIES", "2"))
+BACKOFF         = float(os.getenv("TRUTHLENS_LLM_BACKOFF", "0.5"))
+MAX_CONNECTIONS = int(os.getenv("TRUTHLENS_LLM_CONNECTIONS", "16"))
+
+# Rate limits, timeouts and server-side failures are worth another attempt;
+# anything else (bad key, bad request) fails the same way every time
+RETRY_STATUS = {408, 409, 429, 500, 502, 503, 504}
+
+
+class LLMError(Exception):
+    """The LLM could not produce a completion within the call's deadline."""
+
+
+class LLMClient:
+    """
+    Long-lived async chat-completions client. One pooled httpx connection set is
+    reused across calls; each call has a deadline that covers its retries, and
+    retryable failures back off exponentially (with jitter, or as long as the
+    server's Retry-After asks) while time remains.
+
+    httpx clients are bound to the event loop they first run on — use
+    get_client() rather than sharing one instance across loops.
+    """
+
+    def __init__(self, base_url: str = BASE_URL, model: str = MODEL, api_key: str = None,
+                 timeout: float = TIMEOUT, retries: int = RETRIES, backoff: float = BACKOFF,
+                 max_connections: int = MAX_CONNECTIONS, transport: httpx.AsyncBaseTransport = None):
+        self.model = model
+        self.timeout = timeout
+        self.retries = max(0, retries)
+        self.backoff = backoff
+        api_key = api_key if api_key is not None else os.getenv("GROQ_API_KEY", "")
+        self._http = httpx.AsyncClient(
+            base_url=base_url.rstrip("/"),
+            headers={"Authorization": f"Bearer {api_key}"} if api_key else {},
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+            timeout=timeout,
+            transport=transport,
+        )
+        self._calls = 0
+        self._retried = 0
+        self._failures = 0
+
+    async def chat(self, messages: list, temperature: float = 0.1, timeout: float = None) -> str:
+        """Content of the first completion choice; raises LLMError once the deadline or retries run out."""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + (timeout or self.timeout)
+        payload = {"model": self.model, "messages": messages, "temperature": temperature}
+        self._calls += 1
+
+        error = None
+        for attempt in range(self.retries + 1):
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            retry_after = None
+            try:
+                response = await self._http.post("/chat/completions", json=payload, timeout=remaining)
+            except httpx.TransportError as e:   # connect / read failures and timeouts
+                error = e
+            else:
+                if response.is_success:
+                    return response.json()["choices"][0]["message"]["content"]
+                error = LLMError(f"HTTP {response.status_code}: {response.text[:200]}")
+                if response.status_code not in RETRY_STATUS:
+                    break
+                retry_after = _retry_after(response)
+
+            if not await self._wait_to_retry(attempt, retry_after, deadline):
+                break
+
+        self._failures += 1
+        raise LLMError(f"LLM call failed: {error or 'deadline exceeded'}") from error
+
+    async def stream(self, messages: list, temperature: float = 0.1, timeout: float = None):
+        """
+        Async iterator over the content deltas of a streamed completion
+        (OpenAI-style server-sent events). Failures are retried like chat()
+        only until the first delta — once text has been yielded, an error
+        raises LLMError.
+        """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + (timeout or self.timeout)
+        payload = {"model": self.model, "messages": messages, "temperature": temperature, "stream": True}
+        self._calls += 1
+
+        error, started = None, False
+        for attempt in range(self.retries + 1):
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            retry_after = None
+            try:
+                async with self._http.stream("POST", "/chat/completions", json=payload, timeout=remaining) as response:
+                    if response.is_success:
+                        async for line in response.aiter_lines():
+                            if not line.startswith("data:"):
+                                continue
+                            data = line[5:].strip()
+                            if data == "[DONE]":
+                                return
+                            choices = json.loads(data).get("choices") or [{}]
+                            delta = (choices[0].get("delta") or {}).get("content")
+                            if delta:
+                                started = True
+                                yield delta
+                            if loop.time() > deadline:
+                                raise LLMError("LLM stream exceeded its deadline")
+                        return
+                    await response.aread()
+                    error = LLMError(f"HTTP {response.status_code}: {response.text[:200]}")
+                    if response.status_code not in RETRY_STATUS:
+                        break
+                    retry_after = _retry_after(response)
+            except httpx.TransportError as e:
+                if started:
+                    self._failures += 1
+                    raise LLMError(f"LLM stream broke off: {e}") from e
+                error = e
+            except LLMError:
+                self._failures += 1
+                raise
+
+            if not await self._wait_to_retry(attempt, retry_after, deadline):
+                break
+
+        self._failures += 1
+        raise LLMError(f"LLM call failed: {error or 'deadline exceeded'}") from error
+
+    async def _wait_to_retry(self, attempt: int, retry_after: float, deadline: float) -> bool:
+        """Sleeps out the backoff before another attempt; False when none is left in the budget."""
+        delay = retry_after if retry_after is not None else self.backoff * 2 ** attempt * random.uniform(0.5, 1.0)
+        if attempt == self.retries or asyncio.get_running_loop().time() + delay >= deadline:
+            return False
+        self._retried += 1
+        await asyncio.sleep(delay)
+        return True
+
+    async def aclose(self):
+        await self._http.aclose()
+
+    def stats(self) -> dict:
+        return {"calls": self._calls, "retries": self._retried, "failures": self._failures}
+
+
+def _retry_after(response) -> float:
+    try:
+        return float(response.headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+# ── Per-loop clients ──────────────────────────────────────────────────────────
+
+_clients = weakref.WeakKeyDictionary()
+_clients_lock = threading.Lock()
+_sync_loop = None
+
+
+def get_client() -> LLMClient:
+    """The shared client for the running event loop, created on first use."""
+    loop = asyncio.get_running_loop()
+    with _clients_lock:
+        client = _clients.get(loop)
+        if client is None:
+            client = _clients[loop] = LLMClient()
+        return client
+
+
+async def close_client():
+    with _clients_lock:
+        client = _clients.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.aclose()
+
+
+def run_sync(coro):
+    """
+    Runs a coroutine from synchronous code (the bulk CLI) on one background
+    loop per process, so blocking callers still share a pooled client.
+    """
+    global _sync_loop
+    with _clients_lock:
+        if _sync_loop is None:
+            _sync_loop = asyncio.new_event_loop()
+            threading.Thread(target=_sync_loop.run_forever, name="truthlens-llm", daemon=True).start()
+    return asyncio.run_coroutine_threadsafe(coro, _sync_loop).result()
+
+
+def llm_stats() -> dict:
+    with _clients_lock:
+        clients = list(_clients.values())
+    totals = {"calls": 0, "retries": 0, "failures": 0}
+    for client in clients:
+        for key, value in client.stats().items():
+            totals[key] += value
+    return totals
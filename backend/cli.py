@@ -0,0 +1,242 @@
+"""
+Offline bulk scanner — runs the TruthLens analysis stages over a directory tree
+or a tar/zip archive without FastAPI or WebSockets.
+
+    python cli.py scan /data/archive --out results.jsonl --workers 4 --no-agent --no-reverse-search
+    python cli.py scan images.tar.gz --out results.jsonl --format parquet
+
+The JSONL output doubles as the resume journal: re-running the same command
+skips every path already analysed and retries the ones that errored, so an
+interrupted backfill picks up where it stopped. Set TRUTHLENS_STAGE_CACHE_DB
+to also reuse per-stage outputs across runs (e.g. re-scoring an archive after
+a CLIP prompt change).
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from tools.archive import is_archive, is_image_name, iter_archive_images
+
+# Flat column set for the Parquet export — nested fields are stored as JSON strings
+PARQUET_COLUMNS = [
+    "path", "status", "error", "verdict", "confidence", "efficientnet_score",
+    "clip_score", "ml_score", "frequency_score", "summary", "agent_reasoning",
+    "reverse_search", "heatmap", "fast_path", "faces", "primary_face",
+]
+
+
+# ── Input discovery ───────────────────────────────────────────────────────────
+
+def iter_inputs(source: str):
+    """
+    Yields (key, data) — `key` is the file path (or archive!member) recorded in
+    the output; `data` is the image bytes for archive members, or None for
+    plain files (read inside the worker to keep IPC small).
+    """
+    if os.path.isdir(source):
+        for root, dirs, files in os.walk(source):
+            dirs.sort()
+            for name in sorted(files):
+                if is_image_name(name):
+                    yield os.path.join(root, name), None
+    elif is_archive(source):
+        for member, data in iter_archive_images(source, max_files=sys.maxsize, max_bytes=sys.maxsize):
+            yield f"{source}!{member}", data
+    else:
+        yield source, None
+
+
+def load_journal(path: str) -> set:
+    """
+    Keys a previous run finished. Error rows (model server down, a transient
+    failure) are left out so those paths are retried. A torn final line (the
+    process was killed mid-write) is cut off so appends start on a clean line.
+    """
+    done = set()
+    if not os.path.exists(path):
+        return done
+    with open(path, "rb+") as f:
+        raw = f.read()
+        complete = raw.rfind(b"\n") + 1
+        if complete < len(raw):
+            f.truncate(complete)
+    for line in raw[:complete].splitlines():
+        try:
+            row = json.loads(line)
+            if row["status"] == "done":
+                done.add(row["path"])
+        except (ValueError, KeyError):
+            continue
+    return done
+
+
+# ── Worker side ───────────────────────────────────────────────────────────────
+
+_options = {}
+
+
+def _init_worker(options: dict):
+    # Imported here so each worker process loads its own models once
+    global _options
+    _options = options
+    import pipeline  # noqa: F401
+
+
+def _analyze_chunk(chunk: list) -> list:
+    from pipeline import analyze_images
+    from models.decoded_image import DecodedImage
+
+    rows, images, names, keys = [], [], [], []
+    for key, data in chunk:
+        try:
+            if data is None:
+                with open(key, "rb") as f:
+                    data = f.read()
+            image = DecodedImage(data)
+            image.rgb   # surface undecodable files here, per image
+            images.append(image)
+            names.append(os.path.basename(key.split("!")[-1]))
+            keys.append(key)
+        except Exception as e:
+            rows.append({"path": key, "status": "error", "error": str(e)})
+
+    if images:
+        try:
+            results = analyze_images(
+                images, names,
+                use_agent=_options["agent"],
+                use_reverse_search=_options["reverse_search"],
+                use_heatmap=_options["heatmap"],
+            )
+            rows.extend({"path": key, "status": "done", **result} for key, result in zip(keys, results))
+        except Exception as e:
+            rows.extend({"path": key, "status": "error", "error": str(e)} for key in keys)
+    return rows
+
+
+# ── Driver ────────────────────────────────────────────────────────────────────
+
+def _chunks(items, size: int):
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def export_parquet(journal: str, target: str):
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise SystemExit("[TruthLens] --format parquet needs pyarrow (pip install pyarrow)")
+
+    # A retried path appears once per attempt — its latest row wins
+    rows = {}
+    with open(journal) as f:
+        for line in f:
+            row = json.loads(line)
+            rows.pop(row["path"], None)
+            rows[row["path"]] = row
+
+    columns = {name: [] for name in PARQUET_COLUMNS}
+    for row in rows.values():
+        for name in PARQUET_COLUMNS:
+            value = row.get(name)
+            if isinstance(value, (list, dict)):
+                value = json.dumps(value)
+            columns[name].append(value)
+    pq.write_table(pa.table(columns), target)
+    print(f"[TruthLens] Wrote {target}")
+
+
+def scan(args):
+    done = load_journal(args.out)
+    if done:
+        print(f"[TruthLens] Resuming — {len(done)} images already in {args.out}")
+
+    pending = ((key, data) for key, data in iter_inputs(args.source) if key not in done)
+    options = {
+        "agent": not args.no_agent,
+        "reverse_search": not args.no_reverse_search,
+        "heatmap": args.heatmap,
+    }
+
+    processed = 0
+    started = time.perf_counter()
+    last_report = started
+    # spawn: forked children inherit a half-initialised CUDA/torch runtime otherwise
+    context = multiprocessing.get_context("spawn")
+    with open(args.out, "a") as out, ProcessPoolExecutor(
+        max_workers=args.workers, mp_context=context,
+        initializer=_init_worker, initargs=(options,),
+    ) as pool:
+        chunks = _chunks(pending, args.chunk_size)
+        in_flight = set()
+
+        def fill():
+            # Bounded look-ahead — never materialise millions of pending futures
+            while len(in_flight) < args.workers * 2:
+                chunk = next(chunks, None)
+                if chunk is None:
+                    return
+                in_flight.add(pool.submit(_analyze_chunk, chunk))
+
+        fill()
+        while in_flight:
+            finished, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in finished:
+                in_flight.discard(future)
+                for row in future.result():
+                    out.write(json.dumps(row) + "\n")
+                    processed += 1
+                out.flush()
+            fill()
+
+            now = time.perf_counter()
+            if now - last_report >= args.report_every:
+                last_report = now
+                print(f"[TruthLens] {processed} images — {processed / (now - started):.1f} img/s")
+
+    elapsed = time.perf_counter() - started
+    rate = processed / elapsed if elapsed > 0 else 0.0
+    print(f"[TruthLens] Done: {processed} images in {elapsed:.1f}s ({rate:.1f} img/s)")
+
+    if args.format == "parquet":
+        export_parquet(args.out, os.path.splitext(args.out)[0] + ".parquet")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="truthlens", description="TruthLens offline bulk analysis")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("scan", help="Analyze every image in a directory tree or tar/zip archive")
+    p.add_argument("source", help="directory, tar(.gz/.bz2/.xz) or zip archive, or a single image")
+    p.add_argument("--out", default="results.jsonl", help="JSONL output / resume journal")
+    p.add_argument("--format", choices=["jsonl", "parquet"], default="jsonl",
+                   help="parquet also exports <out>.parquet once the scan finishes")
+    p.add_argument("--workers", type=int, default=1, help="worker processes (each loads the models)")
+    p.add_argument("--chunk-size", type=int, default=8,
+                   help="images per worker task — detector/CLIP run one batch per chunk")
+    p.add_argument("--no-agent", action="store_true", help="rule-based verdict instead of the LLM")
+    p.add_argument("--no-reverse-search", action="store_true", help="skip DuckDuckGo lookups")
+    p.add_argument("--heatmap", action="store_true", help="include Grad-CAM heatmaps (large output)")
+    p.add_argument("--report-every", type=float, default=10.0, help="seconds between progress lines")
+    p.set_defaults(func=scan)
+
+    args = parser.parse_args(argv)
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,22 @@
+# Ensemble weights and scoring, kept free of model imports so tools like
+# quantize_report.py can score without loading the pipeline.
+
+# Weight rationale:
+# CLIP gets the highest weight because its zero-shot semantic approach generalizes
+# to new AI generators (Nano Banana, Kling, MiniMax etc.) that the CNN hasn't seen.
+# The Swin CNN was trained on a fixed dataset — it reliably catches known generators
+# but can miss newer ones. Frequency analysis is physics-based and always valid.
+WEIGHTS = {
+    "efficientnet": 0.20,   # Swin CNN — unreliable alone; false positives AND false negatives observed
+    "clip":         0.55,   # CLIP zero-shot — most reliable; correct on both test cases
+    "frequency":    0.25,   # DCT/FFT — physics-based, model-agnostic
+}
+
+
+def compute_ensemble(efficientnet_score: float, clip_score: float, freq_score: float) -> float:
+    return round(
+        efficientnet_score * WEIGHTS["efficientnet"] +
+        clip_score         * WEIGHTS["clip"] +
+        freq_score         * WEIGHTS["frequency"],
+        2
+    )
@@ -0,0 +1,261 @@
+"""
+ONNX export, parity check and CPU benchmark for the detector and CLIP towers.
+
+    python export.py onnx                       # writes onnx_models/{detector,clip_vision,clip_text}.onnx
+    python export.py check --images samples/    # eager vs ONNX outputs and scores
+    python export.py bench --batch-sizes 1,8 --threads 8
+
+Serve the exported artifacts with TRUTHLENS_BACKEND=onnx (see models/runtime.py).
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+import numpy as np
+import torch
+from dotenv import load_dotenv
+from PIL import Image
+
+load_dotenv()
+
+from transformers import AutoImageProcessor, AutoModelForImageClassification, CLIPModel, CLIPProcessor
+from models import runtime
+from models.clip_classifier import MODEL_ID as CLIP_MODEL_ID, REAL_PROMPTS, FAKE_PROMPTS, _embeds
+from models.decoded_image import DecodedImage
+from models.efficientnet import MODEL_ID as DETECTOR_MODEL_ID
+from tools.archive import is_image_name
+
+OPSET = 17
+
+
+# ── Export wrappers — plain tensor in, tensor out ─────────────────────────────
+
+class DetectorLogits(torch.nn.Module):
+    def __init__(self, model):
+        super().__init__()
+        self.model = model
+
+    def forward(self, pixel_values):
+        return self.model(pixel_values=pixel_values).logits
+
+
+class ClipVision(torch.nn.Module):
+    def __init__(self, model):
+        super().__init__()
+        self.model = model
+
+    def forward(self, pixel_values):
+        return _embeds(self.model.get_image_features(pixel_values=pixel_values))
+
+
+class ClipText(torch.nn.Module):
+    # logit_scale rides along so the ONNX backend needs no PyTorch weights at all
+    def __init__(self, model):
+        super().__init__()
+        self.model = model
+
+    def forward(self, input_ids, attention_mask):
+        features = _embeds(self.model.get_text_features(input_ids=input_ids, attention_mask=attention_mask))
+        return features, self.model.logit_scale.exp()
+
+
+# ── Helpers ───────────────────────────────────────────────────────────────────
+
+def load_eager():
+    """FP32 CPU models — the reference the ONNX artifacts are exported from and checked against."""
+    runtime.configure_torch_threads()
+    detector = AutoModelForImageClassification.from_pretrained(DETECTOR_MODEL_ID).eval()
+    clip = CLIPModel.from_pretrained(CLIP_MODEL_ID).eval()
+    return {
+        "detector": detector,
+        "detector_processor": AutoImageProcessor.from_pretrained(DETECTOR_MODEL_ID),
+        "clip": clip,
+        "clip_processor": CLIPProcessor.from_pretrained(CLIP_MODEL_ID),
+    }
+
+
+def sample_images(directory: str = None, count: int = 8) -> list:
+    """Up to `count` RGB images from `directory`, topped up with synthetic ones."""
+    images = []
+    if directory:
+        for root, dirs, files in os.walk(directory):
+            dirs.sort()
+            for name in sorted(files):
+                if len(images) < count and is_image_name(name):
+                    with open(os.path.join(root, name), "rb") as f:
+                        images.append(DecodedImage(f.read()).rgb)
+    rng = np.random.default_rng(0)
+    while len(images) < count:
+        ramp = np.linspace(0, 255, 320, dtype=np.float32)
+        pixels = ramp[None, :, None] * rng.uniform(0.3, 1.0, size=(1, 1, 3)) + rng.normal(0, 20, (240, 320, 3))
+        images.append(Image.fromarray(np.clip(pixels, 0, 255).astype(np.uint8)))
+    return images
+
+
+def _export(module, inputs: tuple, path: str, input_names: list, output_names: list, dynamic_axes: dict):
+    with torch.no_grad():
+        torch.onnx.export(
+            module, inputs, path,
+            input_names=input_names, output_names=output_names,
+            dynamic_axes=dynamic_axes, opset_version=OPSET,
+            dynamo=False,   # TorchScript-based exporter — handles the HF models' dynamic batch axis
+        )
+    print(f"[TruthLens] Wrote {path} ({os.path.getsize(path) / 2**20:.0f}MB)")
+
+
+def _fake_scores(logits: torch.Tensor, fake_idx: int) -> np.ndarray:
+    return (torch.softmax(logits.float(), dim=1)[:, fake_idx] * 100).numpy()
+
+
+def _clip_scores(image_features: torch.Tensor, text_features: torch.Tensor, scale: float) -> np.ndarray:
+    # Mirrors clip_classifier.run_clip_batch
+    image_features = image_features / image_features.norm(dim=-1, keepdim=True)
+    text_features = text_features / text_features.norm(dim=-1, keepdim=True)
+    probs = torch.softmax(scale * image_features @ text_features.t(), dim=1)
+    n_real = len(REAL_PROMPTS)
+    real, fake = probs[:, :n_real].mean(dim=1), probs[:, n_real:].mean(dim=1)
+    return (fake / (real + fake + 1e-8) * 100).numpy()
+
+
+def _fake_idx(detector) -> int:
+    return next((int(i) for i, lbl in detector.config.id2label.items() if "artificial" in lbl.lower()), 0)
+
+
+def _cosine(a: torch.Tensor, b: torch.Tensor) -> float:
+    return float(torch.nn.functional.cosine_similarity(a.float(), b.float(), dim=-1).min())
+
+
+# ── Commands ──────────────────────────────────────────────────────────────────
+
+def export_onnx(args):
+    os.makedirs(runtime.ONNX_DIR, exist_ok=True)
+    eager = load_eager()
+    images = sample_images(count=2)
+
+    pixels = eager["detector_processor"](images=images, return_tensors="pt")["pixel_values"]
+    _export(DetectorLogits(eager["detector"]), (pixels,), runtime.artifact_path("detector"),
+            ["pixel_values"], ["logits"],
+            {"pixel_values": {0: "batch"}, "logits": {0: "batch"}})
+
+    pixels = eager["clip_processor"](images=images, return_tensors="pt")["pixel_values"]
+    _export(ClipVision(eager["clip"]), (pixels,), runtime.artifact_path("clip_vision"),
+            ["pixel_values"], ["image_embeds"],
+            {"pixel_values": {0: "batch"}, "image_embeds": {0: "batch"}})
+
+    text = eager["clip_processor"](text=REAL_PROMPTS + FAKE_PROMPTS, return_tensors="pt", padding=True)
+    _export(ClipText(eager["clip"]), (text["input_ids"], text["attention_mask"]),
+            runtime.artifact_path("clip_text"),
+            ["input_ids", "attention_mask"], ["text_embeds", "logit_scale"],
+            {"input_ids": {0: "batch", 1: "sequence"}, "attention_mask": {0: "batch", 1: "sequence"},
+             "text_embeds": {0: "batch"}})
+
+
+def check(args):
+    """Eager FP32 vs ONNX on the same preprocessed inputs. Exits 1 past --tolerance score points."""
+    eager = load_eager()
+    images = sample_images(args.images, args.samples)
+    detector_session = runtime.load_session("detector")
+    vision_session = runtime.load_session("clip_vision")
+    text_session = runtime.load_session("clip_text")
+
+    pixels = eager["detector_processor"](images=images, return_tensors="pt")["pixel_values"]
+    with torch.no_grad():
+        eager_logits = eager["detector"](pixel_values=pixels).logits
+    onnx_logits = torch.from_numpy(detector_session.run(["logits"], {"pixel_values": pixels.numpy()})[0])
+    fake_idx = _fake_idx(eager["detector"])
+    detector_drift = np.abs(_fake_scores(eager_logits, fake_idx) - _fake_scores(onnx_logits, fake_idx))
+
+    text = eager["clip_processor"](text=REAL_PROMPTS + FAKE_PROMPTS, return_tensors="pt", padding=True)
+    pixels = eager["clip_processor"](images=images, return_tensors="pt")["pixel_values"]
+    with torch.no_grad():
+        eager_image = _embeds(eager["clip"].get_image_features(pixel_values=pixels))
+        eager_text = _embeds(eager["clip"].get_text_features(**text))
+        eager_scale = eager["clip"].logit_scale.exp().item()
+    onnx_image = torch.from_numpy(vision_session.run(["image_embeds"], {"pixel_values": pixels.numpy()})[0])
+    onnx_text, onnx_scale = text_session.run(["text_embeds", "logit_scale"], {
+        "input_ids": text["input_ids"].numpy(), "attention_mask": text["attention_mask"].numpy()})
+    onnx_text = torch.from_numpy(onnx_text)
+    clip_drift = np.abs(_clip_scores(eager_image, eager_text, eager_scale)
+                        - _clip_scores(onnx_image, onnx_text, float(onnx_scale)))
+
+    print(f"[TruthLens] Parity on {len(images)} images (scores are 0-100):")
+    print(f"  detector  max |Δlogit| {float((eager_logits - onnx_logits).abs().max()):.5f}"
+          f"  max |Δscore| {detector_drift.max():.4f}")
+    print(f"  clip      min cos(image) {_cosine(eager_image, onnx_image):.6f}"
+          f"  min cos(text) {_cosine(eager_text, onnx_text):.6f}"
+          f"  max |Δscore| {clip_drift.max():.4f}")
+
+    worst = max(detector_drift.max(), clip_drift.max())
+    if worst > args.tolerance:
+        print(f"[TruthLens] FAIL — score drift {worst:.4f} exceeds tolerance {args.tolerance}")
+        sys.exit(1)
+    print("[TruthLens] OK ✓")
+
+
+def _time(fn, runs: int) -> float:
+    fn()   # warm-up: allocator, kernel selection, ORT graph init
+    timings = []
+    for _ in range(runs):
+        t0 = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - t0)
+    return statistics.median(timings) * 1000
+
+
+def bench(args):
+    """Median model latency (preprocessing excluded) per batch size, eager FP32 vs ONNX Runtime."""
+    eager = load_eager()
+    detector_session = runtime.load_session("detector")
+    vision_session = runtime.load_session("clip_vision")
+    batch_sizes = [int(b) for b in args.batch_sizes.split(",")]
+    images = sample_images(args.images, max(batch_sizes))
+
+    print(f"[TruthLens] {torch.get_num_threads()} torch threads, "
+          f"{runtime.INTRA_OP_THREADS or 'default'} ORT threads, median of {args.runs} runs")
+    print(f"  {'model':<8} {'batch':>5} {'eager ms':>10} {'onnx ms':>10} {'speedup':>8}")
+    for name, processor, eager_fn, session, input_name in (
+        ("detector", eager["detector_processor"],
+         lambda px: eager["detector"](pixel_values=px), detector_session, "pixel_values"),
+        ("clip", eager["clip_processor"],
+         lambda px: eager["clip"].get_image_features(pixel_values=px), vision_session, "pixel_values"),
+    ):
+        for size in batch_sizes:
+            pixels = processor(images=images[:size], return_tensors="pt")["pixel_values"]
+            feed = {input_name: pixels.numpy()}
+            with torch.no_grad():
+                eager_ms = _time(lambda: eager_fn(pixels), args.runs)
+            onnx_ms = _time(lambda: session.run(None, feed), args.runs)
+            print(f"  {name:<8} {size:>5} {eager_ms:>10.1f} {onnx_ms:>10.1f} {eager_ms / onnx_ms:>7.2f}x")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="truthlens-export", description="TruthLens ONNX export tools")
+    parser.add_argument("--dir", default=runtime.ONNX_DIR, help="artifact directory (TRUTHLENS_ONNX_DIR)")
+    parser.add_argument("--threads", type=int, default=runtime.INTRA_OP_THREADS,
+                        help="intra-op threads for torch and ONNX Runtime (0 = default)")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("onnx", help="Export detector, CLIP vision and CLIP text towers to ONNX")
+    p.set_defaults(func=export_onnx)
+
+    p = sub.add_parser("check", help="Compare ONNX outputs against the eager FP32 models")
+    p.add_argument("--images", help="directory of sample images (synthetic images otherwise)")
+    p.add_argument("--samples", type=int, default=8)
+    p.add_argument("--tolerance", type=float, default=0.5, help="max allowed score drift (0-100 scale)")
+    p.set_defaults(func=check)
+
+    p = sub.add_parser("bench", help="Latency of eager FP32 vs ONNX Runtime per batch size")
+    p.add_argument("--images", help="directory of sample images (synthetic images otherwise)")
+    p.add_argument("--batch-sizes", default="1,8")
+    p.add_argument("--runs", type=int, default=10)
+    p.set_defaults(func=bench)
+
+    args = parser.parse_args(argv)
+    runtime.ONNX_DIR = args.dir
+    runtime.INTRA_OP_THREADS = args.threads
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
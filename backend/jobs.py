@@ -0,0 +1,171 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+# Job lifecycle
+PENDING = "pending"
+RUNNING = "running"
+DONE    = "done"
+ERROR   = "error"
+
+
+def _record(status: str, result=None, error=None, created_at=None, updated_at=None) -> dict:
+    return {
+        "status": status,
+        "result": result,
+        "error": error,
+        "created_at": created_at,
+        "updated_at": updated_at,
+    }
+
+
+class MemoryJobStore:
+    """
+    Process-local job store with TTL + LRU eviction.
+    Entries expire `ttl_seconds` after their last update; beyond `max_entries`
+    the least recently used job is dropped.
+    """
+
+    def __init__(self, ttl_seconds: float = 3600, max_entries: int = 10000):
+        self.ttl = ttl_seconds
+        self.max_entries = max_entries
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+        self._evicted = 0
+
+    def create(self, job_id: str):
+        now = time.time()
+        with self._lock:
+            self._jobs[job_id] = _record(PENDING, created_at=now, updated_at=now)
+            self._jobs.move_to_end(job_id)
+            self._evict_locked(now)
+
+    def update(self, job_id: str, status: str, result=None, error=None):
+        now = time.time()
+        with self._lock:
+            job = self._jobs.get(job_id)
+            created = job["created_at"] if job else now
+            self._jobs[job_id] = _record(status, result, error, created, now)
+            self._jobs.move_to_end(job_id)
+            self._evict_locked(now)
+
+    def get(self, job_id: str):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            if time.time() - job["updated_at"] > self.ttl:
+                del self._jobs[job_id]
+                self._evicted += 1
+                return None
+            self._jobs.move_to_end(job_id)
+            return dict(job)
+
+    def _evict_locked(self, now: float):
+        expired = [jid for jid, job in self._jobs.items() if now - job["updated_at"] > self.ttl]
+        for jid in expired:
+            del self._jobs[jid]
+        while len(self._jobs) > self.max_entries:
+            self._jobs.popitem(last=False)
+            self._evicted += 1
+        self._evicted += len(expired)
+
+    def stats(self) -> dict:
+        return {"backend": "memory", "jobs": len(self._jobs), "evicted": self._evicted}
+
+
+class SQLiteJobStore:
+    """
+    On-disk job store — survives restarts and is shared by every worker process
+    pointing at the same file. Same interface and eviction rules as MemoryJobStore.
+    """
+
+    def __init__(self, path: str = "jobs.db", ttl_seconds: float = 3600, max_entries: int = 10000):
+        self.path = path
+        self.ttl = ttl_seconds
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._evicted = 0
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        # WAL lets other worker processes read while one writes
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS jobs (
+                job_id     TEXT PRIMARY KEY,
+                status     TEXT NOT NULL,
+                result     TEXT,
+                error      TEXT,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL
+            )"""
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS jobs_updated ON jobs(updated_at)")
+
+    def create(self, job_id: str):
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO jobs VALUES (?, ?, NULL, NULL, ?, ?)",
+                (job_id, PENDING, now, now),
+            )
+            self._evict_locked(now)
+
+    def update(self, job_id: str, status: str, result=None, error=None):
+        now = time.time()
+        payload = json.dumps(result) if result is not None else None
+        with self._lock:
+            self._conn.execute(
+                """INSERT INTO jobs VALUES (?, ?, ?, ?, ?, ?)
+                   ON CONFLICT(job_id) DO UPDATE SET
+                     status=excluded.status, result=excluded.result,
+                     error=excluded.error, updated_at=excluded.updated_at""",
+                (job_id, status, payload, error, now, now),
+            )
+            self._evict_locked(now)
+
+    def get(self, job_id: str):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT status, result, error, created_at, updated_at FROM jobs "
+                "WHERE job_id = ? AND updated_at >= ?",
+                (job_id, time.time() - self.ttl),
+            ).fetchone()
+        if row is None:
+            return None
+        status, result, error, created_at, updated_at = row
+        return _record(status, json.loads(result) if result else None, error, created_at, updated_at)
+
+    def _evict_locked(self, now: float):
+        cur = self._conn.execute("DELETE FROM jobs WHERE updated_at < ?", (now - self.ttl,))
+        self._evicted += max(cur.rowcount, 0)
+        cur = self._conn.execute(
+            "DELETE FROM jobs WHERE job_id IN ("
+            "  SELECT job_id FROM jobs ORDER BY updated_at DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,),
+        )
+        self._evicted += max(cur.rowcount, 0)
+
+    def stats(self) -> dict:
+        with self._lock:
+            count = self._conn.execute("SELECT COUNT(*) FROM jobs").fetchone()[0]
+        return {"backend": "sqlite", "path": self.path, "jobs": count, "evicted": self._evicted}
+
+
+def create_job_store():
+    """
+    Picks the backend from env:
+      TRUTHLENS_JOB_STORE = memory (default) | sqlite
+      TRUTHLENS_JOB_DB    = path of the SQLite file (default jobs.db)
+      TRUTHLENS_JOB_TTL   = seconds a finished job stays fetchable (default 3600)
+      TRUTHLENS_JOB_MAX   = max jobs kept (default 10000)
+    """
+    backend = os.getenv("TRUTHLENS_JOB_STORE", "memory").lower()
+    ttl = float(os.getenv("TRUTHLENS_JOB_TTL", "3600"))
+    max_entries = int(os.getenv("TRUTHLENS_JOB_MAX", "10000"))
+    if backend == "sqlite":
+        return SQLiteJobStore(os.getenv("TRUTHLENS_JOB_DB", "jobs.db"), ttl, max_entries)
+    return MemoryJobStore(ttl, max_entries)
@@ -1,15 +1,34 @@
 import asyncio
+import json
+import shutil
+import tempfile
 import uuid
 from contextlib import asynccontextmanager
-from typing import Dict
+from typing import Dict, List
+import os
 from fastapi import FastAPI,UploadFile,File,WebSocket,WebSocketDisconnect
+from fastapi.responses import JSONResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from dotenv import load_dotenv
-from pipeline import run_pipeline
+# Loaded before the pipeline import — batching/model settings are read at import time
 load_dotenv()
+from pipeline import run_pipeline, run_video_pipeline, batch_stats, pipeline_version, stage_cache, model_client, scheduler
+from models.decoded_image import DecodedImage
+from models.gradcam import gradcam_stats
+from jobs import create_job_store, DONE, ERROR
+from result_cache import create_result_cache
+from models import warmup, runtime
+from models.video import is_video
+from tools.archive import is_archive, iter_archive_images
+from scheduler import Overloaded
+from agent.agent import agent_stats
+from agent.llm import close_client as close_llm_client
 
 
-jobs :Dict[str,dict] ={}
+# memory (TTL/LRU) or sqlite — see jobs.create_job_store
+jobs = create_job_store()
+# Repeat uploads of identical bytes (under the same filename) are answered without rerunning the pipeline
+result_cache = create_result_cache()
 origin = ["http://localhost:3000"]
 class ConnectionManager:
     def __init__(self):
@@ -34,10 +53,36 @@ class ConnectionManager:
 
 manager = ConnectionManager()  
 
+# Models loaded eagerly at startup (TRUTHLENS_PRELOAD); /ready waits on exactly these.
+# With a model server the models live there — this worker loads none.
+preload_models = warmup.preload_names() if model_client is None else []
+
+
+def artifacts_error():
+    """TRUTHLENS_BACKEND=onnx without the exported artifacts — None once they exist."""
+    missing = runtime.missing_artifacts() if model_client is None else []
+    if missing:
+        return f"Missing ONNX artifact(s): {', '.join(missing)} — run `python export.py onnx` first"
+    return None
+
 @asynccontextmanager
 async def lifespan(app:FastAPI):
     print("TruthLens backend started")
+    error = artifacts_error()
+    if error:
+        print(f"[TruthLens] {error}")
+    # Load in the background so the server (and /ready) answers while models load
+    preload_task = None
+    if preload_models:
+        do_warmup = os.getenv("TRUTHLENS_WARMUP", "1") != "0"
+        preload_task = asyncio.create_task(
+            asyncio.to_thread(warmup.preload, preload_models, do_warmup)
+        )
     yield
+    if preload_task is not None and not preload_task.done():
+        preload_task.cancel()
+    scheduler.shutdown()
+    await close_llm_client()
 
 
 app = FastAPI(title="TruthLens API",version="0.1.0",lifespan=lifespan)    
@@ -54,22 +99,204 @@ async def root():
     return {"status":"TruthLens backend running"}
     
 
+@app.get("/ready")
+async def ready():
+    if model_client is not None:
+        try:
+            report = await scheduler.io.run(model_client.status)
+        except Exception as e:
+            report = {"ready": False, "error": f"model server unavailable: {e}"}
+        return JSONResponse(report, status_code=200 if report["ready"] else 503)
+    report = warmup.status(preload_models)
+    error = artifacts_error()
+    if error:
+        report.update(ready=False, error=error)
+    return JSONResponse(report, status_code=200 if report["ready"] else 503)
+
+
+@app.get("/metrics")
+async def metrics():
+    return {"batching": batch_stats(), "gradcam": gradcam_stats(), "jobs": jobs.stats(), "result_cache": result_cache.stats(), "stage_cache": stage_cache.stats(), "scheduler": scheduler.stats(), "agent": agent_stats()}
+
+
+# Seconds a rejected client is told to wait before retrying
+RETRY_AFTER = os.getenv("TRUTHLENS_RETRY_AFTER", "5")
+
+
+def overloaded(message: str) -> JSONResponse:
+    return JSONResponse({"error": message}, status_code=429, headers={"Retry-After": RETRY_AFTER})
+
+
+def unavailable(message: str) -> JSONResponse:
+    return JSONResponse({"error": message}, status_code=503)
+
+
 @app.post("/analyze")
 async def analyse(file: UploadFile=File(...)):
+    error = artifacts_error()
+    if error:
+        return unavailable(error)
     job_id = str(uuid.uuid4())
+    if is_video(file.filename, file.content_type):
+        # Refuse before spooling — no point writing a clip to disk that can't run
+        if scheduler.full():
+            return overloaded("Analysis queue is full — try again later")
+        # OpenCV decodes from a path — spool the upload to disk instead of memory
+        path = await scheduler.io.run(save_upload, file)
+        try:
+            scheduler.submit(run_video_job(job_id, path, file.filename or "upload"))
+        except Overloaded as e:
+            os.remove(path)
+            return overloaded(str(e))
+        # Before the job's task first runs — it marks the job running
+        jobs.create(job_id)
+        return {"job_id":job_id,"cached":False}
+
     contents = await file.read()
-    jobs[job_id] = {"status": "pending","result":None}
-    asyncio.create_task(
-        run_pipeline(job_id,contents,file.filename or "upload",manager)
+    image = DecodedImage(contents)
+
+    try:
+        version = await current_version()
+    except Exception as e:
+        # Model server unreachable before its versions were ever known — the job fails, the API doesn't
+        print(f"[TruthLens] Could not version job {job_id}: {e}")
+        jobs.create(job_id)
+        jobs.update(job_id, ERROR, error=str(e))
+        return {"job_id":job_id,"cached":False}
+    # Hashing (and dHash when near-duplicate matching is on) — keep it off the event loop
+    filename = file.filename or "upload"
+    cached = await scheduler.cpu.run(result_cache.get, image, version, filename)
+    if cached is not None:
+        jobs.create(job_id)
+        jobs.update(job_id, DONE, result=cached)
+        return {"job_id":job_id,"cached":True,"result":cached}
+
+    try:
+        scheduler.submit(run_and_cache(job_id,image,filename,version))
+    except Overloaded as e:
+        return overloaded(str(e))
+    jobs.create(job_id)
+    return {"job_id":job_id,"cached":False}
+
+
+async def current_version() -> str:
+    # With a model server, the first call fetches its stage versions over the socket
+    return await scheduler.io.run(pipeline_version)
+
 
-    )
-    return {"job_id":job_id}
+async def run_and_cache(job_id:str,image:DecodedImage,filename:str,version:str):
+    result = await run_pipeline(job_id,image,filename,manager,jobs)
+    if result is not None:
+        result_cache.put(image,version,filename,result)
+    return result
+
+
+def save_upload(file: UploadFile) -> str:
+    suffix = os.path.splitext(file.filename or "")[1]
+    with tempfile.NamedTemporaryFile(prefix="truthlens-", suffix=suffix, delete=False) as tmp:
+        shutil.copyfileobj(file.file, tmp)
+        return tmp.name
+
+
+async def run_video_job(job_id:str,path:str,filename:str):
+    try:
+        return await run_video_pipeline(job_id,path,filename,manager,jobs)
+    finally:
+        os.remove(path)
+
+
+# Images from one batch request analysed at once — concurrent jobs also share
+# micro-batched detector/CLIP forward passes.
+BATCH_CONCURRENCY = int(os.getenv("TRUTHLENS_BATCH_CONCURRENCY", "4"))
+BATCH_MAX_FILES   = int(os.getenv("TRUTHLENS_BATCH_MAX_FILES", "1000"))
+
+
+def expand_upload(name: str, contents: bytes, max_files: int) -> list:
+    """(name, bytes) pairs for one batch upload: the images inside an archive, or the upload itself."""
+    if is_archive(contents):
+        return list(iter_archive_images(contents, max_files=max_files))
+    return [(name, contents)]
+
+
+@app.post("/analyze/batch")
+async def analyse_batch(files: List[UploadFile]=File(...)):
+    """
+    Accepts many images and/or zip/tar archives of images. Streams one NDJSON
+    line per image as soon as it finishes (completion order, not upload order):
+      {"job_id", "filename", "status": "done"|"error", "cached", "result"|"error"}
+    Every job is also recorded in the job store, so /results/{job_id} works too.
+    """
+    error = artifacts_error()
+    if error:
+        return unavailable(error)
+    if scheduler.full():
+        return overloaded("Analysis queue is full — try again later")
+    items = []
+    try:
+        for file in files:
+            contents = await file.read()
+            name = file.filename or "upload"
+            # Sniffing and decompressing an archive is CPU work — keep it off the event loop
+            items.extend(await scheduler.cpu.run(expand_upload, name, contents, BATCH_MAX_FILES - len(items)))
+            if len(items) > BATCH_MAX_FILES:
+                raise ValueError(f"Batch holds more than {BATCH_MAX_FILES} images")
+    except ValueError as e:
+        return JSONResponse({"error": str(e)}, status_code=413)
+
+    semaphore = asyncio.Semaphore(BATCH_CONCURRENCY)
+
+    async def analyse_one(name: str, contents: bytes) -> dict:
+        async with semaphore:
+            job_id = str(uuid.uuid4())
+            jobs.create(job_id)
+            try:
+                return await analyse_item(job_id, name, contents)
+            except Exception as e:
+                # One bad file is one error line — it must not end the stream for the rest
+                print(f"[TruthLens] Batch item {name} failed: {e}")
+                jobs.update(job_id, ERROR, error=str(e))
+                return {"job_id":job_id,"filename":name,"status":ERROR,"cached":False,"error":str(e)}
+
+    async def analyse_item(job_id: str, name: str, contents: bytes) -> dict:
+        image = DecodedImage(contents)
+        version = await current_version()
+        cached = await scheduler.cpu.run(result_cache.get, image, version, name)
+        if cached is not None:
+            jobs.update(job_id, DONE, result=cached)
+            return {"job_id":job_id,"filename":name,"status":DONE,"cached":True,"result":cached}
+
+        # Already accepted — waits for a job slot rather than being rejected
+        async with scheduler.slot():
+            result = await run_and_cache(job_id,image,name,version)
+        if result is None:
+            job = jobs.get(job_id) or {}
+            return {"job_id":job_id,"filename":name,"status":ERROR,"cached":False,
+                    "error":job.get("error")}
+        return {"job_id":job_id,"filename":name,"status":DONE,"cached":False,"result":result}
+
+    async def stream():
+        tasks = [asyncio.create_task(analyse_one(name, contents)) for name, contents in items]
+        try:
+            for finished in asyncio.as_completed(tasks):
+                yield json.dumps(await finished) + "\n"
+        finally:
+            # Client went away mid-stream — don't keep analysing for nobody
+            for task in tasks:
+                task.cancel()
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
 
 
 
 @app.websocket("/ws/{job_id}")
 async def websocket_endpoint(websocket:WebSocket,job_id:str):
     await manager.connect(job_id,websocket) 
+    # Reconnecting clients (or jobs finished by another worker) get the stored outcome
+    job = jobs.get(job_id)
+    if job and job["status"] == DONE:
+        await manager.send(job_id, {"type": "result", "data": job["result"]})
+    elif job and job["status"] == ERROR:
+        await manager.send(job_id, {"type": "error", "message": job["error"]})
     try:
         while True:
             await websocket.receive_text()
@@ -0,0 +1,124 @@
+"""
+Model server — one process owns the detector, CLIP, InsightFace and the Grad-CAM
+explainer, and serves inference to any number of API workers over a local
+socket. Image pixels travel through shared memory, so HTTP workers scale
+without each loading its own copy of the models.
+
+    python model_server.py                                   # listens on 127.0.0.1:7070
+    TRUTHLENS_MODEL_SERVER=127.0.0.1:7070 uvicorn main:app --workers 4
+
+TRUTHLENS_MODEL_SERVER may also be a Unix socket path. Both sides must set
+the same secret TRUTHLENS_MODEL_SERVER_KEY — requests are unpickled, so the
+key is all that stands between the port and code execution; neither side
+starts without one. Model settings (TRUTHLENS_PRELOAD,
+TRUTHLENS_BACKEND, TRUTHLENS_QUANTIZE, ...) apply to this process.
+"""
+import os
+import threading
+from multiprocessing.connection import Listener
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from models import efficientnet, clip_classifier, face_extractor, warmup
+from models.decoded_image import DecodedImage
+from models.gradcam import generate_heatmap, explain_image, GRADCAM_VERSION
+from models.remote import DEFAULT_ADDRESS, parse_address, authkey, attach, read_images
+
+preload_models = warmup.preload_names()
+
+
+def _heatmap(images):
+    if not efficientnet.heatmaps_enabled():
+        return ""
+    model, transform, device = efficientnet.get_model_and_transform()
+    return generate_heatmap(model, transform, device, images[0], efficientnet.fake_label_index())
+
+
+def _explain(images):
+    if not efficientnet.heatmaps_enabled():
+        # Score only — the worker sees an empty heatmap, as with separate mode
+        return efficientnet.run_efficientnet_batch(images)[0], ""
+    model, transform, fake_idx = efficientnet.get_explain_components()
+    return explain_image(model, transform, images[0], fake_idx)
+
+
+def _versions(images):
+    # Only the model-backed stages — everything else is versioned by the API workers
+    return {
+        "face": face_extractor.cache_version(),
+        "detector": efficientnet.cache_version(),
+        "clip": clip_classifier.cache_version(),
+        "gradcam": GRADCAM_VERSION,
+        "heatmaps": "on" if efficientnet.heatmaps_enabled() else "off",
+    }
+
+
+# op → handler(images, **kwargs); images are DecodedImages over shared memory
+OPS = {
+    "detector":     lambda images: efficientnet.run_efficientnet_batch(images),
+    "clip":         lambda images: clip_classifier.run_clip_batch(images),
+    "face":         lambda images: face_extractor.extract_face(images[0])[1],
+    "faces":        lambda images, min_score: face_extractor.extract_faces(images[0], min_score),
+    "detect_faces": lambda images: face_extractor.detect_faces(images[0].rgb_array),
+    "heatmap":      _heatmap,
+    "explain":      _explain,
+    "versions":     _versions,
+    "status":       lambda images: warmup.status(preload_models),
+}
+
+
+def dispatch(op: str, shm_name: str, specs: list, kwargs: dict):
+    handler = OPS.get(op)
+    if handler is None:
+        raise ValueError(f"Unknown op: {op}")
+    shm = attach(shm_name)
+    try:
+        images = [DecodedImage.from_array(arr) for arr in read_images(shm, specs)]
+        try:
+            return handler(images, **kwargs)
+        finally:
+            # Every view into the block must be gone before it can be closed
+            del images
+    finally:
+        shm.close()
+
+
+def handle(conn):
+    with conn:
+        while True:
+            try:
+                op, shm_name, specs, kwargs = conn.recv()
+            except (EOFError, OSError):
+                return
+            try:
+                reply = ("ok", dispatch(op, shm_name, specs, kwargs))
+            except Exception as e:
+                print(f"[TruthLens] Model server {op} error: {e}")
+                reply = ("error", str(e))
+            conn.send(reply)
+
+
+def serve(address):
+    key = authkey()   # refuse to listen without an explicit secret
+    if isinstance(address, str) and os.path.exists(address):
+        os.remove(address)   # stale socket from a previous run
+    listener = Listener(address, authkey=key)
+    print(f"[TruthLens] Model server listening on {address}")
+
+    # Accept connections while models load — the status op reports progress
+    do_warmup = os.getenv("TRUTHLENS_WARMUP", "1") != "0"
+    threading.Thread(target=warmup.preload, args=(preload_models, do_warmup), daemon=True).start()
+
+    with listener:
+        while True:
+            try:
+                conn = listener.accept()
+            except Exception as e:   # failed handshake / bad authkey
+                print(f"[TruthLens] Model server rejected a connection: {e}")
+                continue
+            threading.Thread(target=handle, args=(conn,), daemon=True).start()
+
+
+if __name__ == "__main__":
+    serve(parse_address(os.getenv("TRUTHLENS_MODEL_SERVER", "").strip() or DEFAULT_ADDRESS))
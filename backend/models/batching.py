@@ -0,0 +1,110 @@
+import asyncio
+import inspect
+import os
+
+
+class MicroBatcher:
+    """
+    Dynamic micro-batching for model inference shared by concurrent jobs.
+
+    `submit()` queues one item and waits; the queue is flushed as a single
+    `batch_fn(items)` call when it reaches `max_batch_size` or when the oldest
+    item has waited `max_wait_ms`. `batch_fn` must return one result per item,
+    in order. Plain functions run in a worker thread via `runner` (default
+    asyncio.to_thread), coroutines are awaited.
+    """
+
+    def __init__(self, name: str, batch_fn, max_batch_size: int = 8, max_wait_ms: float = 5.0,
+                 runner=None):
+        self.name = name
+        self.batch_fn = batch_fn
+        self.runner = runner or asyncio.to_thread
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait_ms = max(0.0, float(max_wait_ms))
+        self._is_async = inspect.iscoroutinefunction(batch_fn)
+        self._pending = []
+        self._timer = None
+        self._running = set()
+        self._batches = 0
+        self._items = 0
+        self._largest = 0
+
+    @classmethod
+    def from_env(cls, name: str, batch_fn, prefix: str = "TRUTHLENS_BATCH", runner=None,
+                 max_batch_size: int = 8, max_wait_ms: float = 5.0):
+        """Reads <prefix>_MAX_SIZE and <prefix>_MAX_WAIT_MS, falling back to the given defaults."""
+        return cls(
+            name,
+            batch_fn,
+            max_batch_size=int(os.getenv(f"{prefix}_MAX_SIZE", str(max_batch_size))),
+            max_wait_ms=float(os.getenv(f"{prefix}_MAX_WAIT_MS", str(max_wait_ms))),
+            runner=runner,
+        )
+
+    async def submit(self, item):
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((item, future))
+
+        if len(self._pending) >= self.max_batch_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_wait_ms / 1000, self._flush)
+
+        return await future
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+        while self._pending:
+            batch = self._pending[:self.max_batch_size]
+            self._pending = self._pending[self.max_batch_size:]
+            task = asyncio.ensure_future(self._run(batch))
+            self._running.add(task)
+            task.add_done_callback(self._running.discard)
+
+    async def _run(self, batch: list):
+        # Jobs whose coroutine was cancelled while queued don't need a forward pass
+        batch = [(item, fut) for item, fut in batch if not fut.cancelled()]
+        if not batch:
+            return
+
+        items = [item for item, _ in batch]
+        self._batches += 1
+        self._items += len(items)
+        self._largest = max(self._largest, len(items))
+
+        try:
+            if self._is_async:
+                results = await self.batch_fn(items)
+            else:
+                results = await self.runner(self.batch_fn, items)
+            if len(results) != len(items):
+                raise RuntimeError(
+                    f"{self.name} batch returned {len(results)} results for {len(items)} items"
+                )
+        except Exception as e:
+            for _, fut in batch:
+                if not fut.done():
+                    fut.set_exception(e)
+            return
+
+        for (_, fut), result in zip(batch, results):
+            if not fut.done():
+                fut.set_result(result)
+
+    def stats(self) -> dict:
+        avg = self._items / self._batches if self._batches else 0.0
+        return {
+            "batches": self._batches,
+            "items": self._items,
+            "avg_batch_size": round(avg, 2),
+            "largest_batch": self._largest,
+            # fraction of each batch's capacity actually used
+            "fill_rate": round(avg / self.max_batch_size, 3),
+            "queued": len(self._pending),
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait_ms,
+        }
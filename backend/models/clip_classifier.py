@@ -1,11 +1,22 @@
-import io
-from PIL import Image
+import hashlib
+import json
+import threading
 import torch
 from transformers import CLIPProcessor, CLIPModel
+from models import runtime
 
 _device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
 _model = None
 _processor = None
+_load_lock = threading.Lock()
+# (normalized prompt embeddings on _device, number of REAL prompts) — swapped as one
+# tuple so a concurrent set_prompts() can never pair new embeddings with an old split.
+_text_cache = None
+_logit_scale = None
+# ONNX Runtime sessions (vision, text) when TRUTHLENS_BACKEND=onnx
+_sessions = None
+
+MODEL_ID = "openai/clip-vit-large-patch14"
 
 # FIX: balanced 4 REAL vs 4 FAKE — original 3 vs 4 imbalance biased toward fake
 # because softmax probability was split across more fake candidates.
@@ -25,47 +36,165 @@ FAKE_PROMPTS = [
 
 
 def _load_model():
-    global _model, _processor
-    if _model is not None:
+    global _model, _processor, _sessions
+    if is_loaded():
         return
-    print(f"[TruthLens] Loading CLIP on {_device}...")
-    _model = CLIPModel.from_pretrained("openai/clip-vit-large-patch14")
-    _processor = CLIPProcessor.from_pretrained("openai/clip-vit-large-patch14")
-    _model = _model.to(_device)
-    _model.eval()
-    print("[TruthLens] CLIP loaded ✓")
+    # Single-flight: concurrent first requests wait for one load instead of racing
+    with _load_lock:
+        if is_loaded():
+            return
+        if runtime.use_onnx():
+            _processor = CLIPProcessor.from_pretrained(MODEL_ID)
+            sessions = (runtime.load_session("clip_vision"), runtime.load_session("clip_text"))
+            _build_text_cache(sessions=sessions)
+            _sessions = sessions
+            print("[TruthLens] CLIP (ONNX) loaded ✓")
+            return
+        print(f"[TruthLens] Loading CLIP on {_device}...")
+        runtime.configure_torch_threads()
+        model = CLIPModel.from_pretrained(MODEL_ID)
+        _processor = CLIPProcessor.from_pretrained(MODEL_ID)
+        model = model.to(_device)
+        model.eval()
+        if runtime.int8_enabled(_device):
+            quantize(model)
+            print("[TruthLens] CLIP vision tower quantized to INT8")
+        _build_text_cache(model)
+        # Published last — _model doubles as the "loaded" flag
+        _model = model
+        print("[TruthLens] CLIP loaded ✓")
+
+
+def quantize(model):
+    """
+    Dynamic INT8 quantization of the vision tower's Linear layers (in place).
+    The text tower runs once per prompt set, so it stays FP32.
+    """
+    model.vision_model = runtime.quantize_linear(model.vision_model)
+    model.visual_projection = runtime.quantize_linear(model.visual_projection)
+    return model
+
+
+def is_loaded() -> bool:
+    return (_sessions if runtime.use_onnx() else _model) is not None
+
+
+def _embeds(output) -> torch.Tensor:
+    # get_*_features returns a tensor in transformers 4.x, a pooled ModelOutput in 5.x
+    return output if isinstance(output, torch.Tensor) else output.pooler_output
+
+
+def _build_text_cache(model=None, sessions=None):
+    """
+    Prompts never change between images, so the text tower runs once here
+    instead of on every call. Per-image work is then vision tower + one matmul.
+    """
+    global _text_cache, _logit_scale
+    sessions = sessions if sessions is not None else _sessions
+    real, fake = list(REAL_PROMPTS), list(FAKE_PROMPTS)
+    if sessions is not None:
+        inputs = _processor(text=real + fake, return_tensors="np", padding=True)
+        text_features, logit_scale = sessions[1].run(["text_embeds", "logit_scale"], {
+            "input_ids": inputs["input_ids"].astype("int64"),
+            "attention_mask": inputs["attention_mask"].astype("int64"),
+        })
+        text_features = torch.from_numpy(text_features)
+        logit_scale = float(logit_scale)
+    else:
+        model = model if model is not None else _model
+        inputs = _processor(text=real + fake, return_tensors="pt", padding=True).to(_device)
+        with torch.no_grad():
+            text_features = _embeds(model.get_text_features(**inputs))
+        logit_scale = model.logit_scale.exp().item()
+    text_features = text_features / text_features.norm(dim=-1, keepdim=True)
+    _text_cache = (text_features, len(real))
+    _logit_scale = logit_scale
+
+
+def set_prompts(real_prompts: list, fake_prompts: list):
+    """Swap the prompt pools at runtime and rebuild the cached text embeddings."""
+    global REAL_PROMPTS, FAKE_PROMPTS
+    if not real_prompts or not fake_prompts:
+        raise ValueError("[TruthLens] CLIP needs at least one REAL and one FAKE prompt.")
+    REAL_PROMPTS = list(real_prompts)
+    FAKE_PROMPTS = list(fake_prompts)
+    if is_loaded():
+        _build_text_cache()
+
 
+def cache_version() -> str:
+    """Identifies this stage's outputs — changes whenever the prompt pools do."""
+    prompts = json.dumps([REAL_PROMPTS, FAKE_PROMPTS])
+    version = f"{MODEL_ID}|{hashlib.sha256(prompts.encode()).hexdigest()[:12]}"
+    if runtime.int8_enabled(_device):
+        version += "|int8"
+    if runtime.use_onnx():
+        version += f"|onnx|{runtime.artifact_version('clip_vision')}|{runtime.artifact_version('clip_text')}"
+    return version
 
-def run_clip(image_bytes: bytes) -> float:
+
+def run_clip(image) -> float:
     """
     Returns float 0-100 — probability the image is AI-generated.
     Uses balanced prompt pools to avoid systematic bias toward fake.
+    `image` may be upload bytes, a DecodedImage, an RGB array or a PIL image.
+    """
+    return run_clip_batch([image])[0]
+
+
+def run_clip_batch(images: list) -> list:
+    """
+    Batched variant of run_clip — one forward pass for all images.
+    Returns one 0-100 score per image, in order; an image that can't be
+    decoded gets 50.0 without affecting the rest of the batch.
     """
     _load_model()
+    scores = [50.0] * len(images)
+    pixel_values, ok = runtime.preprocess_each(_processor, images, "CLIP")
+    if not ok:
+        return scores
     try:
-        image = Image.open(io.BytesIO(image_bytes)).convert("RGB")
-        all_prompts = REAL_PROMPTS + FAKE_PROMPTS
+        if _sessions is not None:
+            image_features = torch.from_numpy(
+                _sessions[0].run(["image_embeds"], {"pixel_values": pixel_values})[0])
+        else:
+            image_features = _image_features_pixels(_model, torch.from_numpy(pixel_values))
 
-        inputs = _processor(
-            text=all_prompts,
-            images=image,
-            return_tensors="pt",
-            padding=True,
-        ).to(_device)
+        fake_scores = _fake_scores(image_features)
 
-        with torch.no_grad():
-            outputs = _model(**inputs)
-            probs = torch.softmax(outputs.logits_per_image, dim=1)[0]
+    except Exception as e:
+        print(f"[TruthLens] CLIP error: {e}")
+        return scores
 
-        n_real = len(REAL_PROMPTS)
-        real_score = probs[:n_real].mean().item()
-        fake_score = probs[n_real:].mean().item()
+    for i, score in zip(ok, fake_scores):
+        scores[i] = score
+    return scores
 
-        total = real_score + fake_score + 1e-8
-        fake_prob = (fake_score / total) * 100
 
-        return round(fake_prob, 2)
+def _fake_scores(image_features: torch.Tensor) -> list:
+    """Image embeddings → 0-100 fake scores against the cached prompt embeddings."""
+    text_features, n_real = _text_cache
 
-    except Exception as e:
-        print(f"[TruthLens] CLIP error: {e}")
-        return 50.0
\ No newline at end of file
+    with torch.no_grad():
+        image_features = image_features / image_features.norm(dim=-1, keepdim=True)
+        # Same as CLIPModel's logits_per_image, against the cached prompt matrix
+        logits = _logit_scale * image_features @ text_features.t()
+        probs = torch.softmax(logits, dim=1)
+
+    real_score = probs[:, :n_real].mean(dim=1)
+    fake_score = probs[:, n_real:].mean(dim=1)
+
+    total = real_score + fake_score + 1e-8
+    fake_probs = (fake_score / total) * 100
+
+    return [round(p, 2) for p in fake_probs.tolist()]
+
+
+def _image_features(model, pixels: list) -> torch.Tensor:
+    """Eager vision tower over RGB images → (N, D) unnormalized embeddings."""
+    return _image_features_pixels(model, _processor(images=pixels, return_tensors="pt")["pixel_values"])
+
+
+def _image_features_pixels(model, pixel_values: torch.Tensor) -> torch.Tensor:
+    with torch.no_grad():
+        return _embeds(model.get_image_features(pixel_values=pixel_values.to(_device)))
@@ -0,0 +1,169 @@
+import io
+import hashlib
+import threading
+import numpy as np
+from PIL import Image
+
+
+class DecodedImage:
+    """
+    An upload decoded once and shared by every pipeline stage.
+
+    PIL parses the bytes a single time; RGB, grayscale and NumPy views are
+    derived lazily on first access and cached. Array views are read-only —
+    a stage that needs to mutate pixels must copy first.
+    """
+
+    def __init__(self, data: bytes):
+        self._data = bytes(data)
+        self._lock = threading.RLock()
+        self._views = {}
+
+    @classmethod
+    def from_array(cls, rgb: np.ndarray) -> "DecodedImage":
+        """
+        Wrap pixels that are already decoded (a face crop, a video frame) without
+        an encode/decode round trip. `data` is encoded to PNG only if asked for.
+        """
+        arr = _readonly(np.ascontiguousarray(rgb, dtype=np.uint8))
+        image = cls._wrap(Image.fromarray(arr))
+        if arr.ndim == 3 and arr.shape[2] == 3:
+            image._views["rgb_array"] = arr
+        return image
+
+    @classmethod
+    def from_pil(cls, pil: Image.Image) -> "DecodedImage":
+        """Wrap an in-memory PIL image — its format and EXIF are kept if it was opened from a file."""
+        return cls._wrap(pil)
+
+    @classmethod
+    def _wrap(cls, pil: Image.Image) -> "DecodedImage":
+        image = cls.__new__(cls)
+        image._data = None
+        image._lock = threading.RLock()
+        image._views = {"source": pil}
+        if pil.mode == "RGB":
+            image._views["rgb"] = pil
+        return image
+
+    def __repr__(self):
+        if self._data is None:
+            return f"DecodedImage({self.size[0]}x{self.size[1]} pixels)"
+        return f"DecodedImage({len(self._data)} bytes)"
+
+    def _view(self, name: str, build):
+        # PIL decoding is not thread-safe, and concurrent stages (detector + CLIP)
+        # would otherwise decode the same upload twice — build each view once.
+        view = self._views.get(name)
+        if view is not None:
+            return view
+        with self._lock:
+            view = self._views.get(name)
+            if view is None:
+                view = build()
+                self._views[name] = view
+            return view
+
+    # ── Raw input ─────────────────────────────────────────────────────────────
+    @property
+    def data(self) -> bytes:
+        if self._data is None:
+            return self._view("data", self._encode_png)
+        return self._data
+
+    @property
+    def sha256(self) -> str:
+        """Exact content hash of the uploaded bytes (of the RGB pixels for in-memory images)."""
+        def build():
+            if self._data is not None:
+                return hashlib.sha256(self._data).hexdigest()
+            arr = self.rgb_array
+            digest = hashlib.sha256(f"{arr.shape}".encode())
+            digest.update(arr.data)
+            return digest.hexdigest()
+        return self._view("sha256", build)
+
+    def _encode_png(self) -> bytes:
+        buf = io.BytesIO()
+        self.rgb.save(buf, format="PNG")
+        return buf.getvalue()
+
+    @property
+    def source(self) -> Image.Image:
+        """The opened (not converted) PIL image — keeps format and EXIF info."""
+        return self._view("source", lambda: Image.open(io.BytesIO(self._data)))
+
+    @property
+    def format(self) -> str:
+        return (self.source.format or "").upper()
+
+    @property
+    def size(self) -> tuple:
+        """(width, height) in pixels."""
+        return self.source.size
+
+    @property
+    def exif(self) -> dict:
+        """Raw EXIF tag → value mapping, or None when the file carries none."""
+        def build():
+            getexif = getattr(self.source, "_getexif", None)
+            return (getexif() if getexif else None) or {}
+        return self._view("exif", build) or None
+
+    # ── Pixel views ───────────────────────────────────────────────────────────
+    @property
+    def rgb(self) -> Image.Image:
+        return self._view("rgb", lambda: self.source.convert("RGB"))
+
+    @property
+    def gray(self) -> Image.Image:
+        return self._view("gray", lambda: self.source.convert("L"))
+
+    @property
+    def rgb_array(self) -> np.ndarray:
+        """HxWx3 uint8, read-only."""
+        return self._view("rgb_array", lambda: _readonly(np.array(self.rgb)))
+
+    @property
+    def gray_array(self) -> np.ndarray:
+        """HxW float32, read-only."""
+        return self._view("gray_array", lambda: _readonly(np.array(self.gray, dtype=np.float32)))
+
+    @property
+    def dhash(self) -> int:
+        """
+        64-bit perceptual difference hash — survives re-encoding, resizing and
+        light edits, so near-duplicate uploads land within a few bits.
+        """
+        def build():
+            small = self.gray.resize((9, 8), Image.Resampling.LANCZOS, reducing_gap=3.0)
+            px = np.asarray(small, dtype=np.int16)
+            bits = (px[:, 1:] > px[:, :-1]).flatten()
+            return int("".join("1" if b else "0" for b in bits), 2)
+        return self._view("dhash", build)
+
+
+def _readonly(arr: np.ndarray) -> np.ndarray:
+    arr.flags.writeable = False
+    return arr
+
+
+def blank_image(width: int = 224, height: int = 224) -> DecodedImage:
+    """A mid-gray PNG — dummy input for model warm-up."""
+    buf = io.BytesIO()
+    Image.new("RGB", (width, height), (128, 128, 128)).save(buf, format="PNG")
+    return DecodedImage(buf.getvalue())
+
+
+def as_decoded(image) -> DecodedImage:
+    """
+    Accept raw upload bytes, an already decoded image, or in-memory pixels —
+    an HxWx3 uint8 RGB array (e.g. a face crop) or a PIL image — as-is.
+    """
+    if isinstance(image, DecodedImage):
+        return image
+    if isinstance(image, np.ndarray):
+        return DecodedImage.from_array(image)
+    if isinstance(image, Image.Image):
+        return DecodedImage.from_pil(image)
+    return DecodedImage(image)
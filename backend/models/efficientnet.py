@@ -1,12 +1,16 @@
-import io
-from PIL import Image
+import threading
 import torch
-from transformers import AutoModelForImageClassification, AutoImageProcessor
+from transformers import AutoConfig, AutoModelForImageClassification, AutoImageProcessor
+from models import runtime
 
 # ── Device setup ──────────────────────────────────────────────────────────────
 _device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
 _model = None
 _processor = None
+_config = None
+_session = None   # ONNX Runtime session when TRUTHLENS_BACKEND=onnx
+_fp32_model = None   # Grad-CAM copy when the scoring model is INT8
+_load_lock = threading.Lock()
 
 # Using umm-maybe/AI-image-detector — Swin Transformer fine-tuned on real vs AI-generated images.
 # Replaces the original tf_efficientnet_b7 + random untrained Linear(in, 2) head
@@ -15,62 +19,175 @@ _processor = None
 MODEL_ID = "umm-maybe/AI-image-detector"
 
 
+def load():
+    """Loads whatever the configured backend scores with (eager model or ONNX session)."""
+    if runtime.use_onnx():
+        _load_session()
+    else:
+        _load_model()
+
+
 def _load_model():
-    global _model, _processor
+    global _model, _processor, _config
     if _model is not None:
         return
+    # Single-flight: concurrent first requests wait for one load instead of racing
+    with _load_lock:
+        if _model is not None:
+            return
 
-    print(f"[TruthLens] Loading AI-image-detector on {_device}...")
+        print(f"[TruthLens] Loading AI-image-detector on {_device}...")
+        runtime.configure_torch_threads()
 
-    _processor = AutoImageProcessor.from_pretrained(MODEL_ID)
-    _model = AutoModelForImageClassification.from_pretrained(MODEL_ID)
-    _model = _model.to(_device)
-    _model.eval()
+        processor = AutoImageProcessor.from_pretrained(MODEL_ID)
+        model = AutoModelForImageClassification.from_pretrained(MODEL_ID)
+        model = model.to(_device)
+        model.eval()
+
+        if _device.type == "cuda":
+            model = model.half()
+            print(f"[TruthLens] FP16 on {torch.cuda.get_device_name(0)}")
+        else:
+            print("[TruthLens] No CUDA, running on CPU")
+        if runtime.int8_enabled(_device):
+            model = quantize(model)
+            print("[TruthLens] Detector Linear layers quantized to INT8")
+        elif runtime.QUANTIZE == "int8":
+            print("[TruthLens] TRUTHLENS_QUANTIZE=int8 applies to eager CPU inference only — ignored")
+
+        # Publish only fully initialised objects — _model doubles as the "loaded" flag
+        _processor = processor
+        _config = model.config
+        _model = model
+        print("[TruthLens] AI-image-detector ready ✓")
+
+
+def _load_session():
+    # ONNX backend — the eager model is only loaded if Grad-CAM asks for it
+    global _session, _processor, _config
+    if _session is not None:
+        return
+    with _load_lock:
+        if _session is not None:
+            return
+        processor = AutoImageProcessor.from_pretrained(MODEL_ID)
+        config = AutoConfig.from_pretrained(MODEL_ID)
+        session = runtime.load_session("detector")
+        _processor = processor
+        _config = config
+        _session = session
+        print("[TruthLens] AI-image-detector (ONNX) ready ✓")
+
+
+def quantize(model):
+    """Dynamic INT8 quantization of the detector's Linear layers (in place)."""
+    return runtime.quantize_linear(model)
 
-    if _device.type == "cuda":
-        _model = _model.half()
-        print(f"[TruthLens] FP16 on {torch.cuda.get_device_name(0)}")
-    else:
-        print("[TruthLens] No CUDA, running on CPU")
 
-    print("[TruthLens] AI-image-detector ready ✓")
+def heatmaps_enabled() -> bool:
+    """Whether Grad-CAM runs at all — off by default in INT8 mode (see runtime.HEATMAPS)."""
+    return runtime.heatmaps_enabled(_device)
 
 
-def run_efficientnet(image_bytes: bytes) -> float:
+def _explain_model():
+    """
+    FP32 detector for Grad-CAM. Quantized Linear layers have no backward pass,
+    so INT8 mode loads a separate FP32 copy — only with TRUTHLENS_HEATMAPS=1,
+    and only once a heatmap is requested.
+    """
+    global _fp32_model
+    _load_model()
+    if not runtime.int8_enabled(_device):
+        return _model
+    if not heatmaps_enabled():
+        raise RuntimeError("[TruthLens] Grad-CAM is off in INT8 mode — set TRUTHLENS_HEATMAPS=1 "
+                           "to load an FP32 detector copy for it")
+    if _fp32_model is None:
+        with _load_lock:
+            if _fp32_model is None:
+                _fp32_model = AutoModelForImageClassification.from_pretrained(MODEL_ID).eval()
+    return _fp32_model
+
+
+def is_loaded() -> bool:
+    return (_session if runtime.use_onnx() else _model) is not None
+
+
+def run_efficientnet(image) -> float:
     """
     Returns float 0-100 — probability the image is AI-generated.
     Uses umm-maybe/AI-image-detector (ViT fine-tuned on real vs AI images).
+    `image` may be upload bytes, a DecodedImage, an RGB array or a PIL image.
 
     Label mapping for this model:
       label 0 = artificial (AI-generated)
       label 1 = human (real photograph)
     """
-    _load_model()
-    try:
-        image = Image.open(io.BytesIO(image_bytes)).convert("RGB")
-        inputs = _processor(images=image, return_tensors="pt").to(_device)
+    return run_efficientnet_batch([image])[0]
 
-        if _device.type == "cuda":
-            inputs = {k: v.half() if v.dtype == torch.float32 else v
-                      for k, v in inputs.items()}
 
-        with torch.no_grad():
-            logits = _model(**inputs).logits
-            probs = torch.softmax(logits.float(), dim=1)[0]
+def fake_label_index() -> int:
+    # Model labels: 0=artificial, 1=human  →  fake_prob = prob[0]
+    if _config is None:
+        load()
+    id2label = _config.id2label
+    return next(
+        (int(i) for i, lbl in id2label.items() if "artificial" in lbl.lower()),
+        0
+    )
 
-        # Model labels: 0=artificial, 1=human  →  fake_prob = prob[0]
-        id2label = _model.config.id2label
-        fake_idx = next(
-            (i for i, lbl in id2label.items() if "artificial" in lbl.lower()),
-            0
-        )
-        fake_prob = probs[fake_idx].item() * 100
 
-        return round(fake_prob, 2)
+def run_efficientnet_batch(images: list) -> list:
+    """
+    Batched variant of run_efficientnet — one forward pass for all images.
+    Returns one 0-100 score per image, in order; an image that can't be
+    decoded gets 50.0 without affecting the rest of the batch.
+    """
+    load()
+    scores = [50.0] * len(images)
+    pixel_values, ok = runtime.preprocess_each(_processor, images, "Detector")
+    if not ok:
+        return scores
+    try:
+        if _session is not None:
+            logits = torch.from_numpy(_session.run(["logits"], {"pixel_values": pixel_values})[0])
+            probs = torch.softmax(logits.float(), dim=1)
+        else:
+            probs = _forward_pixels(_model, torch.from_numpy(pixel_values))
+
+        fake_probs = probs[:, fake_label_index()] * 100
 
     except Exception as e:
         print(f"[TruthLens] Detector error: {e}")
-        return 50.0
+        return scores
+
+    for i, p in zip(ok, fake_probs.tolist()):
+        scores[i] = round(p, 2)
+    return scores
+
+
+def _forward(model, pixels: list) -> torch.Tensor:
+    """Eager forward pass over RGB images → (N, num_labels) class probabilities."""
+    return _forward_pixels(model, _processor(images=pixels, return_tensors="pt")["pixel_values"])
+
+
+def _forward_pixels(model, pixel_values: torch.Tensor) -> torch.Tensor:
+    pixel_values = pixel_values.to(_device)
+    if _device.type == "cuda":
+        pixel_values = pixel_values.half()
+
+    with torch.no_grad():
+        logits = model(pixel_values=pixel_values).logits
+        return torch.softmax(logits.float(), dim=1)
+
+
+def cache_version() -> str:
+    """Identifies this stage's outputs for the per-stage cache."""
+    if runtime.use_onnx():
+        return f"{MODEL_ID}|onnx|{runtime.artifact_version('detector')}"
+    if runtime.int8_enabled(_device):
+        return f"{MODEL_ID}|int8"
+    return f"{MODEL_ID}|{'fp16' if _device.type == 'cuda' else 'fp32'}"
 
 
 def get_device_info() -> dict:
@@ -82,7 +199,9 @@ def get_device_info() -> dict:
             torch.cuda.get_device_properties(0).total_memory / 1e9, 1
         ) if torch.cuda.is_available() else None,
         "model": MODEL_ID,
-        "precision": "FP16" if torch.cuda.is_available() else "FP32",
+        "backend": runtime.BACKEND,
+        "precision": "INT8" if runtime.int8_enabled(_device) else
+                     "FP16" if torch.cuda.is_available() and not runtime.use_onnx() else "FP32",
     }
 
 
@@ -92,7 +211,7 @@ def get_model_and_transform():
     Returns (model, transform_fn, device) — transform_fn wraps the ViT processor
     into a torchvision-compatible callable for gradcam.py compatibility.
     """
-    _load_model()
+    model = _explain_model()
 
     import torchvision.transforms as T
     # Grad-CAM needs a torchvision transform that returns a CHW tensor.
@@ -107,4 +226,19 @@ def get_model_and_transform():
         T.Normalize(mean=mean, std=std),
     ])
 
-    return _model, transform, _device
\ No newline at end of file
+    return model, transform, _device
+
+
+def get_explain_components():
+    """
+    Expose model + an exact processor transform for the fused detector/Grad-CAM
+    pass. Unlike get_model_and_transform(), transform_fn runs the real ViT
+    processor so the fused fake probability matches run_efficientnet.
+    Returns (model, transform_fn, fake_idx).
+    """
+    model = _explain_model()
+
+    def transform(image):
+        return _processor(images=image, return_tensors="pt")["pixel_values"][0]
+
+    return model, transform, fake_label_index()
@@ -1,52 +1,86 @@
-import io
+import threading
 import numpy as np
-from PIL import Image
 import insightface
 from insightface.app import FaceAnalysis
+from models.decoded_image import as_decoded
 
 _app = None
+_load_lock = threading.Lock()
+
+MODEL_NAME = "buffalo_l"
+DET_SIZE   = (640, 640)
+CROP_PAD   = 30   # pixels of context kept around the detected box
+NO_FACE_MESSAGE = "No face detected — analyzing full image"
+MIN_FACE_SCORE = 0.5   # extract_faces drops detections below this det_score
 
 def load():
     global _app
     if _app is not None:
         return
-    print("[TruthLens] Loading InsightFace on CUDA...")
-    _app = FaceAnalysis(
-        name="buffalo_l",
-        providers=["CUDAExecutionProvider", "CPUExecutionProvider"]
-    )
-    _app.prepare(ctx_id=0, det_size=(640, 640))
-    print("[TruthLens] InsightFace loaded ✓")
+    # Single-flight: concurrent first requests wait for one load instead of racing
+    with _load_lock:
+        if _app is not None:
+            return
+        print("[TruthLens] Loading InsightFace on CUDA...")
+        app = FaceAnalysis(
+            name=MODEL_NAME,
+            providers=["CUDAExecutionProvider", "CPUExecutionProvider"]
+        )
+        app.prepare(ctx_id=0, det_size=DET_SIZE)
+        _app = app
+        print("[TruthLens] InsightFace loaded ✓")
+
+
+def is_loaded() -> bool:
+    return _app is not None
+
+
+def detect_faces(img_array: np.ndarray) -> list:
+    """
+    Every face InsightFace finds in an HxWx3 RGB array, highest score first:
+    [{"bbox": (x1, y1, x2, y2), "score": 0-1, "kps": [[x, y], ...]}]. Raises on model errors.
+    """
+    load()
+    faces = _app.get(img_array)
+    faces = sorted(faces, key=lambda f: f.det_score, reverse=True)
+    return [{
+        "bbox": tuple(float(v) for v in face.bbox),
+        "score": float(face.det_score),
+        "kps": face.kps.tolist() if face.kps is not None else [],
+    } for face in faces]
 
 
-def extract_face(image_bytes: bytes) -> tuple:
+def pad_box(bbox, shape: tuple, pad: int = CROP_PAD) -> dict:
+    """Integer crop box around `bbox` with `pad` pixels of context, clipped to the image."""
+    h, w = shape[:2]
+    x1, y1, x2, y2 = [int(v) for v in bbox]
+    return {
+        "x1": max(0, x1 - pad),
+        "y1": max(0, y1 - pad),
+        "x2": min(w, x2 + pad),
+        "y2": min(h, y2 + pad),
+    }
+
+
+def extract_face(image) -> tuple:
     load()
     try:
-        img_array = np.array(Image.open(io.BytesIO(image_bytes)).convert("RGB"))
-        faces = _app.get(img_array)
+        img_array = as_decoded(image).rgb_array
+        faces = detect_faces(img_array)
 
         if not faces:
-            return None, {"faces_found": 0, "message": "No face detected — analyzing full image"}
+            return None, {"faces_found": 0, "message": NO_FACE_MESSAGE}
 
         #take highest confidence face
-        face = max(faces, key=lambda f: f.det_score)
-        x1, y1, x2, y2 = [int(v) for v in face.bbox]
-
-        # Add padding
-        h, w = img_array.shape[:2]
-        pad = 30
-        x1 = max(0, x1 - pad)
-        y1 = max(0, y1 - pad)
-        x2 = min(w, x2 + pad)
-        y2 = min(h, y2 + pad)
-
-        face_crop = img_array[y1:y2, x1:x2]
+        face = faces[0]
+        box = pad_box(face["bbox"], img_array.shape)
+        face_crop = img_array[box["y1"]:box["y2"], box["x1"]:box["x2"]]
 
         return face_crop, {
             "faces_found": len(faces),
-            "confidence": round(float(face.det_score) * 100, 2),
-            "landmarks": face.kps.tolist() if face.kps is not None else [],
-            "bbox": {"x1": x1, "y1": y1, "x2": x2, "y2": y2}
+            "confidence": round(face["score"] * 100, 2),
+            "landmarks": face["kps"],
+            "bbox": box
         }
 
     except Exception as e:
@@ -54,9 +88,41 @@ def extract_face(image_bytes: bytes) -> tuple:
         return None, {"faces_found": 0, "message": str(e)}
 
 
-def face_to_bytes(face_array: np.ndarray) -> bytes:
-    """Convert numpy face array back to bytes for model input."""
-    image = Image.fromarray(face_array)
-    buf = io.BytesIO()
-    image.save(buf, format="JPEG")
-    return buf.getvalue()
\ No newline at end of file
+def extract_faces(image, min_score: float = MIN_FACE_SCORE) -> dict:
+    """
+    Every face with det_score >= min_score, most confident first:
+    {"faces_found", "faces": [{"confidence", "landmarks", "bbox"}]}. Crops are
+    rebuilt with crop_from_meta(image, face) so the meta alone can be cached.
+    """
+    load()
+    try:
+        img_array = as_decoded(image).rgb_array
+        faces = [face for face in detect_faces(img_array) if face["score"] >= min_score]
+        if not faces:
+            return {"faces_found": 0, "faces": [], "message": NO_FACE_MESSAGE}
+        return {
+            "faces_found": len(faces),
+            "faces": [{
+                "confidence": round(face["score"] * 100, 2),
+                "landmarks": face["kps"],
+                "bbox": pad_box(face["bbox"], img_array.shape),
+            } for face in faces],
+        }
+
+    except Exception as e:
+        print(f"[TruthLens] InsightFace error: {e}")
+        return {"faces_found": 0, "faces": [], "message": str(e)}
+
+
+def crop_from_meta(image, meta: dict):
+    """Rebuild the face crop from a (possibly cached) extract_face meta — None if no face."""
+    bbox = meta.get("bbox")
+    if not bbox:
+        return None
+    return as_decoded(image).rgb_array[bbox["y1"]:bbox["y2"], bbox["x1"]:bbox["x2"]]
+
+
+def cache_version() -> str:
+    """Identifies this stage's outputs for the per-stage cache."""
+    return f"{MODEL_NAME}|det{DET_SIZE[0]}x{DET_SIZE[1]}|pad{CROP_PAD}"
+
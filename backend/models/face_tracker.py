@@ -0,0 +1,167 @@
+import itertools
+import cv2
+import numpy as np
+from models.face_extractor import detect_faces, pad_box
+
+# Full InsightFace detection runs on every Nth frame fed to the tracker (a keyframe);
+# frames in between reuse the boxes, moved by template matching.
+KEYFRAME_INTERVAL = 10
+# Template-match score (normalized cross-correlation, 0-1) below which a track is
+# considered lost — the frame is re-detected immediately instead.
+MIN_TRACK_CONFIDENCE = 0.6
+# Detections overlapping an existing track by at least this IoU keep its identity
+MATCH_IOU = 0.3
+# The search window extends this many box widths/heights around the last position
+SEARCH_SCALE = 1.0
+# Templates are matched at most this many pixels on their long side — keeps
+# matching cost flat no matter how large the face is in frame
+TEMPLATE_SIDE = 48
+
+
+def iou(a, b) -> float:
+    ix1, iy1 = max(a[0], b[0]), max(a[1], b[1])
+    ix2, iy2 = min(a[2], b[2]), min(a[3], b[3])
+    inter = max(0.0, ix2 - ix1) * max(0.0, iy2 - iy1)
+    union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - inter
+    return inter / union if union > 0 else 0.0
+
+
+class _Track:
+    def __init__(self, track_id: int, face: dict, gray: np.ndarray):
+        self.id = track_id
+        self.observe(face, gray)
+
+    def observe(self, face: dict, gray: np.ndarray):
+        """Re-anchor on a fresh detection — the template is only ever cut from
+        detected boxes, so matching errors never accumulate between keyframes."""
+        self.bbox = face["bbox"]
+        self.det_score = face["score"]
+        x1, y1, x2, y2 = _clip(self.bbox, gray.shape)
+        self.scale = min(1.0, TEMPLATE_SIDE / max(x2 - x1, y2 - y1, 1))
+        self.template = _resize(gray[y1:y2, x1:x2], self.scale)
+
+    def match(self, gray: np.ndarray) -> float:
+        """Moves the box to the best template match near its last position; returns the match score."""
+        x1, y1, x2, y2 = self.bbox
+        mx, my = (x2 - x1) * SEARCH_SCALE, (y2 - y1) * SEARCH_SCALE
+        sx1, sy1, sx2, sy2 = _clip((x1 - mx, y1 - my, x2 + mx, y2 + my), gray.shape)
+        region = _resize(gray[sy1:sy2, sx1:sx2], self.scale)
+        th, tw = self.template.shape
+        if self.template.size == 0 or region.shape[0] < th or region.shape[1] < tw:
+            return 0.0
+        result = cv2.matchTemplate(region, self.template, cv2.TM_CCOEFF_NORMED)
+        _, score, _, (dx, dy) = cv2.minMaxLoc(result)
+        nx1, ny1 = sx1 + dx / self.scale, sy1 + dy / self.scale
+        self.bbox = (nx1, ny1, nx1 + (x2 - x1), ny1 + (y2 - y1))
+        return max(0.0, float(score))
+
+
+def _clip(bbox, shape: tuple) -> tuple:
+    h, w = shape[:2]
+    x1, y1, x2, y2 = bbox
+    return (max(0, int(x1)), max(0, int(y1)), min(w, int(x2)), min(h, int(y2)))
+
+
+def _resize(gray: np.ndarray, scale: float) -> np.ndarray:
+    if scale >= 1.0 or gray.size == 0:
+        return gray
+    h, w = gray.shape
+    return cv2.resize(gray, (max(1, round(w * scale)), max(1, round(h * scale))),
+                      interpolation=cv2.INTER_AREA)
+
+
+class FaceTracker:
+    """
+    Follows faces through a sequence of frames, running InsightFace only on
+    keyframes (every `keyframe_interval` frames), when a track's template
+    match falls below `min_confidence`, or while no face is being tracked.
+    Each face keeps a stable track id across frames; update() returns that
+    frame's observations:
+
+        [{"track_id", "bbox": padded crop box, "confidence": 0-100, "detected": bool}]
+
+    Not thread-safe — one tracker per video, fed frames in order. `detect` is
+    the full detector (face_extractor.detect_faces, or the model server's).
+    """
+
+    def __init__(self, keyframe_interval: int = KEYFRAME_INTERVAL,
+                 min_confidence: float = MIN_TRACK_CONFIDENCE, detect=detect_faces):
+        self.keyframe_interval = max(1, keyframe_interval)
+        self.detect = detect
+        self.min_confidence = min_confidence
+        self._tracks = []
+        self._ids = itertools.count(1)
+        self._since_keyframe = None
+        self.frames = 0
+        self.detections = 0
+
+    def update(self, rgb: np.ndarray) -> list:
+        gray = cv2.cvtColor(rgb, cv2.COLOR_RGB2GRAY)
+        self.frames += 1
+
+        # Nothing to track yet (or every face has left) — look for faces on every frame
+        due = (not self._tracks or self._since_keyframe is None
+               or self._since_keyframe >= self.keyframe_interval)
+        scores = None
+        if not due:
+            scores = [track.match(gray) for track in self._tracks]
+            # One lost face is enough to re-detect — it also picks up new faces
+            if any(score < self.min_confidence for score in scores):
+                scores = None
+        if scores is None:
+            self._detect(rgb, gray)
+            scores = [track.det_score for track in self._tracks]
+            detected = True
+            self._since_keyframe = 0
+        else:
+            detected = False
+        self._since_keyframe += 1
+
+        return [{
+            "track_id": track.id,
+            "bbox": pad_box(track.bbox, rgb.shape),
+            "confidence": round(score * 100, 2),
+            "detected": detected,
+        } for track, score in zip(self._tracks, scores)]
+
+    def _detect(self, rgb: np.ndarray, gray: np.ndarray):
+        self.detections += 1
+        try:
+            faces = self.detect(rgb)
+        except Exception as e:
+            print(f"[TruthLens] InsightFace error: {e}")
+            faces = []
+
+        # Greedy IoU association — best-overlapping pairs claim each other first
+        pairs = sorted(
+            ((iou(track.bbox, face["bbox"]), t, f)
+             for t, track in enumerate(self._tracks) for f, face in enumerate(faces)),
+            reverse=True,
+        )
+        matched, used_tracks, used_faces = {}, set(), set()
+        for overlap, t, f in pairs:
+            if overlap < MATCH_IOU:
+                break
+            if t in used_tracks or f in used_faces:
+                continue
+            matched[f] = self._tracks[t]
+            used_tracks.add(t)
+            used_faces.add(f)
+
+        # Tracks without a matching detection end here; unmatched faces start new ones
+        tracks = []
+        for f, face in enumerate(faces):
+            track = matched.get(f)
+            if track is None:
+                track = _Track(next(self._ids), face, gray)
+            else:
+                track.observe(face, gray)
+            tracks.append(track)
+        self._tracks = tracks
+
+    def stats(self) -> dict:
+        return {
+            "frames": self.frames,
+            "detections": self.detections,
+            "tracked_frames": self.frames - self.detections,
+        }
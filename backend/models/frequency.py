@@ -1,10 +1,21 @@
-import io
-from PIL import Image
 import numpy as np
 import cv2
+from models.decoded_image import as_decoded
 
+# Both the DCT and the FFT run on one fixed-size working tile, so cost and memory
+# are constant regardless of upload resolution (a 24MP full-res complex FFT alone
+# was hundreds of MB of temporaries).
+TILE_SIZE = 512
+# Half-width of the low-frequency block around DC used for the FFT center energy
+CENTER_RADIUS = 5
 
-def frequency_analysis(image_bytes: bytes) -> float:
+
+def cache_version() -> str:
+    """Identifies this stage's outputs for the per-stage cache."""
+    return f"dct-fft|tile{TILE_SIZE}|r{CENTER_RADIUS}"
+
+
+def frequency_analysis(image) -> float:
     """
     Analyzes the frequency domain of the image using DCT + FFT.
     AI-generated images tend to have unnatural high-frequency patterns
@@ -12,15 +23,12 @@ def frequency_analysis(image_bytes: bytes) -> float:
     Returns a float 0-100 — higher = more suspicious frequency patterns.
     """
     try:
-        image = Image.open(io.BytesIO(image_bytes)).convert("L")  # grayscale
-        img_array = np.array(image, dtype=np.float32)
-
-        h, w = img_array.shape
+        img_array = as_decoded(image).gray_array
 
         # ── DCT Analysis ──────────────────────────────────────────────────────
         # Work on fixed-size tiles to normalize for image resolution.
         # Large images have naturally more high-freq energy — tiling removes that bias.
-        tile_size = 512
+        tile_size = TILE_SIZE
         img_tile = cv2.resize(img_array, (tile_size, tile_size))
         dct = cv2.dct(img_tile)
 
@@ -37,22 +45,8 @@ def frequency_analysis(image_bytes: bytes) -> float:
         hf_score = min(hf_ratio * 150, 100)
 
         # ── FFT Analysis ──────────────────────────────────────────────────────
-        fft = np.fft.fft2(img_array)
-        fft_shift = np.fft.fftshift(fft)
-        magnitude = np.log(np.abs(fft_shift) + 1)
-
         # AI images show periodic grid artifacts in FFT at regular intervals.
-        center_h, center_w = h // 2, w // 2
-        ring_mask = np.zeros_like(magnitude)
-        for r in range(center_h - 5, center_h + 5):
-            for c in range(center_w - 5, center_w + 5):
-                if 0 <= r < h and 0 <= c < w:
-                    ring_mask[r, c] = 1
-
-        center_energy = np.mean(magnitude * ring_mask)
-        total_energy  = np.mean(magnitude) + 1e-8
-        fft_ratio = center_energy / total_energy
-
+        fft_ratio = _fft_center_ratio(img_tile)
         fft_score = min(fft_ratio * 10, 100)
 
         # ── Combined score ────────────────────────────────────────────────────
@@ -62,3 +56,30 @@ def frequency_analysis(image_bytes: bytes) -> float:
     except Exception as e:
         print(f"[TruthLens] Frequency analysis error: {e}")
         return 50.0
+
+
+def _fft_center_ratio(tile: np.ndarray, radius: int = CENTER_RADIUS) -> float:
+    """
+    Share of log-magnitude spectrum energy in the (2r x 2r) block around DC —
+    the same quantity as masking the fftshift-ed full spectrum, computed from
+    the real-input half spectrum with slices instead of a full-size mask.
+    """
+    h, w = tile.shape
+    # rfft2 keeps columns 0..w//2 only; the rest are complex conjugates
+    magnitude = np.log1p(np.abs(np.fft.rfft2(tile)))
+    magnitude = np.fft.fftshift(magnitude, axes=0)
+    ch = h // 2
+
+    # Full spectrum sum: interior columns stand in for their mirrored twin too
+    last = -1 if w % 2 == 0 else None
+    total = magnitude[:, 0].sum() + 2 * magnitude[:, 1:last].sum()
+    if last is not None:
+        total += magnitude[:, -1].sum()
+
+    # Block rows ch-r..ch+r-1, cols -r..r-1 (relative to DC):
+    #   cols 0..r-1 are stored directly,
+    #   cols -r..-1 mirror to cols 1..r with rows reflected about DC.
+    center = magnitude[ch - radius:ch + radius, :radius].sum()
+    center += magnitude[ch - radius + 1:ch + radius + 1, 1:radius + 1].sum()
+
+    return float(center / (total + 1e-8))
@@ -1,46 +1,63 @@
 import io
+import os
+import copy
+import threading
 import cv2
 import numpy as np
 import torch
 import torch.nn.functional as F
 import base64
 from PIL import Image
+from models.decoded_image import as_decoded
+
+
+# Bump when the CAM computation or overlay rendering changes
+GRADCAM_VERSION = "gradcam-v3"
 
 
 class GradCam:
+    """
+    Grad-CAM with hooks registered once and reused for every request.
+
+    The forward hook swaps the target layer's output for a fresh leaf tensor, so
+    gradients are taken w.r.t. that activation with torch.autograd.grad — no
+    parameter .grad buffers are touched and no zero_grad() is needed. Captures
+    are thread-local: concurrent generate() calls, or plain inference on the same
+    model, never see each other's activations.
+    """
+
     def __init__(self, model, target_layer):
         self.model = model
         self.target_layer = target_layer
-        self.gradients = None
-        self.activation = None
+        self._local = threading.local()
+        self._fwd_handle = None
         self.register_hooks()
 
     def register_hooks(self):
         def forward_hook(module, inp, output):
-            # Some layers return tuples/ModelOutput — always grab first tensor element
+            if not getattr(self._local, "capturing", False):
+                return None
+            # Some layers return tuples — always grab first tensor element
             if isinstance(output, torch.Tensor):
-                self.activation = output.detach()
-            elif isinstance(output, (tuple, list)) and len(output) > 0:
-                self.activation = output[0].detach()
-            else:
-                # ModelOutput / dataclass — try index access
-                try:
-                    self.activation = output[0].detach()
-                except Exception:
-                    self.activation = None
-
-        def backward_hook(module, grad_input, grad_output):
-            if grad_output and grad_output[0] is not None:
-                self.gradients = grad_output[0].detach()
+                leaf = output.detach().requires_grad_(True)
+                replaced = leaf
+            elif isinstance(output, (tuple, list)) and len(output) > 0 \
+                    and isinstance(output[0], torch.Tensor):
+                leaf = output[0].detach().requires_grad_(True)
+                replaced = type(output)([leaf, *output[1:]])
             else:
-                self.gradients = None
+                # ModelOutput / dataclass — can't be swapped for a leaf
+                self._local.activation = None
+                return None
+            self._local.activation = leaf
+            return replaced
 
         self._fwd_handle = self.target_layer.register_forward_hook(forward_hook)
-        self._bwd_handle = self.target_layer.register_full_backward_hook(backward_hook)
 
     def remove_hooks(self):
-        self._fwd_handle.remove()
-        self._bwd_handle.remove()
+        if self._fwd_handle is not None:
+            self._fwd_handle.remove()
+            self._fwd_handle = None
 
     def _to_spatial(self, t: torch.Tensor) -> torch.Tensor:
         """
@@ -64,19 +81,35 @@ class GradCam:
         return t  # already 4D
 
     def generate(self, tensor: torch.Tensor, class_idx: int = 0) -> np.ndarray:
-        self.model.zero_grad()
-        output = self.model(tensor.float())
+        cam, _ = self.explain(tensor, class_idx)
+        return cam
+
+    def explain(self, tensor: torch.Tensor, class_idx: int = 0) -> tuple:
+        """
+        One forward + one backward pass. Returns (cam, probs) — the class
+        probabilities come from the same forward that produced the CAM.
+        """
+        self._local.capturing = True
+        self._local.activation = None
+        try:
+            with torch.enable_grad():
+                output = self.model(tensor.float())
+        finally:
+            self._local.capturing = False
+        activation = self._local.activation
+        self._local.activation = None
+
+        if activation is None:
+            raise RuntimeError("Hooks did not capture activations/gradients.")
 
         # HuggingFace models wrap output in SequenceClassifierOutput
         logits = output.logits if hasattr(output, "logits") else output[0]
+        probs = torch.softmax(logits[0].detach().float(), dim=0)
         score = logits[0][class_idx]
-        score.backward()
+        gradients, = torch.autograd.grad(score, activation)
 
-        if self.activation is None or self.gradients is None:
-            raise RuntimeError("Hooks did not capture activations/gradients.")
-
-        act  = self._to_spatial(self.activation)
-        grad = self._to_spatial(self.gradients)
+        act  = self._to_spatial(activation.detach())
+        grad = self._to_spatial(gradients)
 
         weights = grad.mean(dim=(2, 3), keepdim=True)
         cam = (weights * act).sum(dim=1, keepdim=True)
@@ -87,9 +120,87 @@ class GradCam:
             cam = np.array([[float(cam)]])
 
         cam = (cam - cam.min()) / (cam.max() - cam.min() + 1e-8)
-        self.remove_hooks()
+        return cam, probs
+
+
+class GradCamEngine:
+    """
+    Resident Grad-CAM explainer for the detector.
+
+    Grad-CAM always runs in FP32 on CPU (avoids OOM after CLIP + Swin on GPU).
+    When the detector already lives on CPU in FP32 the explainer shares it —
+    zero extra memory; otherwise (CUDA / FP16) one FP32 CPU copy is made on
+    first use instead of a deepcopy per request. Backward passes are bounded by a
+    semaphore (TRUTHLENS_GRADCAM_CONCURRENCY, default 1 = serialized).
+    """
+
+    def __init__(self, model, max_concurrency: int = 1):
+        self.source = model
+        param = next(model.parameters())
+        self.shared = param.device.type == "cpu" and param.dtype == torch.float32
+        self.model = model if self.shared else copy.deepcopy(model).float().cpu()
+        self.model.eval()
+        # Gradients are only needed w.r.t. the hooked activation, never the weights.
+        # The shared detector is left untouched — autograd.grad on the captured leaf
+        # works either way, and its owner may rely on the parameters' flags.
+        if not self.shared:
+            for p in self.model.parameters():
+                p.requires_grad_(False)
+
+        self.target_layer = _find_target_layer(self.model)
+        self.gradcam = GradCam(self.model, self.target_layer)
+        self.max_concurrency = max(1, int(max_concurrency))
+        self._slots = threading.BoundedSemaphore(self.max_concurrency)
+        self._requests = 0
+
+    def generate(self, tensor: torch.Tensor, class_idx: int = 0) -> np.ndarray:
+        cam, _ = self.explain(tensor, class_idx)
         return cam
 
+    def explain(self, tensor: torch.Tensor, class_idx: int = 0) -> tuple:
+        with self._slots:
+            self._requests += 1
+            return self.gradcam.explain(tensor.cpu(), class_idx=class_idx)
+
+    def memory_bytes(self) -> int:
+        """Extra resident memory held by the explainer (0 when sharing the detector)."""
+        if self.shared:
+            return 0
+        tensors = list(self.model.parameters()) + list(self.model.buffers())
+        return sum(t.numel() * t.element_size() for t in tensors)
+
+    def stats(self) -> dict:
+        return {
+            "shared_with_detector": self.shared,
+            "resident_mb": round(self.memory_bytes() / 2**20, 1),
+            "max_concurrency": self.max_concurrency,
+            "requests": self._requests,
+        }
+
+
+_engine = None
+_engine_lock = threading.Lock()
+
+
+def get_engine(model) -> GradCamEngine:
+    """Builds the Grad-CAM engine on first use and reuses it for every request."""
+    global _engine
+    with _engine_lock:
+        if _engine is None or _engine.source is not model:
+            _engine = GradCamEngine(
+                model,
+                max_concurrency=int(os.getenv("TRUTHLENS_GRADCAM_CONCURRENCY", "1")),
+            )
+        return _engine
+
+
+def is_loaded() -> bool:
+    return _engine is not None
+
+
+def gradcam_stats() -> dict:
+    return _engine.stats() if _engine is not None else {"loaded": False}
+
 
 def _find_target_layer(model):
     """
@@ -128,37 +239,60 @@ def _find_target_layer(model):
     raise ValueError("[TruthLens] Could not find a Grad-CAM target layer.")
 
 
-def generate_heatmap(model, transform, device, image_bytes: bytes) -> str:
+def generate_heatmap(model, transform, device, image, class_idx: int = 0) -> str:
     """
-    Runs Grad-CAM on the image (always CPU to avoid OOM after CLIP + Swin on GPU).
+    Runs Grad-CAM on the image (always CPU to avoid OOM after CLIP + Swin on GPU)
+    for `class_idx` — the detector's "artificial" label, as in explain_image.
     Returns base64 JPEG heatmap — red = high suspicion, blue = clean.
     Handles Swin, ViT, EfficientNet, ResNet backbones safely.
     """
     try:
-        import copy
-        image     = Image.open(io.BytesIO(image_bytes)).convert("RGB")
-        img_array = np.array(image)
+        decoded   = as_decoded(image)
+        img_array = decoded.rgb_array
+
+        engine = get_engine(model)
+        tensor = transform(decoded.rgb).unsqueeze(0).float()  # CPU already
+        cam    = engine.generate(tensor, class_idx=class_idx)
+
+        return _render_overlay(img_array, cam)
 
-        model_cpu = copy.deepcopy(model).float().cpu()
-        model_cpu.eval()
+    except Exception as e:
+        print(f"[TruthLens] Grad-CAM error: {e}")
+        return ""
 
-        tensor       = transform(image).unsqueeze(0).float()  # CPU already
-        target_layer = _find_target_layer(model_cpu)
-        gradcam      = GradCam(model_cpu, target_layer)
-        cam          = gradcam.generate(tensor, class_idx=0)   # 0 = artificial
 
-        cam_resized = cv2.resize(cam, (img_array.shape[1], img_array.shape[0]))
-        heatmap     = cv2.applyColorMap(np.uint8(255 * cam_resized), cv2.COLORMAP_JET)
-        heatmap     = cv2.cvtColor(heatmap, cv2.COLOR_BGR2RGB)
-        overlay     = (0.5 * img_array + 0.5 * heatmap).astype(np.uint8)
+def explain_image(model, transform, image, class_idx: int = 0) -> tuple:
+    """
+    Fused detector + Grad-CAM: a single forward/backward pass yields both the
+    fake probability (0-100, like run_efficientnet) and the heatmap.
+    Returns (fake_prob, heatmap_b64); (50.0, "") on failure like the two
+    separate stages it replaces.
+    """
+    try:
+        decoded   = as_decoded(image)
+        img_array = decoded.rgb_array
 
-        buf = io.BytesIO()
-        Image.fromarray(overlay).save(buf, format="JPEG", quality=85)
-        b64 = base64.b64encode(buf.getvalue()).decode()
+        engine     = get_engine(model)
+        tensor     = transform(decoded.rgb).unsqueeze(0).float()
+        cam, probs = engine.explain(tensor, class_idx=class_idx)
 
-        del model_cpu
-        return f"data:image/jpeg;base64,{b64}"
+        fake_prob = round(probs[class_idx].item() * 100, 2)
+        return fake_prob, _render_overlay(img_array, cam)
 
     except Exception as e:
-        print(f"[TruthLens] Grad-CAM error: {e}")
-        return ""
+        print(f"[TruthLens] Fused detector/Grad-CAM error: {e}")
+        return 50.0, ""
+
+
+def _render_overlay(img_array: np.ndarray, cam: np.ndarray) -> str:
+    """Blend the CAM over the image — returns a base64 JPEG data URL."""
+    cam_resized = cv2.resize(cam, (img_array.shape[1], img_array.shape[0]))
+    heatmap     = cv2.applyColorMap(np.uint8(255 * cam_resized), cv2.COLORMAP_JET)
+    heatmap     = cv2.cvtColor(heatmap, cv2.COLOR_BGR2RGB)
+    overlay     = (0.5 * img_array + 0.5 * heatmap).astype(np.uint8)
+
+    buf = io.BytesIO()
+    Image.fromarray(overlay).save(buf, format="JPEG", quality=85)
+    b64 = base64.b64encode(buf.getvalue()).decode()
+
+    return f"data:image/jpeg;base64,{b64}"
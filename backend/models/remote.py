@@ -0,0 +1,224 @@
+import os
+import queue
+import threading
+import time
+from multiprocessing import resource_tracker
+from multiprocessing.connection import Client
+from multiprocessing.shared_memory import SharedMemory
+import numpy as np
+from models.decoded_image import as_decoded
+
+# Where model_server.py listens — "host:port" (TCP) or a filesystem path (Unix socket)
+DEFAULT_ADDRESS = "127.0.0.1:7070"
+# Stage cache versions are fetched from the server and re-checked this often (in
+# the background), so a server restarted with new models or prompts stops
+# matching old cached scores within one TTL
+VERSION_TTL = 30.0
+
+
+def parse_address(value: str):
+    """("host", port) for "host:port", else the string itself as a Unix socket path."""
+    host, sep, port = value.rpartition(":")
+    if sep and port.isdigit() and "/" not in value:
+        return host or "127.0.0.1", int(port)
+    return value
+
+
+def authkey() -> bytes:
+    """
+    The shared secret for the connection handshake. Messages are pickled, so
+    anyone who knows the key can run code in the model server — there is no
+    default, and both sides refuse to start without one.
+    """
+    key = os.getenv("TRUTHLENS_MODEL_SERVER_KEY", "")
+    if not key:
+        raise RuntimeError(
+            "[TruthLens] TRUTHLENS_MODEL_SERVER_KEY must be set to a shared secret on the model "
+            "server and every API worker (e.g. python -c \"import secrets; print(secrets.token_hex(32))\")"
+        )
+    return key.encode()
+
+
+def attach(name: str) -> SharedMemory:
+    """Open a client-created block without adopting it — only the creator unlinks it."""
+    try:
+        return SharedMemory(name=name, track=False)   # Python 3.13+
+    except TypeError:
+        shm = SharedMemory(name=name)
+        resource_tracker.unregister(shm._name, "shared_memory")
+        return shm
+
+
+def read_images(shm: SharedMemory, specs: list) -> list:
+    """RGB arrays viewing the shared block in place — no copy, no decode."""
+    return [np.ndarray(shape, dtype=np.uint8, buffer=shm.buf, offset=offset) for offset, shape in specs]
+
+
+class ModelClient:
+    """
+    Runs model inference in a model_server.py process instead of this one.
+
+    Pixels go through one shared-memory block per call (only names, offsets and
+    shapes cross the socket); results come back pickled. Connections are pooled —
+    a multiprocessing Connection is not thread-safe, so each call borrows one.
+    Wrappers mirror the local functions' signatures and error fallbacks.
+    """
+
+    def __init__(self, address, max_connections: int = 8, timeout: float = 120.0):
+        self.address = address
+        self._authkey = authkey()
+        self.timeout = timeout
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(max(1, max_connections))
+        self._versions = {}
+        self._versions_at = 0.0
+        self._versions_lock = threading.Lock()
+        self._refreshing = False
+
+    def call(self, op: str, images: list = (), **kwargs):
+        arrays = [as_decoded(image).rgb_array for image in images]
+        shm = SharedMemory(create=True, size=max(1, sum(a.nbytes for a in arrays)))
+        try:
+            specs, offset = [], 0
+            for arr in arrays:
+                np.ndarray(arr.shape, dtype=np.uint8, buffer=shm.buf, offset=offset)[...] = arr
+                specs.append((offset, arr.shape))
+                offset += arr.nbytes
+
+            with self._slots:
+                conn = self._borrow()
+                try:
+                    conn.send((op, shm.name, specs, kwargs))
+                    if not conn.poll(self.timeout):
+                        raise TimeoutError(f"Model server did not answer {op} within {self.timeout:.0f}s")
+                    status, payload = conn.recv()
+                except BaseException:
+                    conn.close()   # may hold a half-read reply — never reuse it
+                    raise
+                self._idle.put(conn)
+        finally:
+            shm.close()
+            shm.unlink()
+
+        if status == "error":
+            raise RuntimeError(f"Model server {op} failed: {payload}")
+        return payload
+
+    def _borrow(self):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            return Client(self.address, authkey=self._authkey)
+
+    # ── Local-function equivalents ────────────────────────────────────────────
+
+    def run_efficientnet_batch(self, images: list) -> list:
+        return self._score_batch("detector", images, "Detector")
+
+    def run_clip_batch(self, images: list) -> list:
+        return self._score_batch("clip", images, "CLIP")
+
+    def _score_batch(self, op: str, images: list, label: str) -> list:
+        # Decoded one by one, as in-process — a corrupt image only costs its own score
+        scores, arrays, ok = [50.0] * len(images), [], []
+        for i, image in enumerate(images):
+            try:
+                arrays.append(as_decoded(image).rgb_array)
+                ok.append(i)
+            except Exception as e:
+                print(f"[TruthLens] {label} error on batch item {i}: {e}")
+        if not ok:
+            return scores
+        try:
+            fresh = self.call(op, arrays)
+        except Exception as e:
+            print(f"[TruthLens] {label} error: {e}")
+            return scores
+        for i, score in zip(ok, fresh):
+            scores[i] = score
+        return scores
+
+    def extract_face(self, image) -> tuple:
+        from models.face_extractor import crop_from_meta
+        try:
+            meta = self.call("face", [image])
+        except Exception as e:
+            print(f"[TruthLens] InsightFace error: {e}")
+            return None, {"faces_found": 0, "message": str(e)}
+        return crop_from_meta(image, meta), meta
+
+    def extract_faces(self, image, min_score: float) -> dict:
+        try:
+            return self.call("faces", [image], min_score=min_score)
+        except Exception as e:
+            print(f"[TruthLens] InsightFace error: {e}")
+            return {"faces_found": 0, "faces": [], "message": str(e)}
+
+    def detect_faces(self, img_array: np.ndarray) -> list:
+        return self.call("detect_faces", [img_array])
+
+    def generate_heatmap(self, image) -> str:
+        try:
+            return self.call("heatmap", [image])
+        except Exception as e:
+            print(f"[TruthLens] Grad-CAM error: {e}")
+            return ""
+
+    def explain_image(self, image) -> tuple:
+        try:
+            return tuple(self.call("explain", [image]))
+        except Exception as e:
+            print(f"[TruthLens] Grad-CAM error: {e}")
+            return 50.0, ""
+
+    def cache_version(self, stage: str) -> str:
+        """
+        The server's version for a stage. Once known this never touches the
+        socket — a stale set is refreshed on a background thread while the last
+        known one is served. Only the very first call blocks on the fetch (keep
+        it off the event loop); it raises if the server can't be reached.
+        """
+        with self._versions_lock:
+            versions = self._versions
+            if versions and not self._refreshing and time.monotonic() - self._versions_at > VERSION_TTL:
+                self._refreshing = True
+                threading.Thread(target=self._refresh_in_background, name="truthlens-versions", daemon=True).start()
+        if not versions:
+            try:
+                versions = self.refresh_versions()
+            except Exception as e:
+                raise RuntimeError(f"Model server unavailable — stage versions unknown: {e}") from e
+        return versions[stage]
+
+    def refresh_versions(self) -> dict:
+        versions = self.call("versions")
+        with self._versions_lock:
+            self._versions = versions
+            self._versions_at = time.monotonic()
+        return versions
+
+    def _refresh_in_background(self):
+        try:
+            self.refresh_versions()
+        except Exception as e:
+            print(f"[TruthLens] Model server version refresh failed, keeping the last known versions: {e}")
+            with self._versions_lock:
+                self._versions_at = time.monotonic()   # try again after another TTL
+        finally:
+            with self._versions_lock:
+                self._refreshing = False
+
+    def status(self) -> dict:
+        return self.call("status")
+
+
+def create_model_client():
+    """A ModelClient when TRUTHLENS_MODEL_SERVER is set — otherwise None (models run in-process)."""
+    address = os.getenv("TRUTHLENS_MODEL_SERVER", "").strip()
+    if not address:
+        return None
+    return ModelClient(
+        parse_address(address),
+        max_connections=int(os.getenv("TRUTHLENS_MODEL_SERVER_CONNECTIONS", "8")),
+        timeout=float(os.getenv("TRUTHLENS_MODEL_SERVER_TIMEOUT", "120")),
+    )
@@ -0,0 +1,140 @@
+import hashlib
+import os
+import threading
+
+# Inference backend for the detector and the CLIP towers:
+#   "torch" — eager PyTorch (FP16 on CUDA, FP32 on CPU)
+#   "onnx"  — ONNX Runtime on CPU, from artifacts written by `python export.py onnx`
+BACKEND = os.getenv("TRUTHLENS_BACKEND", "torch").lower()
+ONNX_DIR = os.getenv("TRUTHLENS_ONNX_DIR", "onnx_models")
+# Intra-op threads per inference (0 = runtime default, usually one per core).
+# Requests are already serialized per model by the micro-batcher, so one batch
+# at a time gets every core.
+INTRA_OP_THREADS = int(os.getenv("TRUTHLENS_INTRA_OP_THREADS", "0"))
+# "int8" — dynamic INT8 quantization of the Linear layers of the eager detector and
+# CLIP vision tower (CPU only; ~4x smaller weights). "none" keeps FP32.
+QUANTIZE = os.getenv("TRUTHLENS_QUANTIZE", "none").lower()
+# Grad-CAM heatmaps. Quantized Linear layers have no backward pass, so in INT8
+# mode a heatmap needs a second, full FP32 detector — which would undo the
+# memory saving. "auto" = on, except in INT8 mode; "1" forces them on (FP32
+# copy and all), "0" turns them off everywhere.
+HEATMAPS = os.getenv("TRUTHLENS_HEATMAPS", "auto").lower()
+
+_versions = {}
+_versions_lock = threading.Lock()
+_torch_threads_set = False
+
+
+def use_onnx() -> bool:
+    if BACKEND not in ("torch", "onnx"):
+        raise ValueError(f"[TruthLens] Unknown TRUTHLENS_BACKEND: {BACKEND} (torch | onnx)")
+    return BACKEND == "onnx"
+
+
+# Everything `python export.py onnx` writes — the ONNX backend needs all of them
+ONNX_ARTIFACTS = ("detector", "clip_vision", "clip_text")
+
+
+def artifact_path(name: str) -> str:
+    return os.path.join(ONNX_DIR, f"{name}.onnx")
+
+
+def missing_artifacts() -> list:
+    """Paths of exported artifacts the ONNX backend can't find — always empty on the torch backend."""
+    if not use_onnx():
+        return []
+    return [artifact_path(name) for name in ONNX_ARTIFACTS if not os.path.exists(artifact_path(name))]
+
+
+def _require_artifact(name: str) -> str:
+    path = artifact_path(name)
+    if not os.path.exists(path):
+        raise RuntimeError(f"[TruthLens] {path} not found — run `python export.py onnx` first")
+    return path
+
+
+def artifact_version(name: str) -> str:
+    """Short content hash of an exported artifact — re-exporting invalidates cached scores."""
+    path = _require_artifact(name)
+    key = (path, os.path.getmtime(path))
+    with _versions_lock:
+        if key not in _versions:
+            digest = hashlib.sha256()
+            with open(path, "rb") as f:
+                for block in iter(lambda: f.read(1 << 20), b""):
+                    digest.update(block)
+            _versions[key] = digest.hexdigest()[:12]
+        return _versions[key]
+
+
+def load_session(name: str):
+    """ONNX Runtime CPU session for an exported artifact, with TRUTHLENS_INTRA_OP_THREADS applied."""
+    try:
+        import onnxruntime as ort
+    except ImportError:
+        raise RuntimeError("[TruthLens] TRUTHLENS_BACKEND=onnx needs onnxruntime (pip install onnxruntime)")
+
+    path = _require_artifact(name)
+    options = ort.SessionOptions()
+    options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+    options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+    options.inter_op_num_threads = 1
+    if INTRA_OP_THREADS > 0:
+        options.intra_op_num_threads = INTRA_OP_THREADS
+    print(f"[TruthLens] Loading {path} (ONNX Runtime, {INTRA_OP_THREADS or 'default'} threads)")
+    return ort.InferenceSession(path, options, providers=["CPUExecutionProvider"])
+
+
+def preprocess_each(processor, images: list, label: str) -> tuple:
+    """
+    Decodes and preprocesses a micro-batch one image at a time, so an image that
+    fails (a corrupt upload) drops out alone instead of failing every job that
+    shares the forward pass. Returns (stacked float32 pixel_values for the
+    images that made it, or None if none did; their indices into `images`).
+    """
+    import numpy as np
+    from models.decoded_image import as_decoded
+    pixel_values, ok = [], []
+    for i, image in enumerate(images):
+        try:
+            pixel_values.append(processor(images=as_decoded(image).rgb, return_tensors="np")["pixel_values"][0])
+            ok.append(i)
+        except Exception as e:
+            print(f"[TruthLens] {label} error on batch item {i}: {e}")
+    return (np.stack(pixel_values) if pixel_values else None), ok
+
+
+def configure_torch_threads():
+    """Apply TRUTHLENS_INTRA_OP_THREADS to eager PyTorch (process-wide, once)."""
+    global _torch_threads_set
+    if INTRA_OP_THREADS > 0 and not _torch_threads_set:
+        import torch
+        torch.set_num_threads(INTRA_OP_THREADS)
+        _torch_threads_set = True
+
+
+def int8_enabled(device) -> bool:
+    """INT8 applies to eager CPU models only — CUDA keeps FP16, ONNX uses its own artifacts."""
+    return QUANTIZE == "int8" and not use_onnx() and device.type == "cpu"
+
+
+def heatmaps_enabled(device) -> bool:
+    if HEATMAPS in ("0", "off", "none", "false"):
+        return False
+    if HEATMAPS == "auto":
+        return not int8_enabled(device)
+    return True
+
+
+def quantize_linear(module):
+    """
+    Dynamic INT8 quantization of every nn.Linear in `module`, in place: weights are
+    stored as int8, activations are quantized per batch at run time. No
+    calibration data is needed, and the FP32 Linear weights are freed. Returns the
+    module to use — a bare nn.Linear is replaced rather than modified.
+    """
+    import torch
+    if isinstance(module, torch.nn.Linear):
+        # quantize_dynamic only swaps children, never the root module itself
+        return quantize_linear(torch.nn.Sequential(module))[0]
+    return torch.ao.quantization.quantize_dynamic(module, {torch.nn.Linear}, dtype=torch.qint8, inplace=True)
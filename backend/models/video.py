@@ -0,0 +1,173 @@
+import os
+import cv2
+import numpy as np
+
+VIDEO_EXTENSIONS = {".mp4", ".mov", ".m4v", ".avi", ".mkv", ".webm", ".mpg", ".mpeg", ".wmv"}
+
+# Frames are downscaled to this long side before analysis — every model works on
+# far smaller inputs (InsightFace 640, frequency tile 512, detector/CLIP ≤384),
+# and it keeps a batch of 4K frames from costing hundreds of MB.
+FRAME_MAX_SIDE = 1280
+# Side of the grayscale thumbnail compared between frames for scene changes
+SCENE_THUMB = 32
+
+# A frame's ensemble score above this counts it as suspicious in the summary
+SUSPICIOUS_FRAME_SCORE = 55.0
+
+
+def is_video(filename: str = "", content_type: str = "") -> bool:
+    if content_type and content_type.lower().startswith("video/"):
+        return True
+    return os.path.splitext(filename or "")[1].lower() in VIDEO_EXTENSIONS
+
+
+def video_info(path: str) -> dict:
+    cap = cv2.VideoCapture(path)
+    try:
+        if not cap.isOpened():
+            raise ValueError("Could not open video")
+        fps = cap.get(cv2.CAP_PROP_FPS) or 0.0
+        frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT) or 0)
+        return {
+            "fps": round(fps, 2),
+            "frame_count": frames,
+            "duration": round(frames / fps, 2) if fps > 0 else None,
+            "width": int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)),
+            "height": int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)),
+        }
+    finally:
+        cap.release()
+
+
+def _scene_thumb(frame: np.ndarray) -> np.ndarray:
+    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+    return cv2.resize(gray, (SCENE_THUMB, SCENE_THUMB), interpolation=cv2.INTER_AREA).astype(np.float32)
+
+
+def _to_rgb(frame: np.ndarray) -> np.ndarray:
+    h, w = frame.shape[:2]
+    scale = FRAME_MAX_SIDE / max(h, w)
+    if scale < 1:
+        frame = cv2.resize(frame, (round(w * scale), round(h * scale)), interpolation=cv2.INTER_AREA)
+    return cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+
+
+def sample_frames(path: str, fps: float = 2.0, mode: str = "fps",
+                  scene_threshold: float = 0.12, max_gap: float = 5.0, max_frames: int = 300):
+    """
+    Yields (frame_index, timestamp_seconds, rgb_array) for sampled frames, decoding
+    the file sequentially — only the current frame is ever held in memory.
+
+    mode="fps"   — one frame every 1/fps seconds.
+    mode="scene" — frames are probed at `fps`, but only kept when the picture
+                   changed by more than `scene_threshold` (mean absolute difference
+                   of a small grayscale thumbnail, 0-1) since the last kept frame,
+                   or `max_gap` seconds have passed. Static shots collapse to a
+                   handful of frames; cuts and motion are always sampled.
+    When the frame count is known, the probe step is widened so `max_frames`
+    covers the whole clip rather than only its beginning.
+    """
+    cap = cv2.VideoCapture(path)
+    if not cap.isOpened():
+        raise ValueError("Could not open video")
+    try:
+        native_fps = cap.get(cv2.CAP_PROP_FPS) or 25.0
+        step = max(1, round(native_fps / fps)) if fps > 0 else 1
+        frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT) or 0)
+        if frame_count > 0 and max_frames > 0:
+            step = max(step, -(-frame_count // max_frames))
+
+        index = -1
+        kept = 0
+        last_thumb = None
+        last_time = None
+        while kept < max_frames:
+            # grab() advances without the colour conversion/copy of retrieve()
+            if not cap.grab():
+                break
+            index += 1
+            if index % step:
+                continue
+            ok, frame = cap.retrieve()
+            if not ok:
+                break
+            timestamp = index / native_fps
+
+            if mode == "scene":
+                thumb = _scene_thumb(frame)
+                changed = last_thumb is None or \
+                    float(np.mean(np.abs(thumb - last_thumb))) / 255.0 >= scene_threshold
+                if not changed and timestamp - last_time < max_gap:
+                    continue
+                last_thumb = thumb
+            last_time = timestamp
+
+            kept += 1
+            yield index, round(timestamp, 3), _to_rgb(frame)
+    finally:
+        cap.release()
+
+
+def aggregate_timeline(timeline: list, window: int = 3) -> dict:
+    """
+    Clip-level scores from per-frame entries: each signal's mean, max and std
+    over all sampled frames, plus `peak_window` — the run of `window` consecutive
+    sampled frames with the highest mean ensemble, and each signal's mean over it.
+    The verdict uses the peak window, so a short manipulated segment is not
+    averaged away by the rest of the clip, while one noisy frame alone cannot
+    carry it. `suspicious_share` is the fraction of frames above
+    SUSPICIOUS_FRAME_SCORE.
+    """
+    if not timeline:
+        raise ValueError("No frames could be decoded from the video")
+
+    keys = ("efficientnet_score", "clip_score", "frequency_score", "ensemble")
+    summary = {}
+    for key in keys:
+        values = np.array([entry[key] for entry in timeline], dtype=np.float32)
+        summary[key] = {
+            "mean": round(float(values.mean()), 2),
+            "max": round(float(values.max()), 2),
+            "std": round(float(values.std()), 2),
+        }
+    peak = max(timeline, key=lambda entry: entry["ensemble"])
+    suspicious = sum(entry["ensemble"] > SUSPICIOUS_FRAME_SCORE for entry in timeline)
+
+    size = max(1, min(window, len(timeline)))
+    ensembles = np.array([entry["ensemble"] for entry in timeline], dtype=np.float64)
+    start = int(np.convolve(ensembles, np.ones(size), "valid").argmax())
+    frames = timeline[start:start + size]
+    summary["peak_window"] = {
+        "start_time": frames[0]["time"],
+        "end_time": frames[-1]["time"],
+        "frames": size,
+        **{key: round(float(np.mean([entry[key] for entry in frames])), 2) for key in keys},
+    }
+    summary["frames_analyzed"] = len(timeline)
+    summary["peak_time"] = peak["time"]
+    summary["suspicious_share"] = round(suspicious / len(timeline), 3)
+    return summary
+
+
+def aggregate_tracks(timeline: list) -> list:
+    """Per-identity summary of the face tracks seen in the timeline's `faces` entries."""
+    tracks = {}
+    for entry in timeline:
+        for face in entry.get("faces", []):
+            track = tracks.setdefault(face["track_id"], {
+                "track_id": face["track_id"], "first_time": entry["time"],
+                "efficientnet": [], "clip": [],
+            })
+            track["last_time"] = entry["time"]
+            track["efficientnet"].append(face["efficientnet_score"])
+            track["clip"].append(face["clip_score"])
+
+    return [{
+        "track_id": track["track_id"],
+        "first_time": track["first_time"],
+        "last_time": track["last_time"],
+        "frames": len(track["clip"]),
+        "efficientnet_score": round(float(np.mean(track["efficientnet"])), 2),
+        "clip_score": round(float(np.mean(track["clip"])), 2),
+        "clip_score_max": round(float(np.max(track["clip"])), 2),
+    } for track in tracks.values()]
@@ -0,0 +1,110 @@
+import os
+import threading
+import time
+from models import efficientnet, clip_classifier, face_extractor, gradcam
+from models.decoded_image import blank_image
+
+
+def _warm_detector():
+    efficientnet.run_efficientnet(blank_image())
+
+
+def _warm_clip():
+    clip_classifier.run_clip(blank_image())
+
+
+def _warm_face():
+    face_extractor.extract_face(blank_image(640, 640))
+
+
+def _load_gradcam():
+    model, _, _ = efficientnet.get_model_and_transform()
+    gradcam.get_engine(model)
+
+
+def _warm_gradcam():
+    model, transform, device = efficientnet.get_model_and_transform()
+    gradcam.generate_heatmap(model, transform, device, blank_image())
+
+
+# name → (load, warm-up inference, is_loaded)
+MODELS = {
+    "detector": (efficientnet.load, _warm_detector, efficientnet.is_loaded),
+    "clip":     (clip_classifier._load_model, _warm_clip, clip_classifier.is_loaded),
+    "face":     (face_extractor.load, _warm_face, face_extractor.is_loaded),
+    # Resident Grad-CAM explainer (an FP32 CPU copy of the detector on CUDA / INT8 hosts)
+    "gradcam":  (_load_gradcam, _warm_gradcam, gradcam.is_loaded),
+}
+
+_status = {}
+_status_lock = threading.Lock()
+
+
+def preload_names() -> list:
+    """
+    TRUTHLENS_PRELOAD = all (default) | none | comma-separated subset of
+    detector, clip, face, gradcam.
+    """
+    value = os.getenv("TRUTHLENS_PRELOAD", "all").strip().lower()
+    if value in ("", "none", "0", "false"):
+        return []
+    if value == "all":
+        names = list(MODELS)
+    else:
+        names = [n.strip() for n in value.split(",") if n.strip()]
+        unknown = [n for n in names if n not in MODELS]
+        if unknown:
+            raise ValueError(f"[TruthLens] Unknown TRUTHLENS_PRELOAD model(s): {', '.join(unknown)}")
+    if "gradcam" in names and not efficientnet.heatmaps_enabled():
+        # INT8 without TRUTHLENS_HEATMAPS=1 — never load the FP32 explainer copy
+        print("[TruthLens] Heatmaps are off — not preloading gradcam")
+        names.remove("gradcam")
+    return names
+
+
+def preload(names: list, warmup: bool = True):
+    """
+    Loads each model (sequentially — avoids GPU memory spikes from parallel loads),
+    then runs one dummy inference so first real requests skip lazy init,
+    kernel selection and allocator warm-up. Blocking — call from a worker thread.
+    """
+    for name in names:
+        load, warm, _ = MODELS[name]
+        with _status_lock:
+            _status[name] = {"state": "loading", "load_seconds": None,
+                             "warmup_seconds": None, "error": None}
+        try:
+            t0 = time.perf_counter()
+            load()
+            t1 = time.perf_counter()
+            with _status_lock:
+                _status[name].update(state="warming" if warmup else "ready",
+                                     load_seconds=round(t1 - t0, 2))
+            if warmup:
+                warm()
+                with _status_lock:
+                    _status[name].update(state="ready",
+                                         warmup_seconds=round(time.perf_counter() - t1, 2))
+            print(f"[TruthLens] Preloaded {name} in {time.perf_counter() - t0:.1f}s ✓")
+        except Exception as e:
+            print(f"[TruthLens] Preload error for {name}: {e}")
+            with _status_lock:
+                _status[name].update(state="error", error=str(e))
+
+
+def status(expected: list) -> dict:
+    """
+    Readiness report. A model is ready when it is loaded — preloaded or lazily
+    by a request. The service is ready once every `expected` model is.
+    """
+    models = {}
+    with _status_lock:
+        for name, (_, _, is_loaded) in MODELS.items():
+            entry = dict(_status.get(name, {"state": "not_loaded", "load_seconds": None,
+                                            "warmup_seconds": None, "error": None}))
+            if entry["state"] == "not_loaded" and is_loaded():
+                entry["state"] = "ready"   # loaded lazily — no timing recorded
+            entry["loaded"] = is_loaded()
+            models[name] = entry
+    ready = all(models[n]["state"] == "ready" for n in expected)
+    return {"ready": ready, "models": models}
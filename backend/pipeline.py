@@ -1,32 +1,184 @@
 import asyncio
-from models.efficientnet import run_efficientnet,get_model_and_transform
-from models.clip_classifier import run_clip
-from models.frequency import frequency_analysis
+import hashlib
+import json
+import os
+from models.efficientnet import run_efficientnet_batch,get_model_and_transform,get_explain_components
+from models.efficientnet import MODEL_ID as DETECTOR_MODEL_ID, cache_version as detector_version
+from models.efficientnet import heatmaps_enabled as local_heatmaps_enabled, fake_label_index
+from models.clip_classifier import run_clip_batch, cache_version as clip_version
+from models.batching import MicroBatcher
+from models.frequency import frequency_analysis, cache_version as frequency_version
 from tools.exif import extract_exif
 from tools.reverse_search import reverse_search
-from agent.agent import run_agent
-from models.face_extractor import extract_face, face_to_bytes
-from models.gradcam import generate_heatmap
+from agent.agent import run_agent, run_agent_sync, run_agent_batch, run_agent_batch_sync
+from agent.agent import fallback_verdict, rule_verdict
+from models.face_extractor import extract_face, extract_faces, crop_from_meta, NO_FACE_MESSAGE
+from models.face_extractor import cache_version as face_version
+from models.gradcam import generate_heatmap, explain_image, GRADCAM_VERSION
+from models.decoded_image import DecodedImage, as_decoded
+from models.video import sample_frames, aggregate_timeline, aggregate_tracks, video_info
+from models.face_tracker import FaceTracker
+from models.face_extractor import detect_faces
+from models.remote import create_model_client
 from functools import partial
+from itertools import islice
+from jobs import RUNNING, DONE, ERROR
+from stage_cache import create_stage_cache, MISS
+from scheduler import create_scheduler
+from stage_graph import StageGraph
+from ensemble import WEIGHTS, compute_ensemble
 
-# Weight rationale:
-# CLIP gets the highest weight because its zero-shot semantic approach generalizes
-# to new AI generators (Nano Banana, Kling, MiniMax etc.) that the CNN hasn't seen.
-# The Swin CNN was trained on a fixed dataset — it reliably catches known generators
-# but can miss newer ones. Frequency analysis is physics-based and always valid.
-WEIGHTS = {
-    "efficientnet": 0.20,   # Swin CNN — unreliable alone; false positives AND false negatives observed
-    "clip":         0.55,   # CLIP zero-shot — most reliable; correct on both test cases
-    "frequency":    0.25,   # DCT/FFT — physics-based, model-agnostic
+# With TRUTHLENS_MODEL_SERVER set, every model call goes to model_server.py over
+# shared memory and this process never loads model weights itself.
+model_client = create_model_client()
+if model_client is not None:
+    run_efficientnet_batch = model_client.run_efficientnet_batch
+    run_clip_batch         = model_client.run_clip_batch
+    extract_face           = model_client.extract_face
+    extract_faces          = model_client.extract_faces
+    detect_faces           = model_client.detect_faces
+    face_version           = partial(model_client.cache_version, "face")
+    detector_version       = partial(model_client.cache_version, "detector")
+    clip_version           = partial(model_client.cache_version, "clip")
+
+def heatmaps_enabled() -> bool:
+    """Grad-CAM on or off (off by default in INT8 mode) — a model server reports its own setting."""
+    if model_client is not None:
+        return model_client.cache_version("heatmaps") == "on"
+    return local_heatmaps_enabled()
+
+def heatmap_for(image) -> str:
+    """Grad-CAM overlay for the detector — in-process or on the model server."""
+    if model_client is not None:
+        return model_client.generate_heatmap(image)
+    model, transform, device = get_model_and_transform()
+    return generate_heatmap(model, transform, device, image, fake_label_index())
+
+def explain_for(image) -> tuple:
+    """Fused (detector score, heatmap) — in-process or on the model server."""
+    if model_client is not None:
+        return model_client.explain_image(image)
+    model, transform, fake_idx = get_explain_components()
+    return explain_image(model, transform, image, fake_idx)
+
+# "separate" — detector score (no_grad) and Grad-CAM are two passes over the Swin model.
+# "fused"    — one forward/backward yields both score and heatmap (half the detector compute).
+EXPLAIN_MODE = os.getenv("TRUTHLENS_EXPLAIN_MODE", "separate").lower()
+
+# Multi-face mode scores every face above FACE_MIN_SCORE (one batched detector/CLIP
+# pass for all crops) instead of only the most confident one; the image is judged
+# by its most suspicious face, so one swapped face in a group photo is not missed.
+MULTI_FACE     = os.getenv("TRUTHLENS_MULTI_FACE", "0") == "1"
+FACE_MIN_SCORE = float(os.getenv("TRUTHLENS_FACE_MIN_SCORE", "0.5"))
+
+# Fast path: when CLIP + frequency already meet the agent's decisive rules
+# (agent.rule_verdict), the rule-based result is sent as soon as the scores are
+# in. Reverse search and the LLM are skipped; FAST_PATH_FOLLOWUPS ("heatmap",
+# "agent") still run afterwards and reach the client as result_update messages.
+FAST_PATH           = os.getenv("TRUTHLENS_FAST_PATH", "0") == "1"
+FAST_PATH_FOLLOWUPS = {s.strip() for s in os.getenv("TRUTHLENS_FAST_PATH_FOLLOWUPS", "heatmap,agent").split(",") if s.strip()}
+
+# Per-stage output versions — a stage's memoized outputs are reused only while
+# its version is unchanged (e.g. new CLIP prompts re-run CLIP and nothing else).
+STAGE_VERSIONS = {
+    "face":      face_version,
+    "faces":     lambda: f"{face_version()}|min{FACE_MIN_SCORE}",
+    "detector":  detector_version,
+    "clip":      clip_version,
+    "frequency": frequency_version,
+    "heatmap":   lambda: f"{detector_version()}|{GRADCAM_VERSION}",
+    # fused pass always runs on the FP32 CPU explainer
+    "explain":   lambda: f"{DETECTOR_MODEL_ID}|fp32|{GRADCAM_VERSION}",
 }
 
-def compute_ensemble(efficientnet_score: float, clip_score: float, freq_score: float) -> float:
-    return round(
-        efficientnet_score * WEIGHTS["efficientnet"] +
-        clip_score         * WEIGHTS["clip"] +
-        freq_score         * WEIGHTS["frequency"],
-        2
-    )
+def pipeline_version() -> str:
+    """
+    Short fingerprint of everything that shapes a verdict — every stage version
+    (model IDs, CLIP prompt pools, ...), ensemble WEIGHTS and explain mode.
+    Cached results are keyed on it, so a config change never serves stale verdicts.
+    """
+    config = {
+        "stages": {name: version() for name, version in STAGE_VERSIONS.items()},
+        "weights": WEIGHTS,
+        "explain_mode": EXPLAIN_MODE,
+        "heatmaps": heatmaps_enabled(),
+        "multi_face": MULTI_FACE,
+        "fast_path": FAST_PATH,
+        # Face crops reach the models as raw pixels (formerly a JPEG re-encode)
+        "crop_handoff": "array",
+    }
+    return hashlib.sha256(json.dumps(config, sort_keys=True).encode()).hexdigest()[:16]
+
+stage_cache = create_stage_cache()
+
+# Every blocking stage runs on the pool for its resource class (model / cpu / io),
+# and jobs are admitted through its bounded queue — see scheduler.Scheduler.
+scheduler = create_scheduler()
+
+def _scored(value) -> bool:
+    # 50.0 is every model stage's error fallback — never memoize it
+    return value != 50.0
+
+def _face_cacheable(meta: dict) -> bool:
+    return "bbox" in meta or meta.get("message") == NO_FACE_MESSAGE
+
+def _faces_cacheable(meta: dict) -> bool:
+    return bool(meta["faces"]) or meta.get("message") == NO_FACE_MESSAGE
+
+def _face_suspicion(efficientnet_score: float, clip_score: float) -> float:
+    # Frequency is whole-image, so faces are ranked on the per-crop signals only
+    return efficientnet_score * WEIGHTS["efficientnet"] + clip_score * WEIGHTS["clip"]
+
+async def memoized(stage: str, digest: str, compute, cacheable=_scored):
+    """Serve a stage output from the stage cache, or await compute() and store it."""
+    # Doesn't block the loop: a model server's versions were fetched (off the
+    # loop) by the pipeline_version() call that admitted the job
+    version = STAGE_VERSIONS[stage]()
+    value = stage_cache.get(stage, version, digest)
+    if value is MISS:
+        value = await compute()
+        if cacheable(value):
+            stage_cache.put(stage, version, digest, value)
+    return value
+
+# Shared across jobs: concurrent uploads within TRUTHLENS_BATCH_MAX_WAIT_MS of each
+# other are scored in one forward pass per model.
+detector_batcher = MicroBatcher.from_env("detector", run_efficientnet_batch, runner=scheduler.model.run)
+clip_batcher     = MicroBatcher.from_env("clip", run_clip_batch, runner=scheduler.model.run)
+
+# Agent micro-batching: verdicts for jobs reaching the agent within
+# TRUTHLENS_AGENT_BATCH_MAX_WAIT_MS of each other share one LLM request (one
+# system prompt, a JSON array back). Worth it under load; adds that wait otherwise.
+AGENT_BATCH   = os.getenv("TRUTHLENS_AGENT_BATCH", "0") == "1"
+agent_batcher = MicroBatcher.from_env("agent", run_agent_batch, prefix="TRUTHLENS_AGENT_BATCH",
+                                      max_batch_size=8, max_wait_ms=250)
+
+# Stream the agent's summary / reasoning to the client as agent_delta messages
+# while the LLM writes them (unbatched calls only); the result still comes last.
+AGENT_STREAM = os.getenv("TRUTHLENS_AGENT_STREAM", "1") == "1"
+
+async def synthesize(signals: dict, on_delta=None) -> dict:
+    """The agent verdict for one job — alone (streamed to on_delta if given), or batched with concurrent jobs."""
+    if AGENT_BATCH:
+        return await agent_batcher.submit(signals)
+    return await run_agent(signals, on_delta=on_delta)
+
+def agent_deltas(manager, job_id: str):
+    """on_delta callback forwarding streamed verdict text to the job's WebSocket."""
+    if not AGENT_STREAM:
+        return None
+    async def send_delta(delta: dict):
+        await manager.send(job_id, {"type": "agent_delta", **delta})
+    return send_delta
+
+def batch_stats() -> dict:
+    stats = {
+        "detector": detector_batcher.stats(),
+        "clip": clip_batcher.stats(),
+    }
+    if AGENT_BATCH:
+        stats["agent"] = agent_batcher.stats()
+    return stats
 
 async def send_step(manager, job_id: str, step_id: str, status: str, detail: str = ""):
     await manager.send(job_id, {
@@ -36,53 +188,288 @@ async def send_step(manager, job_id: str, step_id: str, status: str, detail: str
         "detail": detail
     })
 
-async def run_pipeline(job_id: str, image_bytes: bytes, filename: str, manager):
+def build_result(verdict: dict, efficientnet_score: float, clip_score: float, freq_score: float,
+                 ensemble_score: float, search_results: list, heatmap_b64: str) -> dict:
+    """The result payload sent to clients, stored in the job store and cached."""
+    return {
+        "verdict": verdict["verdict"],
+        "confidence": verdict["confidence"],
+        "efficientnet_score": round(efficientnet_score),
+        "clip_score": round(clip_score),
+        "ml_score": round(ensemble_score),
+        "frequency_score": round(freq_score),
+        "summary": verdict["summary"],
+        "agent_reasoning": verdict["reasoning"],
+        "reverse_search": search_results,
+        "heatmap":heatmap_b64
+    }
+
+async def run_pipeline(job_id: str, image, filename: str, manager, store=None) -> dict:
+    """
+    Runs every analysis stage, streaming step updates to the job's WebSocket.
+    Stages form a DAG (see build_stage_graph), so frequency, EXIF and reverse
+    search overlap face extraction and the models. When a job store is given
+    the job moves running → done/error there and the final result is
+    persisted. Returns the result dict, or None on failure.
+    """
+    # Decoded once here and handed to every stage — accepts raw bytes too.
+    image = as_decoded(image)
+    if store is not None:
+        store.update(job_id, RUNNING)
     try:
-        # upload
+        # Bytes that aren't an image fail the job here instead of every stage
+        # quietly falling back to 50.0; the decode is shared with the stages
+        await scheduler.cpu.run(lambda: image.rgb)
+        stages, timings = await build_stage_graph(job_id, image, filename, manager, store).run()
+
+        early = stages["triage"]["result"]
+        if early is not None:
+            # Fast path — the client already has the result, follow-ups merged in
+            early["timings"] = timings
+            if store is not None:
+                store.update(job_id, DONE, result=early)
+            return early
+
+        ml = stages["ml"]
+        result = build_result(stages["agent"], ml["efficientnet_score"], ml["clip_score"],
+                              stages["frequency"], stages["triage"]["ensemble_score"],
+                              stages["reverse"], stages["heatmap"])
+        _add_faces(result, ml)
+        result["timings"] = timings
+        # Persist before notifying so a client reacting to the message can GET it
+        if store is not None:
+            store.update(job_id, DONE, result=result)
+        await manager.send(job_id, {
+            "type": "result",
+            "data": result
+        })
+        return result
+
+    except Exception as e:
+        print(f"[TruthLens] Pipeline error for job {job_id}: {e}")
+        if store is not None:
+            store.update(job_id, ERROR, error=str(e))
+        await manager.send(job_id, {
+            "type": "error",
+            "message": str(e)
+        })
+        return None
+
+# ── Per-image stage logic ─────────────────────────────────────────────────────
+# Shared by the streaming stage graph and the offline analyze_images, so both
+# honour MULTI_FACE, fused explain mode and the fast path the same way.
+
+FACE_STAGE = "faces" if MULTI_FACE else "face"
+
+def _extract_face_meta(image) -> dict:
+    """The face stage's output — every face above FACE_MIN_SCORE in multi-face mode, else the most confident one."""
+    if MULTI_FACE:
+        return extract_faces(image, FACE_MIN_SCORE)
+    return extract_face(image)[1]
+
+def _face_meta_cacheable(meta: dict) -> bool:
+    return _faces_cacheable(meta) if MULTI_FACE else _face_cacheable(meta)
+
+def _face_crops(image: DecodedImage, meta: dict) -> tuple:
+    """
+    (faces, face_meta, crops) from a (possibly cached) face stage output.
+    crops[0] is the most confident face, or the whole image when there is
+    none; multi-face mode adds one crop per further face.
+    """
+    # Copied — per-face scores are added later and the meta may be a cached object
+    faces = [dict(face) for face in meta["faces"]] if MULTI_FACE else []
+    face_meta = {**faces[0], "faces_found": len(faces)} if faces else meta
+    face_array = crop_from_meta(image, face_meta)
+    crops = [image if face_array is None else DecodedImage.from_array(face_array)]
+    crops += [DecodedImage.from_array(crop_from_meta(image, face)) for face in faces[1:]]
+    return faces, face_meta, crops
+
+def _fused() -> bool:
+    """Single-crop images get detector score and heatmap from one fused pass."""
+    return EXPLAIN_MODE == "fused" and heatmaps_enabled()
+
+def _ml_output(faces: list, crops: list, detector_scores: list, clip_scores: list, heatmap_b64=None) -> dict:
+    """
+    The ml stage's output from per-crop scores. With several faces each one
+    gets its scores and the image is judged by its most suspicious face (which
+    also gets the heatmap).
+    """
+    primary = 0 if faces else None
+    if len(faces) > 1:
+        for face, efficientnet_face, clip_face in zip(faces, detector_scores, clip_scores):
+            face["efficientnet_score"] = round(efficientnet_face)
+            face["clip_score"] = round(clip_face)
+        primary = max(range(len(faces)),
+                      key=lambda i: _face_suspicion(detector_scores[i], clip_scores[i]))
+    i = primary or 0
+    return {
+        "efficientnet_score": detector_scores[i],
+        "clip_score": clip_scores[i],
+        "analysis_image": crops[i],
+        "heatmap": heatmap_b64,
+        "faces": faces,
+        "primary_face": primary,
+    }
+
+def _triage(ml: dict, freq_score: float) -> tuple:
+    """(ensemble score, early result) — on the fast path the rule-based result when the signals are decisive, else None."""
+    efficientnet_score, clip_score = ml["efficientnet_score"], ml["clip_score"]
+    final_ensemble = compute_ensemble(efficientnet_score, clip_score, freq_score)
+    verdict = rule_verdict(clip_score, freq_score, final_ensemble) if FAST_PATH else None
+    if verdict is None:
+        return final_ensemble, None
+    # Fused mode already has the heatmap; otherwise it arrives as a follow-up
+    early = build_result(verdict, efficientnet_score, clip_score, freq_score,
+                         final_ensemble, [], ml["heatmap"] or "")
+    _add_faces(early, ml)
+    early["fast_path"] = True
+    return final_ensemble, early
+
+def _agent_signals(ml: dict, freq_score: float, ensemble_score: float, exif_data: dict,
+                   search_results: list, filename: str) -> dict:
+    return {
+        "efficientnet_score": ml["efficientnet_score"],
+        "clip_score": ml["clip_score"],
+        "freq_score": freq_score,
+        "ensemble_score": ensemble_score,
+        "exif": exif_data,
+        "search_results": search_results,
+        "filename": filename,
+    }
+
+def _add_faces(result: dict, ml: dict):
+    if MULTI_FACE:
+        faces = ml["faces"]
+        if len(faces) == 1:
+            faces[0].update(efficientnet_score=round(ml["efficientnet_score"]),
+                            clip_score=round(ml["clip_score"]))
+        result["faces"] = faces
+        result["primary_face"] = ml["primary_face"]
+
+def build_stage_graph(job_id: str, image: DecodedImage, filename: str, manager, store=None) -> StageGraph:
+    """
+    The image pipeline as a stage DAG — each stage starts once its inputs exist:
+
+        upload
+        face ──► ml ──┬──► triage ──► heatmap
+        frequency ────┘       │
+        exif ──► reverse ─────┴──► agent   (reverse waits for triage when the fast path can skip it)
+
+    triage combines the scores and, on the fast path, sends the rule-based
+    result early. Each stage sends the same step_update messages the
+    sequential pipeline did.
+    """
+    graph = StageGraph()
+
+    def decided(inputs) -> bool:
+        return inputs["triage"]["result"] is not None
+
+    async def follow_up(inputs, patch: dict):
+        """Merges a fast-path follow-up into the early result and pushes it to the client."""
+        early = inputs["triage"]["result"]
+        early.update(patch)
+        if store is not None:
+            store.update(job_id, DONE, result=early)
+        await manager.send(job_id, {"type": "result_update", "data": patch})
+
+    async def upload(inputs):
         await send_step(manager, job_id, "upload", "running")
-        await asyncio.sleep(0.3)
-        await send_step(manager, job_id, "upload", "done", f"Received {len(image_bytes) // 1024}KB")
+        await send_step(manager, job_id, "upload", "done", f"Received {len(image.data) // 1024}KB")
 
-        # face extraction
+    async def face(inputs):
         await send_step(manager, job_id, "face", "running")
-        face_array, face_meta = await asyncio.to_thread(extract_face, image_bytes)
-
-        if face_array is None:
+        meta = await memoized(FACE_STAGE, image.sha256,
+            lambda: scheduler.model.run(_extract_face_meta, image),
+            cacheable=_face_meta_cacheable)
+        faces, face_meta, crops = _face_crops(image, meta)
+        if crops[0] is image:
             await send_step(manager, job_id, "face", "done", face_meta["message"])
-            analysis_bytes = image_bytes
         else:
             await send_step(manager, job_id, "face", "done",
                 f"{face_meta['faces_found']} face(s) — confidence: {face_meta['confidence']}%")
-            analysis_bytes = face_to_bytes(face_array)
+        return {"faces": faces, "crops": crops}
 
-        # EfficientNet + CLIP running concurrently
-        await send_step(manager, job_id, "ml", "running", "Running EfficientNet-B7 + CLIP...")
-        efficientnet_score, clip_score = await asyncio.gather(
-            asyncio.to_thread(run_efficientnet, analysis_bytes),
-            asyncio.to_thread(run_clip, analysis_bytes),
-        )
-        await send_step(manager, job_id, "ml", "done",
-            f"EfficientNet: {efficientnet_score:.1f}% | CLIP: {clip_score:.1f}%")
-        
-        #gradcam heat map
+    async def ml(inputs):
+        faces, crops = inputs["face"]["faces"], inputs["face"]["crops"]
+        analysis_image = crops[0]
+        digest = analysis_image.sha256
+        heatmap_b64 = None
+        if len(faces) > 1:
+            # Every face crop in one detector and one CLIP batch
+            await send_step(manager, job_id, "ml", "running",
+                f"Running EfficientNet-B7 + CLIP on {len(faces)} faces...")
+            detector_scores, clip_scores = await asyncio.gather(
+                scheduler.model.run(_memoized_batch, "detector", crops, run_efficientnet_batch),
+                scheduler.model.run(_memoized_batch, "clip", crops, run_clip_batch),
+            )
+        elif _fused():
+            # Detector score + Grad-CAM from one pass, CLIP alongside
+            await send_step(manager, job_id, "ml", "running", "Running EfficientNet-B7 + Grad-CAM + CLIP...")
+            (efficientnet_score, heatmap_b64), clip_score = await asyncio.gather(
+                memoized("explain", digest,
+                    lambda: scheduler.model.run(explain_for, analysis_image),
+                    cacheable=lambda v: v[1] != ""),
+                memoized("clip", digest, lambda: clip_batcher.submit(analysis_image)),
+            )
+            detector_scores, clip_scores = [efficientnet_score], [clip_score]
+        else:
+            # EfficientNet + CLIP running concurrently
+            await send_step(manager, job_id, "ml", "running", "Running EfficientNet-B7 + CLIP...")
+            detector_scores, clip_scores = await asyncio.gather(
+                memoized("detector", digest, lambda: detector_batcher.submit(analysis_image)),
+                memoized("clip", digest, lambda: clip_batcher.submit(analysis_image)),
+            )
+            detector_scores, clip_scores = [detector_scores], [clip_scores]
+        ml_out = _ml_output(faces, crops, detector_scores, clip_scores, heatmap_b64)
+        detail = f"EfficientNet: {ml_out['efficientnet_score']:.1f}% | CLIP: {ml_out['clip_score']:.1f}%"
+        if len(faces) > 1:
+            detail = f"Most suspicious face #{ml_out['primary_face'] + 1}: {detail}"
+        await send_step(manager, job_id, "ml", "done", detail)
+        return ml_out
+
+    async def triage(inputs):
+        final_ensemble, early = _triage(inputs["ml"], inputs["frequency"])
+        if early is None:
+            return {"ensemble_score": final_ensemble, "result": None}
+
+        if "agent" not in FAST_PATH_FOLLOWUPS:
+            await send_step(manager, job_id, "reverse", "done", "Skipped — signals already decisive")
+        await send_step(manager, job_id, "agent", "done", f"Decisive signals — {early['verdict']} (rule-based)")
+        if store is not None:
+            store.update(job_id, DONE, result=early)
+        await manager.send(job_id, {
+            "type": "result",
+            "data": early
+        })
+        return {"ensemble_score": final_ensemble, "result": early}
 
+    async def heatmap(inputs):
+        ml_out = inputs["ml"]
+        if ml_out["heatmap"] is not None:
+            return ml_out["heatmap"]
+        if not heatmaps_enabled() or (decided(inputs) and "heatmap" not in FAST_PATH_FOLLOWUPS):
+            return ""
         await send_step(manager, job_id, "ml", "running", "Generating Grad-CAM heatmap...")
-        model, transform, device = get_model_and_transform()
-        loop = asyncio.get_event_loop()
-        heatmap_b64 = await loop.run_in_executor(
-            None,
-            partial(generate_heatmap, model, transform, device, analysis_bytes)
-        )
+        analysis_image = ml_out["analysis_image"]
+        heatmap_b64 = await memoized("heatmap", analysis_image.sha256,
+            lambda: scheduler.model.run(heatmap_for, analysis_image),
+            cacheable=lambda v: v != "")
+        await send_step(manager, job_id, "ml", "done",
+            f"EfficientNet: {ml_out['efficientnet_score']:.1f}% | CLIP: {ml_out['clip_score']:.1f}%")
+        if decided(inputs):
+            await follow_up(inputs, {"heatmap": heatmap_b64})
+        return heatmap_b64
 
-        # frequency
+    async def frequency(inputs):
         await send_step(manager, job_id, "frequency", "running")
-        freq_score = await asyncio.to_thread(frequency_analysis, image_bytes)
-        final_ensemble = compute_ensemble(efficientnet_score, clip_score, freq_score)
+        freq_score = await memoized("frequency", image.sha256,
+            lambda: scheduler.cpu.run(frequency_analysis, image))
         await send_step(manager, job_id, "frequency", "done", f"Frequency anomaly: {freq_score:.1f}%")
+        return freq_score
 
-        # exif
+    async def exif(inputs):
         await send_step(manager, job_id, "exif", "running")
-        exif_data = await asyncio.to_thread(extract_exif, image_bytes)
+        exif_data = await scheduler.cpu.run(extract_exif, image)
         exif_stripped = exif_data.get("stripped", True)
         exif_expected = exif_data.get("stripped_expected", False)
         fmt = exif_data.get("format", "")
@@ -93,45 +480,357 @@ async def run_pipeline(job_id: str, image_bytes: bytes, filename: str, manager):
         else:
             exif_detail = "Metadata stripped — moderate manipulation signal"
         await send_step(manager, job_id, "exif", "done", exif_detail)
+        return exif_data
 
-        # reverse search
+    async def reverse(inputs):
+        # Only the agent reads search results — skip the network call if it won't run
+        if FAST_PATH and "agent" not in FAST_PATH_FOLLOWUPS and decided(inputs):
+            return []
         await send_step(manager, job_id, "reverse", "running")
-        search_results = await asyncio.to_thread(reverse_search, image_bytes, filename, exif_data)
+        search_results = await scheduler.io.run(reverse_search, image.data, filename, inputs["exif"])
         await send_step(manager, job_id, "reverse", "done", f"{len(search_results)} sources found")
+        return search_results
+
+    async def reverse_update(inputs):
+        # Decided on the fast path — the search reaches the early result as a follow-up
+        if decided(inputs):
+            await follow_up(inputs, {"reverse_search": inputs["reverse"]})
+
+    async def agent(inputs):
+        ml_out, freq_score = inputs["ml"], inputs["frequency"]
+        early = inputs["triage"]["result"]
+        if early is not None and "agent" not in FAST_PATH_FOLLOWUPS:
+            return None
+        await send_step(manager, job_id, "agent", "running",
+            "Synthesizing all signals..." if early is None else "Writing detailed reasoning...")
+        # Fast-path follow-ups aren't streamed — their text is only kept if the verdict agrees
+        verdict = await synthesize(
+            _agent_signals(ml_out, freq_score, inputs["triage"]["ensemble_score"],
+                           inputs["exif"], inputs["reverse"], filename),
+            on_delta=agent_deltas(manager, job_id) if early is None else None)
+        if early is None:
+            await send_step(manager, job_id, "agent", "done", "Verdict ready")
+        elif verdict["verdict"] == early["verdict"]:
+            # The rule verdict stands; the agent only adds its reasoning
+            await follow_up(inputs, {"summary": verdict["summary"], "agent_reasoning": verdict["reasoning"]})
+            await send_step(manager, job_id, "agent", "done", "Detailed reasoning ready")
+        else:
+            print(f"[TruthLens] Agent disagreed with the rule verdict for job {job_id} — keeping the rule reasoning")
+            await send_step(manager, job_id, "agent", "done", f"Decisive signals — {early['verdict']} (rule-based)")
+        return verdict
+
+    graph.add("upload", upload)
+    graph.add("face", face)
+    graph.add("ml", ml, after=("face",))
+    graph.add("frequency", frequency)
+    graph.add("triage", triage, after=("ml", "frequency"))
+    graph.add("heatmap", heatmap, after=("ml", "triage"))
+    graph.add("exif", exif)
+    if FAST_PATH and "agent" not in FAST_PATH_FOLLOWUPS:
+        # A decided job skips the search — wait for triage to know whether it is needed
+        graph.add("reverse", reverse, after=("exif", "triage"))
+    else:
+        # The search always runs, so it overlaps the models
+        graph.add("reverse", reverse, after=("exif",))
+        if FAST_PATH:
+            graph.add("reverse_update", reverse_update, after=("reverse", "triage"))
+    graph.add("agent", agent, after=("ml", "frequency", "exif", "reverse", "triage"))
+    return graph
+
+
+# ── Offline (synchronous) analysis ────────────────────────────────────────────
+# Same stages, stage cache and result shape as run_pipeline, without asyncio,
+# WebSockets or the job store — used by the bulk CLI.
+
+def _memoized_batch(stage: str, images: list, batch_fn) -> list:
+    """Stage-cache lookups per image; only the misses go through one batch_fn call."""
+    version = STAGE_VERSIONS[stage]()
+    scores = [stage_cache.get(stage, version, im.sha256) for im in images]
+    missing = [i for i, score in enumerate(scores) if score is MISS]
+    if missing:
+        fresh = batch_fn([images[i] for i in missing])
+        for i, score in zip(missing, fresh):
+            scores[i] = score
+            if _scored(score):
+                stage_cache.put(stage, version, images[i].sha256, score)
+    return scores
+
+def _agent_verdicts_sync(signals_list: list) -> list:
+    if AGENT_BATCH:
+        # The whole chunk in as few LLM requests as the batch size allows
+        size = agent_batcher.max_batch_size
+        return [verdict for start in range(0, len(signals_list), size)
+                for verdict in run_agent_batch_sync(signals_list[start:start + size])]
+    return [run_agent_sync(signals) for signals in signals_list]
+
+def analyze_images(images: list, filenames: list, use_agent: bool = True,
+                   use_reverse_search: bool = True, use_heatmap: bool = False) -> list:
+    """
+    Analyzes a chunk of images with the same per-image stage logic as
+    run_pipeline (MULTI_FACE, fused explain mode, fast path), scoring every
+    crop of the chunk in one batched detector and CLIP pass. Returns one
+    run_pipeline-shaped result per image; with use_agent=False the rule-based
+    fallback verdict is used instead of the LLM.
+    """
+    images = [as_decoded(im) for im in images]
+
+    plans = []
+    for image in images:
+        meta = stage_cache.memoize(
+            FACE_STAGE, STAGE_VERSIONS[FACE_STAGE](), image.sha256,
+            lambda: _extract_face_meta(image), cacheable=_face_meta_cacheable,
+        )
+        faces, _, crops = _face_crops(image, meta)
+        plans.append((faces, crops))
+
+    # Fused mode scores single-crop images with the explain pass; every other
+    # crop of the chunk goes through one detector batch
+    explained = {}
+    if _fused():
+        for i, (_, crops) in enumerate(plans):
+            if len(crops) == 1:
+                explained[i] = stage_cache.memoize(
+                    "explain", STAGE_VERSIONS["explain"](), crops[0].sha256,
+                    lambda: explain_for(crops[0]), cacheable=lambda v: v[1] != "",
+                )
+    detector_scores = iter(_memoized_batch(
+        "detector", [crop for i, (_, crops) in enumerate(plans) if i not in explained for crop in crops],
+        run_efficientnet_batch))
+    clip_scores = iter(_memoized_batch(
+        "clip", [crop for _, crops in plans for crop in crops], run_clip_batch))
+
+    rows = []
+    for i, (image, filename, (faces, crops)) in enumerate(zip(images, filenames, plans)):
+        crop_clip_scores = list(islice(clip_scores, len(crops)))
+        if i in explained:
+            efficientnet_score, heatmap_b64 = explained[i]
+            ml = _ml_output(faces, crops, [efficientnet_score], crop_clip_scores, heatmap_b64)
+        else:
+            ml = _ml_output(faces, crops, list(islice(detector_scores, len(crops))), crop_clip_scores)
+        freq_score = stage_cache.memoize(
+            "frequency", STAGE_VERSIONS["frequency"](), image.sha256,
+            lambda: frequency_analysis(image), cacheable=_scored,
+        )
+        final_ensemble, early = _triage(ml, freq_score)
+
+        heatmap_b64 = ""
+        if use_heatmap:
+            heatmap_b64 = ml["heatmap"]
+            if heatmap_b64 is None:
+                wanted = heatmaps_enabled() and (early is None or "heatmap" in FAST_PATH_FOLLOWUPS)
+                analysis_image = ml["analysis_image"]
+                heatmap_b64 = stage_cache.memoize(
+                    "heatmap", STAGE_VERSIONS["heatmap"](), analysis_image.sha256,
+                    lambda: heatmap_for(analysis_image),
+                    cacheable=lambda v: v != "",
+                ) if wanted else ""
+
+        # Decisive fast-path images only run search and the agent as follow-ups
+        follow_up = early is None or "agent" in FAST_PATH_FOLLOWUPS
+        exif_data = extract_exif(image)
+        search_results = reverse_search(image.data, filename, exif_data) if use_reverse_search and follow_up else []
+        rows.append((_agent_signals(ml, freq_score, final_ensemble, exif_data, search_results, filename),
+                     ml, early, heatmap_b64, use_agent and follow_up))
+
+    verdicts = iter(_agent_verdicts_sync([row[0] for row in rows if row[4]]))
+
+    results = []
+    for signals, ml, early, heatmap_b64, asked in rows:
+        verdict = next(verdicts) if asked else None
+        if early is None:
+            result = build_result(verdict or fallback_verdict(signals["ensemble_score"]),
+                                  ml["efficientnet_score"], ml["clip_score"], signals["freq_score"],
+                                  signals["ensemble_score"], signals["search_results"], heatmap_b64)
+            _add_faces(result, ml)
+        else:
+            result = {**early, "heatmap": heatmap_b64, "reverse_search": signals["search_results"]}
+            # The rule verdict stands; the agent only adds its reasoning when it agrees
+            if verdict is not None and verdict["verdict"] == early["verdict"]:
+                result.update(summary=verdict["summary"], agent_reasoning=verdict["reasoning"])
+        results.append(result)
+    return results
+
+
+
+# ── Video analysis ────────────────────────────────────────────────────────────
+# Sampled frames stream through the same stages in chunks; per-frame scores form
+# a timeline that is aggregated into one clip-level verdict.
+
+VIDEO_SAMPLING        = os.getenv("TRUTHLENS_VIDEO_SAMPLING", "scene").lower()   # scene | fps
+VIDEO_FPS             = float(os.getenv("TRUTHLENS_VIDEO_FPS", "2"))
+VIDEO_SCENE_THRESHOLD = float(os.getenv("TRUTHLENS_VIDEO_SCENE_THRESHOLD", "0.12"))
+VIDEO_MAX_GAP         = float(os.getenv("TRUTHLENS_VIDEO_MAX_GAP", "5"))
+VIDEO_MAX_FRAMES      = int(os.getenv("TRUTHLENS_VIDEO_MAX_FRAMES", "300"))
+VIDEO_BATCH           = int(os.getenv("TRUTHLENS_VIDEO_BATCH", "8"))
+# Face tracking: full detection every N sampled frames, or sooner when a track is lost
+# or no face is tracked
+VIDEO_KEYFRAME_INTERVAL   = int(os.getenv("TRUTHLENS_VIDEO_KEYFRAME_INTERVAL", "10"))
+VIDEO_TRACK_MIN_CONFIDENCE = float(os.getenv("TRUTHLENS_VIDEO_TRACK_MIN_CONFIDENCE", "0.6"))
+# The clip is judged on its most suspicious run of this many consecutive sampled frames
+VIDEO_PEAK_WINDOW     = int(os.getenv("TRUTHLENS_VIDEO_PEAK_WINDOW", "3"))
+
+# Video containers carry no image EXIF — tell the agent that is expected
+VIDEO_EXIF = {"stripped": True, "stripped_expected": True, "format": "VIDEO"}
+
+def _score_frames(chunk: list, tracker: FaceTracker) -> tuple:
+    """
+    Scores one chunk of (index, time, rgb) frames. The tracker supplies every
+    face on each frame; all face crops of the chunk (plus the full frame where
+    no face is visible) go through one batched detector and CLIP pass. A frame's
+    scores are those of its most confident face, as in the image pipeline.
+    Frame outputs skip the stage cache: they are never seen again and would
+    only evict real hits. Returns (timeline entries, analysis images).
+    """
+    frames, observations, crops, owners = [], [], [], []
+    for i, (_, _, rgb) in enumerate(chunk):
+        frame = DecodedImage.from_array(rgb)
+        faces = tracker.update(frame.rgb_array)
+        frames.append(frame)
+        observations.append(faces)
+        if not faces:
+            crops.append(frame)
+            owners.append((i, None))
+        for face in faces:
+            box = face["bbox"]
+            crop = frame.rgb_array[box["y1"]:box["y2"], box["x1"]:box["x2"]]
+            crops.append(DecodedImage.from_array(crop))
+            owners.append((i, face))
+
+    detector_scores = run_efficientnet_batch(crops)
+    clip_scores     = run_clip_batch(crops)
+
+    # First crop per frame is its most confident face (detections come sorted)
+    primary = {}
+    for (i, face), crop, efficientnet_score, clip_score in zip(owners, crops, detector_scores, clip_scores):
+        primary.setdefault(i, (crop, efficientnet_score, clip_score))
+        if face is not None:
+            face["efficientnet_score"] = round(efficientnet_score, 2)
+            face["clip_score"] = round(clip_score, 2)
+
+    timeline, analysis_images = [], []
+    for i, ((index, timestamp, _), frame, faces) in enumerate(zip(chunk, frames, observations)):
+        analysis_image, efficientnet_score, clip_score = primary[i]
+        freq_score = frequency_analysis(frame)
+        timeline.append({
+            "frame": index,
+            "time": timestamp,
+            "faces_found": len(faces),
+            "faces": faces,
+            "efficientnet_score": round(efficientnet_score, 2),
+            "clip_score": round(clip_score, 2),
+            "frequency_score": round(freq_score, 2),
+            "ensemble": compute_ensemble(efficientnet_score, clip_score, freq_score),
+        })
+        analysis_images.append(analysis_image)
+    return timeline, analysis_images
+
+async def run_video_pipeline(job_id: str, path: str, filename: str, manager, store=None) -> dict:
+    """
+    Video counterpart of run_pipeline, sending the same step updates. Frames are
+    decoded and sampled lazily from `path`, so memory stays bounded by one chunk
+    regardless of clip length. The verdict is taken on the peak window (see
+    aggregate_timeline) and the agent also sees the whole-clip mean and the
+    share of suspicious frames. The result adds `media_type`, `video` (clip-level
+    aggregates) and a per-frame `timeline`; the heatmap is the peak frame's.
+    """
+    if store is not None:
+        store.update(job_id, RUNNING)
+    try:
+        await send_step(manager, job_id, "upload", "running")
+        info = await scheduler.io.run(video_info, path)
+        await send_step(manager, job_id, "upload", "done",
+            f"Video — {info['duration'] or '?'}s at {info['fps']} fps")
+
+        frames = sample_frames(path, fps=VIDEO_FPS, mode=VIDEO_SAMPLING,
+                               scene_threshold=VIDEO_SCENE_THRESHOLD,
+                               max_gap=VIDEO_MAX_GAP, max_frames=VIDEO_MAX_FRAMES)
+        tracker = FaceTracker(VIDEO_KEYFRAME_INTERVAL, VIDEO_TRACK_MIN_CONFIDENCE, detect=detect_faces)
+        timeline = []
+        peak_score, peak_image = None, None
+        await send_step(manager, job_id, "face", "running", "Sampling frames...")
+        await send_step(manager, job_id, "ml", "running", "Scoring sampled frames...")
+        try:
+            while True:
+                chunk = await scheduler.cpu.run(lambda: list(islice(frames, VIDEO_BATCH)))
+                if not chunk:
+                    break
+                entries, analysis_images = await scheduler.model.run(_score_frames, chunk, tracker)
+                timeline.extend(entries)
+                # Keep only the single most suspicious frame alive, for the heatmap
+                for entry, analysis_image in zip(entries, analysis_images):
+                    if peak_score is None or entry["ensemble"] > peak_score:
+                        peak_score, peak_image = entry["ensemble"], analysis_image
+                await send_step(manager, job_id, "ml", "running",
+                    f"{len(timeline)} frames analyzed (t={timeline[-1]['time']:.1f}s)")
+        finally:
+            frames.close()   # releases the decoder even when a chunk fails
+
+        summary = aggregate_timeline(timeline, VIDEO_PEAK_WINDOW)
+        tracks = aggregate_tracks(timeline)
+        face_stats = tracker.stats()
+        await send_step(manager, job_id, "face", "done",
+            f"{len(tracks)} face track(s) — detection on {face_stats['detections']}/{face_stats['frames']} frames")
+
+        window             = summary["peak_window"]
+        efficientnet_score = window["efficientnet_score"]
+        clip_score         = window["clip_score"]
+        freq_score         = window["frequency_score"]
+        final_ensemble     = compute_ensemble(efficientnet_score, clip_score, freq_score)
+        window_label = (f"peak {window['frames']}-frame window at "
+                        f"t={window['start_time']:.1f}–{window['end_time']:.1f}s")
+
+        heatmap_b64 = ""
+        if heatmaps_enabled():
+            await send_step(manager, job_id, "ml", "running", "Generating Grad-CAM heatmap for the peak frame...")
+            heatmap_b64 = await scheduler.model.run(heatmap_for, peak_image)
+        await send_step(manager, job_id, "ml", "done",
+            f"EfficientNet: {efficientnet_score:.1f}% | CLIP: {clip_score:.1f}% ({window_label}; "
+            f"{summary['suspicious_share']:.0%} of {len(timeline)} frames suspicious)")
+
+        await send_step(manager, job_id, "frequency", "done", f"Frequency anomaly: {freq_score:.1f}% ({window_label})")
+        await send_step(manager, job_id, "exif", "done", "Not applicable to video")
+        await send_step(manager, job_id, "reverse", "done", "Skipped for video")
 
-        # agent
         await send_step(manager, job_id, "agent", "running", "Synthesizing all signals...")
-        verdict = await asyncio.to_thread(run_agent, {
+        verdict = await synthesize({
             "efficientnet_score": efficientnet_score,
             "clip_score": clip_score,
             "freq_score": freq_score,
             "ensemble_score": final_ensemble,
-            "exif": exif_data,
-            "search_results": search_results,
+            "exif": VIDEO_EXIF,
+            "search_results": [],
             "filename": filename,
-        })
+            "video": {
+                "frames": len(timeline),
+                "window_frames": window["frames"],
+                "window_start": window["start_time"],
+                "window_end": window["end_time"],
+                "mean_ensemble": summary["ensemble"]["mean"],
+                "suspicious_share": summary["suspicious_share"],
+            },
+        }, on_delta=agent_deltas(manager, job_id))
         await send_step(manager, job_id, "agent", "done", "Verdict ready")
 
-        # final result
+        result = build_result(verdict, efficientnet_score, clip_score, freq_score,
+                              final_ensemble, [], heatmap_b64)
+        result["media_type"] = "video"
+        result["video"] = {**info, **summary, "sampling": VIDEO_SAMPLING, "face_tracking": face_stats}
+        result["tracks"] = tracks
+        result["timeline"] = timeline
+        if store is not None:
+            store.update(job_id, DONE, result=result)
         await manager.send(job_id, {
             "type": "result",
-            "data": {
-                "verdict": verdict["verdict"],
-                "confidence": verdict["confidence"],
-                "efficientnet_score": round(efficientnet_score),
-                "clip_score": round(clip_score),
-                "ml_score": round(final_ensemble),
-                "frequency_score": round(freq_score),
-                "summary": verdict["summary"],
-                "agent_reasoning": verdict["reasoning"],
-                "reverse_search": search_results,
-                "heatmap":heatmap_b64
-            }
+            "data": result
         })
+        return result
 
     except Exception as e:
-        print(f"[TruthLens] Pipeline error for job {job_id}: {e}")
+        print(f"[TruthLens] Video pipeline error for job {job_id}: {e}")
+        if store is not None:
+            store.update(job_id, ERROR, error=str(e))
         await manager.send(job_id, {
             "type": "error",
             "message": str(e)
-        })
\ No newline at end of file
+        })
+        return None
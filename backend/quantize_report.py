@@ -0,0 +1,196 @@
+"""
+Accuracy report for TRUTHLENS_QUANTIZE=int8 — scores a labeled sample with the
+FP32 and the dynamically quantized INT8 detector and CLIP vision tower on CPU,
+and compares score drift, verdict agreement, accuracy and resident memory.
+
+    python quantize_report.py samples/ --limit 500 --out int8_report.json
+
+`samples/` holds one sub-directory per label: real/ and fake/ (or ai/).
+Verdicts use the rule-based fallback on the weighted ensemble, so the report
+needs no LLM calls and is reproducible.
+"""
+import argparse
+import copy
+import io
+import json
+import os
+import sys
+import time
+from itertools import zip_longest
+import numpy as np
+import torch
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from models import runtime
+# FP32 reference models on CPU, whatever the host or TRUTHLENS_QUANTIZE says
+runtime.QUANTIZE = "none"
+from models import efficientnet, clip_classifier
+efficientnet._device = clip_classifier._device = torch.device("cpu")
+
+from models.decoded_image import DecodedImage
+from models.frequency import frequency_analysis
+from ensemble import compute_ensemble
+from agent.agent import fallback_verdict
+from tools.archive import is_image_name
+
+LABELS = {"real": "real", "fake": "fake", "ai": "fake"}
+PREDICTED = {"LIKELY REAL": "real", "LIKELY AI GENERATED": "fake"}
+
+
+def load_samples(directory: str, limit: int) -> list:
+    """[(path, label)] from the real/ and fake/ sub-directories, interleaved per label."""
+    per_label = {}
+    for entry in sorted(os.listdir(directory)):
+        label = LABELS.get(entry.lower())
+        if label is None or not os.path.isdir(os.path.join(directory, entry)):
+            continue
+        for root, dirs, files in os.walk(os.path.join(directory, entry)):
+            dirs.sort()
+            per_label.setdefault(label, []).extend(
+                (os.path.join(root, name), label) for name in sorted(files) if is_image_name(name))
+    if not per_label:
+        raise SystemExit(f"[TruthLens] No real/ or fake/ image folders under {directory}")
+    # Round-robin so --limit keeps both labels represented
+    samples = [s for group in zip_longest(*per_label.values()) for s in group if s is not None]
+    return samples[:limit] if limit else samples
+
+
+def weights_mb(model) -> float:
+    """Serialized state_dict size — counts packed INT8 weights, unlike parameters()."""
+    buf = io.BytesIO()
+    torch.save(model.state_dict(), buf)
+    return round(len(buf.getvalue()) / 2**20, 1)
+
+
+def resident_mb() -> float:
+    """Current resident set size of this process (peak RSS where /proc is missing)."""
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except OSError:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / (2**20 if sys.platform == "darwin" else 2**10)
+
+
+def score(images: list, detector, clip, batch_size: int) -> dict:
+    fake_idx = efficientnet.fake_label_index()
+    detector_scores, clip_scores = [], []
+    seconds = {"detector": 0.0, "clip": 0.0}
+    for start in range(0, len(images), batch_size):
+        pixels = [image.rgb for image in images[start:start + batch_size]]
+        t0 = time.perf_counter()
+        probs = efficientnet._forward(detector, pixels)
+        t1 = time.perf_counter()
+        features = clip_classifier._image_features(clip, pixels)
+        t2 = time.perf_counter()
+        detector_scores.extend((probs[:, fake_idx] * 100).tolist())
+        clip_scores.extend(clip_classifier._fake_scores(features))
+        seconds["detector"] += t1 - t0
+        seconds["clip"] += t2 - t1
+    return {
+        "detector": np.array(detector_scores),
+        "clip": np.array(clip_scores),
+        "ms_per_image": {k: round(v * 1000 / len(images), 1) for k, v in seconds.items()},
+    }
+
+
+def verdicts(scores: dict, freq: np.ndarray) -> list:
+    return [
+        fallback_verdict(compute_ensemble(float(d), float(c), float(f)))["verdict"]
+        for d, c, f in zip(scores["detector"], scores["clip"], freq)
+    ]
+
+
+def accuracy(predicted: list, labels: list) -> dict:
+    decisive = [(PREDICTED[v], label) for v, label in zip(predicted, labels) if v in PREDICTED]
+    correct = sum(p == label for p, label in decisive)
+    return {
+        "accuracy": round(correct / len(labels), 4),
+        "accuracy_decisive": round(correct / len(decisive), 4) if decisive else None,
+        "inconclusive": len(labels) - len(decisive),
+    }
+
+
+def drift(fp32: np.ndarray, int8: np.ndarray) -> dict:
+    delta = np.abs(fp32 - int8)
+    return {
+        "mean_abs": round(float(delta.mean()), 3),
+        "p95_abs": round(float(np.percentile(delta, 95)), 3),
+        "max_abs": round(float(delta.max()), 3),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="truthlens-quantize-report", description=__doc__.split("\n\n")[0])
+    parser.add_argument("samples", help="directory with real/ and fake/ sub-directories")
+    parser.add_argument("--limit", type=int, default=0, help="max images (0 = all)")
+    parser.add_argument("--batch-size", type=int, default=8)
+    parser.add_argument("--out", help="also write the report as JSON")
+    args = parser.parse_args(argv)
+
+    samples = load_samples(args.samples, args.limit)
+    images, labels = [], []
+    for path, label in samples:
+        with open(path, "rb") as f:
+            images.append(DecodedImage(f.read()))
+        labels.append(label)
+    print(f"[TruthLens] {len(images)} images "
+          f"({labels.count('real')} real / {labels.count('fake')} fake)")
+
+    # RSS growth as each model appears — what a worker actually holds resident
+    rss = [resident_mb()]
+    efficientnet._load_model()
+    rss.append(resident_mb())
+    clip_classifier._load_model()
+    rss.append(resident_mb())
+    detector_fp32, clip_fp32 = efficientnet._model, clip_classifier._model
+    sizes = {"detector_fp32_mb": weights_mb(detector_fp32), "clip_vision_fp32_mb": weights_mb(clip_fp32.vision_model)}
+    detector_int8 = efficientnet.quantize(copy.deepcopy(detector_fp32))
+    rss.append(resident_mb())
+    clip_int8 = clip_classifier.quantize(copy.deepcopy(clip_fp32))
+    rss.append(resident_mb())
+    sizes.update(detector_int8_mb=weights_mb(detector_int8), clip_vision_int8_mb=weights_mb(clip_int8.vision_model))
+    detector_rss = {"fp32": rss[1] - rss[0], "int8": rss[3] - rss[2]}
+    clip_rss = {"fp32": rss[2] - rss[1], "int8": rss[4] - rss[3]}
+    resident = {
+        "process_before_models_mb": round(rss[0], 1),
+        "detector_mb": {k: round(v, 1) for k, v in detector_rss.items()},
+        "clip_mb": {k: round(v, 1) for k, v in clip_rss.items()},
+        # Detector + CLIP as served; INT8 heatmaps (TRUTHLENS_HEATMAPS=1) add the FP32 detector back
+        "serving_mb": {
+            "fp32": round(detector_rss["fp32"] + clip_rss["fp32"], 1),
+            "int8": round(detector_rss["int8"] + clip_rss["int8"], 1),
+            "int8_with_heatmaps": round(detector_rss["int8"] + clip_rss["int8"] + detector_rss["fp32"], 1),
+        },
+    }
+
+    freq = np.array([frequency_analysis(image) for image in images])
+    fp32 = score(images, detector_fp32, clip_fp32, args.batch_size)
+    int8 = score(images, detector_int8, clip_int8, args.batch_size)
+    verdicts_fp32, verdicts_int8 = verdicts(fp32, freq), verdicts(int8, freq)
+
+    report = {
+        "images": len(images),
+        "weights": sizes,
+        # Approximate — the allocator may keep pages freed by quantization resident
+        "resident": resident,
+        "latency_ms_per_image": {"fp32": fp32["ms_per_image"], "int8": int8["ms_per_image"]},
+        "score_drift": {"detector": drift(fp32["detector"], int8["detector"]),
+                        "clip": drift(fp32["clip"], int8["clip"])},
+        "verdict_agreement": round(sum(a == b for a, b in zip(verdicts_fp32, verdicts_int8)) / len(images), 4),
+        "fp32": accuracy(verdicts_fp32, labels),
+        "int8": accuracy(verdicts_int8, labels),
+    }
+    print(json.dumps(report, indent=2))
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"[TruthLens] Wrote {args.out}")
+
+
+if __name__ == "__main__":
+    main()
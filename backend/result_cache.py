@@ -0,0 +1,125 @@
+import os
+import threading
+from collections import OrderedDict
+from stage_cache import approx_size
+
+
+class ResultCache:
+    """
+    Content-addressed cache of finished pipeline results.
+
+    Lookups match the exact SHA-256 of the upload. With `max_distance` >= 0
+    they then fall back to the nearest perceptual hash (dHash) within that many
+    bits, so re-encoded or resized copies of a viral image hit too — off by
+    default: a locally edited copy (a face swap on a real photo) can land
+    within a few bits of the original and would be served its verdict.
+    Every key is scoped to the pipeline version, so changing model IDs,
+    prompts or WEIGHTS invalidates old entries, and to the filename: reverse
+    search queries on it and the agent's summary names it, so the same bytes
+    uploaded under another name are analysed afresh. Besides `max_entries`,
+    results (heatmaps and video timelines make them large) are bounded by
+    `max_bytes`.
+    """
+
+    def __init__(self, max_entries: int = 2048, max_distance: int = -1, max_bytes: int = 256 * 2**20):
+        self.max_entries = max_entries
+        self.max_distance = max_distance
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()   # (version, filename, sha256) → (dhash, result, size)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits_exact = 0
+        self.hits_perceptual = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0
+
+    def get(self, image, version: str, filename: str):
+        """Returns a cached result dict for the image, or None. `image` is a DecodedImage."""
+        if not self.enabled:
+            return None
+        key = (version, filename, image.sha256)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits_exact += 1
+                return {**entry[1], "cache": "exact"}
+
+        # dHash needs a decode — only pay for it on an exact miss
+        dhash = self._dhash(image) if self.max_distance >= 0 else None
+        if dhash is not None:
+            with self._lock:
+                best_key, best_dist = None, self.max_distance + 1
+                for candidate, (other, _, _) in self._entries.items():
+                    if candidate[:2] != (version, filename):
+                        continue
+                    dist = (dhash ^ other).bit_count()
+                    if dist < best_dist:
+                        best_key, best_dist = candidate, dist
+                if best_key is not None:
+                    self._entries.move_to_end(best_key)
+                    self.hits_perceptual += 1
+                    return {**self._entries[best_key][1], "cache": "perceptual"}
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    @staticmethod
+    def _dhash(image):
+        # Bytes that aren't an image are just a miss — run_pipeline reports the
+        # decode error through the job store
+        try:
+            return image.dhash
+        except Exception:
+            return None
+
+    def put(self, image, version: str, filename: str, result: dict):
+        if not self.enabled:
+            return
+        dhash = image.dhash if self.max_distance >= 0 else 0
+        size = approx_size(result)
+        if size > self.max_bytes:
+            return
+        key = (version, filename, image.sha256)
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old[2]
+            self._entries[key] = (dhash, result, size)
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                self._bytes -= self._entries.popitem(last=False)[1][2]
+                self.evictions += 1
+
+    def stats(self) -> dict:
+        lookups = self.hits_exact + self.hits_perceptual + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            "hits_exact": self.hits_exact,
+            "hits_perceptual": self.hits_perceptual,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round((lookups - self.misses) / lookups, 3) if lookups else 0.0,
+        }
+
+
+def create_result_cache() -> ResultCache:
+    """
+    TRUTHLENS_RESULT_CACHE_SIZE         = max cached results (default 2048, 0 disables)
+    TRUTHLENS_RESULT_CACHE_MAX_MB       = memory budget for cached results in MB (default 256)
+    TRUTHLENS_RESULT_CACHE_MAX_DISTANCE = dHash bit distance for a near-duplicate hit
+                                          (default -1 = exact matches only)
+    """
+    return ResultCache(
+        max_entries=int(os.getenv("TRUTHLENS_RESULT_CACHE_SIZE", "2048")),
+        max_distance=int(os.getenv("TRUTHLENS_RESULT_CACHE_MAX_DISTANCE", "-1")),
+        max_bytes=int(float(os.getenv("TRUTHLENS_RESULT_CACHE_MAX_MB", "256")) * 2**20),
+    )
@@ -0,0 +1,202 @@
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from functools import partial
+
+
+class Overloaded(Exception):
+    """Raised by Scheduler.submit when every job slot and queue place is taken."""
+
+
+class StagePool:
+    """
+    A bounded thread pool for one resource class, with queue-depth metrics.
+
+    `await pool.run(fn, *args)` runs fn on one of `workers` threads; calls
+    beyond that wait in the pool's queue instead of spawning more threads, so
+    a burst of jobs can't oversubscribe the cores (or the GPU) it guards.
+    """
+
+    def __init__(self, name: str, workers: int):
+        self.name = name
+        self.workers = max(1, int(workers))
+        self._executor = ThreadPoolExecutor(self.workers, thread_name_prefix=f"truthlens-{name}")
+        self._lock = threading.Lock()
+        self._queued = 0
+        self._running = 0
+        self._completed = 0
+        self._peak_queued = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+
+    async def run(self, fn, *args, **kwargs):
+        submitted = time.perf_counter()
+        call = partial(fn, *args, **kwargs)
+
+        def task():
+            waited = time.perf_counter() - submitted
+            with self._lock:
+                self._queued -= 1
+                self._running += 1
+                self._wait_total += waited
+                self._wait_max = max(self._wait_max, waited)
+            try:
+                return call()
+            finally:
+                with self._lock:
+                    self._running -= 1
+                    self._completed += 1
+
+        with self._lock:
+            self._queued += 1
+            self._peak_queued = max(self._peak_queued, self._queued)
+        future = self._executor.submit(task)
+        future.add_done_callback(self._on_done)
+        return await asyncio.wrap_future(future)
+
+    def _on_done(self, future):
+        # A caller cancelled while still queued — the task never ran to dequeue itself
+        if future.cancelled():
+            with self._lock:
+                self._queued -= 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            started = self._completed + self._running
+            return {
+                "workers": self.workers,
+                "running": self._running,
+                "queued": self._queued,
+                "peak_queued": self._peak_queued,
+                "completed": self._completed,
+                "avg_wait_ms": round(self._wait_total * 1000 / started, 2) if started else 0.0,
+                "max_wait_ms": round(self._wait_max * 1000, 2),
+            }
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+class Scheduler:
+    """
+    Job admission plus one StagePool per resource class:
+
+        model — detector / CLIP / InsightFace / Grad-CAM inference (GPU or all cores)
+        cpu   — light CPU work: frequency analysis, EXIF, hashing, frame decoding
+        io    — blocking network and disk calls: reverse search, upload spooling
+
+    At most `max_active` jobs run at once and `max_queued` more wait for a slot;
+    submit() raises Overloaded beyond that, which the API turns into a 429.
+    Event-loop only — not thread-safe.
+    """
+
+    def __init__(self, model_workers: int = 3, cpu_workers: int = 4, io_workers: int = 16,
+                 max_active: int = 8, max_queued: int = 64):
+        self.model = StagePool("model", model_workers)
+        self.cpu = StagePool("cpu", cpu_workers)
+        self.io = StagePool("io", io_workers)
+        self.max_active = max(1, int(max_active))
+        self.max_queued = max(0, int(max_queued))
+        self._slots = asyncio.Semaphore(self.max_active)
+        self._tasks = set()
+        self._active = 0
+        self._waiting = 0
+        self._admitted = 0
+        self._rejected = 0
+        self._peak_waiting = 0
+
+    @classmethod
+    def from_env(cls):
+        cores = os.cpu_count() or 4
+        return cls(
+            model_workers=int(os.getenv("TRUTHLENS_MODEL_WORKERS", "3")),
+            cpu_workers=int(os.getenv("TRUTHLENS_CPU_WORKERS", str(min(8, cores)))),
+            io_workers=int(os.getenv("TRUTHLENS_IO_WORKERS", "16")),
+            max_active=int(os.getenv("TRUTHLENS_MAX_ACTIVE_JOBS", "8")),
+            max_queued=int(os.getenv("TRUTHLENS_MAX_QUEUED_JOBS", "64")),
+        )
+
+    def full(self) -> bool:
+        return self._active + self._waiting >= self.max_active + self.max_queued
+
+    def submit(self, coro) -> asyncio.Task:
+        """Schedules a job coroutine behind the admission queue, or raises Overloaded."""
+        if self.full():
+            self._rejected += 1
+            coro.close()
+            raise Overloaded(f"{self._active} jobs running and {self._waiting} queued — try again later")
+        # Counted now, not when the task first runs, so a burst can't overshoot the limit
+        self._enter_queue()
+        started = False
+
+        async def run():
+            nonlocal started
+            started = True
+            try:
+                async with self._hold():
+                    return await coro
+            finally:
+                coro.close()   # no-op once awaited; a job cancelled in the queue never ran
+
+        def done(task):
+            self._tasks.discard(task)
+            if not started:
+                # Cancelled before its first step — _hold never gave the queue place back
+                self._waiting -= 1
+                coro.close()
+
+        task = asyncio.create_task(run())
+        # The loop only holds weak references — keep fire-and-forget jobs alive
+        self._tasks.add(task)
+        task.add_done_callback(done)
+        return task
+
+    @asynccontextmanager
+    async def slot(self):
+        """Waits for a job slot without the Overloaded check — for work already accepted."""
+        self._enter_queue()
+        async with self._hold():
+            yield
+
+    def _enter_queue(self):
+        self._waiting += 1
+        self._admitted += 1
+        self._peak_waiting = max(self._peak_waiting, self._waiting)
+
+    @asynccontextmanager
+    async def _hold(self):
+        try:
+            await self._slots.acquire()
+        finally:
+            self._waiting -= 1
+        self._active += 1
+        try:
+            yield
+        finally:
+            self._active -= 1
+            self._slots.release()
+
+    def stats(self) -> dict:
+        return {
+            "jobs": {
+                "active": self._active,
+                "queued": self._waiting,
+                "peak_queued": self._peak_waiting,
+                "admitted": self._admitted,
+                "rejected": self._rejected,
+                "max_active": self.max_active,
+                "max_queued": self.max_queued,
+            },
+            "pools": {pool.name: pool.stats() for pool in (self.model, self.cpu, self.io)},
+        }
+
+    def shutdown(self):
+        for pool in (self.model, self.cpu, self.io):
+            pool.shutdown()
+
+
+def create_scheduler() -> Scheduler:
+    return Scheduler.from_env()
@@ -0,0 +1,140 @@
+import json
+import os
+import sqlite3
+import threading
+from collections import OrderedDict, defaultdict
+
+# Distinguishes "not cached" from a cached None / falsy value
+MISS = object()
+
+
+def approx_size(value) -> int:
+    """Bytes a cached value holds, near enough for a memory budget — heatmaps are long base64 strings."""
+    if isinstance(value, str):
+        return len(value)
+    return len(json.dumps(value))
+
+
+class StageCache:
+    """
+    Memoizes individual stage outputs (face box, detector / CLIP / frequency
+    scores, heatmap) by (stage, stage version, input digest).
+
+    Each stage has its own version string, so changing one model or prompt set
+    only invalidates that stage — the rest of an archive reprocess is served
+    from cache. An in-memory LRU, bounded by entry count and by `max_bytes`
+    of values, sits in front of an optional SQLite file that persists across
+    runs and processes. Values must be JSON-serializable.
+    """
+
+    def __init__(self, max_entries: int = 1024, path: str = None, max_bytes: int = 256 * 2**20):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.path = path
+        self._memory = OrderedDict()   # key → (value, size)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._hits = defaultdict(int)
+        self._misses = defaultdict(int)
+        self._conn = None
+        if path:
+            self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute(
+                """CREATE TABLE IF NOT EXISTS stages (
+                    stage   TEXT NOT NULL,
+                    version TEXT NOT NULL,
+                    digest  TEXT NOT NULL,
+                    value   TEXT NOT NULL,
+                    PRIMARY KEY (stage, version, digest)
+                )"""
+            )
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0 or self._conn is not None
+
+    def get(self, stage: str, version: str, digest: str):
+        """Cached value or MISS."""
+        if not self.enabled:
+            return MISS
+        key = (stage, version, digest)
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                self._hits[stage] += 1
+                return self._memory[key][0]
+            if self._conn is not None:
+                row = self._conn.execute(
+                    "SELECT value FROM stages WHERE stage = ? AND version = ? AND digest = ?",
+                    key,
+                ).fetchone()
+                if row is not None:
+                    value = json.loads(row[0])
+                    self._remember_locked(key, value)
+                    self._hits[stage] += 1
+                    return value
+            self._misses[stage] += 1
+            return MISS
+
+    def put(self, stage: str, version: str, digest: str, value):
+        if not self.enabled:
+            return
+        key = (stage, version, digest)
+        with self._lock:
+            self._remember_locked(key, value)
+            if self._conn is not None:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO stages VALUES (?, ?, ?, ?)",
+                    (*key, json.dumps(value)),
+                )
+
+    def memoize(self, stage: str, version: str, digest: str, compute, cacheable=None):
+        """Synchronous get-or-compute. `cacheable(value)` can veto storing error fallbacks."""
+        value = self.get(stage, version, digest)
+        if value is not MISS:
+            return value
+        value = compute()
+        if cacheable is None or cacheable(value):
+            self.put(stage, version, digest, value)
+        return value
+
+    def _remember_locked(self, key, value):
+        if self.max_entries <= 0:
+            return
+        old = self._memory.pop(key, None)
+        if old is not None:
+            self._bytes -= old[1]
+        size = approx_size(value)
+        if size > self.max_bytes:
+            return   # would evict everything else — only the SQLite file keeps it
+        self._memory[key] = (value, size)
+        self._bytes += size
+        while len(self._memory) > self.max_entries or self._bytes > self.max_bytes:
+            self._bytes -= self._memory.popitem(last=False)[1][1]
+
+    def stats(self) -> dict:
+        stages = sorted(set(self._hits) | set(self._misses))
+        return {
+            "entries_in_memory": len(self._memory),
+            "bytes_in_memory": self._bytes,
+            "max_bytes": self.max_bytes,
+            "persistent": self.path,
+            "stages": {
+                s: {"hits": self._hits[s], "misses": self._misses[s]} for s in stages
+            },
+        }
+
+
+def create_stage_cache() -> StageCache:
+    """
+    TRUTHLENS_STAGE_CACHE_SIZE   = in-memory entries (default 1024, 0 disables the LRU)
+    TRUTHLENS_STAGE_CACHE_MAX_MB = in-memory value budget in MB (default 256)
+    TRUTHLENS_STAGE_CACHE_DB     = SQLite file for persistent memoization (unset = memory only)
+    """
+    return StageCache(
+        max_entries=int(os.getenv("TRUTHLENS_STAGE_CACHE_SIZE", "1024")),
+        path=os.getenv("TRUTHLENS_STAGE_CACHE_DB") or None,
+        max_bytes=int(float(os.getenv("TRUTHLENS_STAGE_CACHE_MAX_MB", "256")) * 2**20),
+    )
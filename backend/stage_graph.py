@@ -0,0 +1,82 @@
+import asyncio
+import time
+
+
+class StageGraph:
+    """
+    Runs async pipeline stages as a dependency DAG — every stage starts as soon
+    as the stages it depends on have finished, so independent ones overlap.
+
+        graph = StageGraph()
+        graph.add("face", face)
+        graph.add("ml", ml, after=("face",))
+        results, timings = await graph.run()
+
+    A stage is `async fn(inputs)`, where `inputs` maps each dependency's name
+    to its result. Dependencies must be added first, so the graph is acyclic
+    by construction. If any stage raises, the rest are cancelled and the
+    exception propagates.
+    """
+
+    def __init__(self):
+        self._stages = {}
+
+    def add(self, name: str, fn, after: tuple = ()):
+        missing = [dep for dep in after if dep not in self._stages]
+        if missing:
+            raise ValueError(f"Stage {name} depends on unknown stage(s): {', '.join(missing)}")
+        self._stages[name] = (fn, tuple(after))
+
+    async def run(self) -> tuple:
+        """Returns (results by stage name, timings — see critical_path)."""
+        origin = time.perf_counter()
+        spans = {}
+        tasks = {}
+
+        async def run_stage(name: str):
+            fn, after = self._stages[name]
+            inputs = {dep: await tasks[dep] for dep in after}
+            start = time.perf_counter()
+            try:
+                return await fn(inputs)
+            finally:
+                spans[name] = (start - origin, time.perf_counter() - origin)
+
+        for name in self._stages:
+            tasks[name] = asyncio.ensure_future(run_stage(name))
+        try:
+            results = await asyncio.gather(*tasks.values())
+        except BaseException:
+            for task in tasks.values():
+                task.cancel()
+            await asyncio.gather(*tasks.values(), return_exceptions=True)
+            raise
+        return dict(zip(tasks, results)), self.critical_path(spans)
+
+    def critical_path(self, spans: dict) -> dict:
+        """
+        Per-stage start/end/duration (ms from the start of the run) plus the
+        critical path: the chain of stages, walking back from the last one to
+        finish through whichever dependency finished last, that set the total.
+        """
+        path = []
+        name = max(spans, key=lambda n: spans[n][1]) if spans else None
+        while name is not None:
+            path.append(name)
+            after = self._stages[name][1]
+            name = max(after, key=lambda n: spans[n][1]) if after else None
+        path.reverse()
+
+        return {
+            "total_ms": round(max((end for _, end in spans.values()), default=0.0) * 1000, 1),
+            "critical_path": path,
+            "stages": {
+                name: {
+                    "start_ms": round(spans[name][0] * 1000, 1),
+                    "end_ms": round(spans[name][1] * 1000, 1),
+                    "duration_ms": round((spans[name][1] - spans[name][0]) * 1000, 1),
+                    "critical": name in path,
+                }
+                for name in self._stages if name in spans
+            },
+        }
@@ -0,0 +1,131 @@
+import asyncio
+import json
+import pytest
+from agent import agent
+from agent.agent import VerdictCache, build_batch_prompt, fallback_verdict, parse_verdicts, run_agent_batch
+
+
+def verdict(name: str, label: str = "LIKELY REAL") -> dict:
+    return {"verdict": label, "confidence": 70, "summary": f"{name} looks fine", "reasoning": [name]}
+
+
+def signals(name: str, ensemble: float = 20.0) -> dict:
+    return {
+        "efficientnet_score": ensemble, "clip_score": ensemble, "freq_score": ensemble,
+        "ensemble_score": ensemble, "exif": {"stripped": True, "stripped_expected": True},
+        "search_results": [], "filename": name,
+    }
+
+
+class CannedClient:
+    """Stands in for the LLM client — answers every chat() with the next canned reply."""
+
+    def __init__(self, *replies):
+        self.replies = list(replies)
+        self.requests = []
+
+    async def chat(self, messages: list, **kwargs) -> str:
+        self.requests.append(messages)
+        reply = self.replies.pop(0)
+        if isinstance(reply, Exception):
+            raise reply
+        return reply
+
+
+@pytest.fixture
+def client(monkeypatch):
+    """Installs a CannedClient and an empty verdict cache; the test sets .replies."""
+    canned = CannedClient()
+    monkeypatch.setattr(agent, "get_client", lambda: canned)
+    monkeypatch.setattr(agent, "verdict_cache", VerdictCache())
+    return canned
+
+
+# ── parse_verdicts ────────────────────────────────────────────────────────────
+
+def test_matches_by_id_not_position():
+    reply = json.dumps([{"id": 3, **verdict("c")}, {"id": 1, **verdict("a")}, {"id": 2, **verdict("b")}])
+    assert [v["summary"] for v in parse_verdicts(reply, 3)] == ["a looks fine", "b looks fine", "c looks fine"]
+
+
+def test_ids_are_stripped():
+    assert parse_verdicts(json.dumps([{"id": 1, **verdict("a")}]), 1) == [verdict("a")]
+
+
+def test_missing_ids_fall_back_to_position():
+    reply = json.dumps([verdict("a"), verdict("b")])
+    assert parse_verdicts(reply, 2) == [verdict("a"), verdict("b")]
+
+
+def test_missing_entry_is_none():
+    reply = json.dumps([{"id": 1, **verdict("a")}, {"id": 3, **verdict("c")}])
+    assert parse_verdicts(reply, 3) == [verdict("a"), None, verdict("c")]
+
+
+def test_extra_duplicate_and_malformed_items_are_ignored():
+    reply = json.dumps([
+        {"id": 1, **verdict("a")},
+        {"id": 1, **verdict("a again")},       # duplicate — the first one wins
+        {"id": 9, **verdict("nobody")},        # out of range
+        {"id": "2", **verdict("string id")},   # not an int
+        {"id": 2, "verdict": "LIKELY REAL"},   # missing fields
+        "not an object",
+    ])
+    assert parse_verdicts(reply, 2) == [verdict("a"), None]
+
+
+def test_wrapper_object_and_fences():
+    reply = "```json\n" + json.dumps({"verdicts": [{"id": 1, **verdict("a")}]}) + "\n```"
+    assert parse_verdicts(reply, 1) == [verdict("a")]
+
+
+@pytest.mark.parametrize("reply", ['{"verdict": "LIKELY REAL"}', "not json", "42"])
+def test_non_array_reply_raises(reply):
+    with pytest.raises(ValueError):
+        parse_verdicts(reply, 2)
+
+
+def test_batch_prompt_numbers_every_image():
+    prompt = build_batch_prompt([signals("a.jpg"), signals("b.png")])
+    assert "IMAGE 1: a.jpg" in prompt and "IMAGE 2: b.png" in prompt
+    assert "ids 1-2" in prompt
+
+
+# ── run_agent_batch ───────────────────────────────────────────────────────────
+
+def test_one_request_for_the_batch(client):
+    client.replies = [json.dumps([{"id": 2, **verdict("b")}, {"id": 1, **verdict("a")}])]
+    verdicts = asyncio.run(run_agent_batch([signals("a.jpg"), signals("b.jpg")]))
+    assert verdicts == [verdict("a"), verdict("b")]
+    assert len(client.requests) == 1
+    assert client.requests[0][0]["content"] == agent.BATCH_SYSTEM_PROMPT
+
+
+def test_missing_verdict_falls_back_alone_and_is_not_cached(client):
+    batch = [signals("a.jpg"), signals("b.jpg", ensemble=80.0), signals("c.jpg")]
+    client.replies = [json.dumps([{"id": 1, **verdict("a")}, {"id": 3, **verdict("c")}])]
+    verdicts = asyncio.run(run_agent_batch(batch))
+    assert verdicts == [verdict("a"), fallback_verdict(80.0), verdict("c")]
+
+    # a and c are cached now; only b is asked again — alone, with the single-image prompt
+    client.replies = [json.dumps(verdict("b", "LIKELY AI GENERATED"))]
+    verdicts = asyncio.run(run_agent_batch(batch))
+    assert verdicts == [verdict("a"), verdict("b", "LIKELY AI GENERATED"), verdict("c")]
+    assert len(client.requests) == 2
+    assert client.requests[1][0]["content"] == agent.SYSTEM_PROMPT
+
+
+@pytest.mark.parametrize("reply", ["the model rambled instead", RuntimeError("connection reset")])
+def test_unusable_reply_falls_back_for_every_job(client, reply):
+    client.replies = [reply]
+    verdicts = asyncio.run(run_agent_batch([signals("a.jpg", 10.0), signals("b.jpg", 90.0)]))
+    assert verdicts == [fallback_verdict(10.0), fallback_verdict(90.0)]
+    assert agent.verdict_cache.stats()["entries"] == 0
+
+
+def test_fully_cached_batch_makes_no_request(client):
+    client.replies = [json.dumps([{"id": 1, **verdict("a")}, {"id": 2, **verdict("b")}])]
+    batch = [signals("a.jpg"), signals("b.jpg")]
+    first = asyncio.run(run_agent_batch(batch))
+    assert asyncio.run(run_agent_batch(batch)) == first
+    assert len(client.requests) == 1
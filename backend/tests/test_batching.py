@@ -0,0 +1,133 @@
+import asyncio
+import time
+import pytest
+from models.batching import MicroBatcher
+
+
+class Recorder:
+    """batch_fn that records every batch it is called with and doubles each item."""
+
+    def __init__(self, fail_on=None):
+        self.batches = []
+        self.fail_on = fail_on
+
+    def __call__(self, items: list) -> list:
+        self.batches.append(list(items))
+        if self.fail_on is not None and self.fail_on in items:
+            raise ValueError(f"bad item {self.fail_on}")
+        return [item * 2 for item in items]
+
+
+async def submit_all(batcher: MicroBatcher, items, return_exceptions=False) -> list:
+    return await asyncio.gather(*(batcher.submit(item) for item in items),
+                                return_exceptions=return_exceptions)
+
+
+def test_full_batch_flushes_without_waiting_for_the_timer():
+    recorder = Recorder()
+    batcher = MicroBatcher("test", recorder, max_batch_size=4, max_wait_ms=10_000)
+
+    started = time.perf_counter()
+    results = asyncio.run(submit_all(batcher, range(8)))
+    assert time.perf_counter() - started < 1
+    assert results == [i * 2 for i in range(8)]
+    assert recorder.batches == [[0, 1, 2, 3], [4, 5, 6, 7]]
+
+
+def test_partial_batch_flushes_on_the_timer():
+    recorder = Recorder()
+    batcher = MicroBatcher("test", recorder, max_batch_size=8, max_wait_ms=50)
+
+    async def main():
+        started = time.perf_counter()
+        results = await submit_all(batcher, range(3))
+        return results, time.perf_counter() - started
+
+    results, elapsed = asyncio.run(main())
+    assert results == [0, 2, 4]
+    assert recorder.batches == [[0, 1, 2]]
+    assert 0.04 <= elapsed < 1
+
+
+def test_cancelled_items_are_skipped():
+    recorder = Recorder()
+    batcher = MicroBatcher("test", recorder, max_batch_size=8, max_wait_ms=30)
+
+    async def main():
+        tasks = [asyncio.ensure_future(batcher.submit(item)) for item in range(4)]
+        await asyncio.sleep(0)
+        tasks[1].cancel()
+        tasks[3].cancel()
+        return await asyncio.gather(*tasks, return_exceptions=True)
+
+    results = asyncio.run(main())
+    assert results[0] == 0 and results[2] == 4
+    assert isinstance(results[1], asyncio.CancelledError)
+    assert recorder.batches == [[0, 2]]
+
+
+def test_batch_of_only_cancelled_items_never_runs():
+    recorder = Recorder()
+    batcher = MicroBatcher("test", recorder, max_batch_size=8, max_wait_ms=20)
+
+    async def main():
+        task = asyncio.ensure_future(batcher.submit(1))
+        await asyncio.sleep(0)
+        task.cancel()
+        await asyncio.sleep(0.05)
+
+    asyncio.run(main())
+    assert recorder.batches == []
+    assert batcher.stats()["batches"] == 0
+
+
+def test_exception_reaches_every_item_of_its_batch_only():
+    recorder = Recorder(fail_on=5)
+    batcher = MicroBatcher("test", recorder, max_batch_size=4, max_wait_ms=10_000)
+
+    results = asyncio.run(submit_all(batcher, range(8), return_exceptions=True))
+    assert results[:4] == [0, 2, 4, 6]
+    for result in results[4:]:
+        assert isinstance(result, ValueError) and str(result) == "bad item 5"
+
+
+def test_wrong_result_count_fails_the_batch():
+    batcher = MicroBatcher("test", lambda items: items[:-1], max_batch_size=2, max_wait_ms=10_000)
+    results = asyncio.run(submit_all(batcher, [1, 2], return_exceptions=True))
+    assert all(isinstance(r, RuntimeError) and "1 results for 2 items" in str(r) for r in results)
+
+
+def test_async_batch_fn_is_awaited():
+    seen = []
+
+    async def batch_fn(items):
+        seen.append(list(items))
+        await asyncio.sleep(0)
+        return [item + 1 for item in items]
+
+    batcher = MicroBatcher("test", batch_fn, max_batch_size=3, max_wait_ms=10)
+    assert asyncio.run(submit_all(batcher, range(3))) == [1, 2, 3]
+    assert seen == [[0, 1, 2]]
+
+
+def test_stats_fill_rate():
+    recorder = Recorder()
+    batcher = MicroBatcher("test", recorder, max_batch_size=4, max_wait_ms=20)
+
+    async def main():
+        await submit_all(batcher, range(4))   # full batch
+        await submit_all(batcher, range(2))   # half batch, on the timer
+
+    asyncio.run(main())
+    stats = batcher.stats()
+    assert stats["batches"] == 2 and stats["items"] == 6
+    assert stats["avg_batch_size"] == 3.0 and stats["largest_batch"] == 4
+    assert stats["fill_rate"] == pytest.approx(0.75)
+    assert stats["queued"] == 0
+
+
+def test_from_env(monkeypatch):
+    monkeypatch.setenv("TRUTHLENS_TEST_MAX_SIZE", "16")
+    monkeypatch.setenv("TRUTHLENS_TEST_MAX_WAIT_MS", "2.5")
+    batcher = MicroBatcher.from_env("test", Recorder(), prefix="TRUTHLENS_TEST", max_batch_size=4)
+    assert (batcher.max_batch_size, batcher.max_wait_ms) == (16, 2.5)
@@ -0,0 +1,172 @@
+import io
+import numpy as np
+from PIL import Image
+from models.decoded_image import DecodedImage
+from result_cache import ResultCache
+from stage_cache import MISS, StageCache, approx_size
+
+
+def text(n: int) -> str:
+    return "x" * n
+
+
+# ── StageCache ────────────────────────────────────────────────────────────────
+
+def test_approx_size():
+    assert approx_size(text(100)) == 100
+    assert approx_size({"score": 12.5}) == len('{"score": 12.5}')
+
+
+def test_byte_budget_evicts_least_recently_used():
+    cache = StageCache(max_entries=100, max_bytes=100)
+    for digest in "abc":
+        cache.put("heatmap", "v1", digest, text(40))
+        if digest == "b":
+            cache.get("heatmap", "v1", "a")   # a is now more recent than b
+    assert cache.get("heatmap", "v1", "b") is MISS
+    assert cache.get("heatmap", "v1", "a") == text(40)
+    assert cache.stats()["entries_in_memory"] == 2 and cache.stats()["bytes_in_memory"] == 80
+
+
+def test_replacing_a_value_updates_the_byte_count():
+    cache = StageCache(max_bytes=100)
+    cache.put("ml", "v1", "a", text(60))
+    cache.put("ml", "v1", "a", text(10))
+    cache.put("ml", "v1", "b", text(60))
+    assert cache.stats()["bytes_in_memory"] == 70
+    assert cache.get("ml", "v1", "a") == text(10)
+
+
+def test_oversize_value_is_not_held_in_memory():
+    cache = StageCache(max_bytes=100)
+    cache.put("ml", "v1", "small", text(50))
+    cache.put("heatmap", "v1", "huge", text(101))
+    # Keeping it would have evicted everything else
+    assert cache.get("ml", "v1", "small") == text(50)
+    assert cache.get("heatmap", "v1", "huge") is MISS
+    assert cache.stats()["bytes_in_memory"] == 50
+
+
+def test_sqlite_keeps_what_memory_evicts(tmp_path):
+    path = str(tmp_path / "stages.db")
+    cache = StageCache(max_entries=3, max_bytes=100, path=path)
+    values = {f"d{i}": {"score": float(i), "pad": text(20)} for i in range(6)}
+    for digest, value in values.items():
+        cache.put("ml", "v1", digest, value)
+    cache.put("heatmap", "v1", "huge", text(500))
+    assert cache.stats()["entries_in_memory"] <= 3 and cache.stats()["bytes_in_memory"] <= 100
+
+    # Evicted and oversize values come back from the file, in this process and the next
+    assert cache.get("ml", "v1", "d0") == values["d0"]
+    assert cache.get("heatmap", "v1", "huge") == text(500)
+    reopened = StageCache(max_entries=3, max_bytes=100, path=path)
+    for digest, value in values.items():
+        assert reopened.get("ml", "v1", digest) == value
+    assert reopened.stats()["entries_in_memory"] <= 3 and reopened.stats()["bytes_in_memory"] <= 100
+    assert reopened.stats()["stages"]["ml"] == {"hits": 6, "misses": 0}
+
+
+def test_version_bump_misses(tmp_path):
+    cache = StageCache(path=str(tmp_path / "stages.db"))
+    cache.put("clip", "v1", "a", 42.0)
+    assert cache.get("clip", "v2", "a") is MISS
+    assert cache.get("clip", "v1", "a") == 42.0
+
+
+def test_memoize_caches_falsy_values_and_honours_the_veto():
+    cache = StageCache()
+    calls = []
+
+    def compute(value):
+        def run():
+            calls.append(value)
+            return value
+        return run
+
+    assert cache.memoize("exif", "v1", "a", compute(None)) is None
+    assert cache.memoize("exif", "v1", "a", compute("recomputed")) is None
+    assert cache.memoize("ml", "v1", "a", compute(-1.0), cacheable=lambda v: v >= 0) == -1.0
+    assert cache.memoize("ml", "v1", "a", compute(12.0), cacheable=lambda v: v >= 0) == 12.0
+    assert calls == [None, -1.0, 12.0]
+
+
+def test_disabled_without_memory_or_file():
+    cache = StageCache(max_entries=0)
+    cache.put("ml", "v1", "a", 1.0)
+    assert not cache.enabled and cache.get("ml", "v1", "a") is MISS
+
+
+# ── ResultCache ───────────────────────────────────────────────────────────────
+
+def image(seed: int, fmt: str = "PNG", size: int = 64) -> DecodedImage:
+    rng = np.random.default_rng(seed)
+    pixels = (rng.random((8, 8, 3)) * 255).astype(np.uint8)
+    buf = io.BytesIO()
+    Image.fromarray(pixels).resize((size, size), Image.BILINEAR).save(buf, format=fmt)
+    return DecodedImage(buf.getvalue())
+
+
+def result(n: int) -> dict:
+    return {"verdict": "LIKELY REAL", "heatmap": text(n)}
+
+
+def test_result_byte_budget_evicts_oldest():
+    size = approx_size(result(100))
+    cache = ResultCache(max_bytes=2 * size + 10)
+    images = [image(i) for i in range(3)]
+    for img in images:
+        cache.put(img, "v1", "a.png", result(100))
+    assert cache.get(images[0], "v1", "a.png") is None
+    assert cache.get(images[2], "v1", "a.png")["cache"] == "exact"
+    stats = cache.stats()
+    assert stats["entries"] == 2 and stats["bytes"] == 2 * size and stats["evictions"] == 1
+
+
+def test_result_max_entries():
+    cache = ResultCache(max_entries=2)
+    images = [image(i) for i in range(3)]
+    for img in images:
+        cache.put(img, "v1", "a.png", result(1))
+    assert cache.get(images[0], "v1", "a.png") is None
+    assert cache.stats()["entries"] == 2
+
+
+def test_oversize_result_is_not_cached():
+    cache = ResultCache(max_bytes=200)
+    small, big = image(0), image(1)
+    cache.put(small, "v1", "a.png", result(10))
+    cache.put(big, "v1", "b.png", result(500))
+    assert cache.get(big, "v1", "b.png") is None
+    assert cache.get(small, "v1", "a.png") is not None
+    assert cache.stats()["evictions"] == 0
+
+
+def test_results_are_scoped_to_version_and_filename():
+    cache = ResultCache()
+    img = image(0)
+    cache.put(img, "v1", "a.png", result(1))
+    assert cache.get(img, "v2", "a.png") is None
+    assert cache.get(img, "v1", "b.png") is None
+    assert cache.get(img, "v1", "a.png") == {**result(1), "cache": "exact"}
+
+
+def test_perceptual_match_is_opt_in():
+    original, reencoded = image(0), image(0, fmt="JPEG", size=96)
+    assert original.sha256 != reencoded.sha256
+
+    exact_only = ResultCache()
+    exact_only.put(original, "v1", "a.png", result(1))
+    assert exact_only.get(reencoded, "v1", "a.png") is None
+
+    near = ResultCache(max_distance=6)
+    near.put(original, "v1", "a.png", result(1))
+    assert near.get(reencoded, "v1", "a.png")["cache"] == "perceptual"
+    assert near.get(reencoded, "v1", "other.png") is None
+    assert near.get(image(99), "v1", "a.png") is None
+
+
+def test_undecodable_upload_is_a_miss():
+    cache = ResultCache(max_distance=6)
+    cache.put(image(0), "v1", "a.png", result(1))
+    assert cache.get(DecodedImage(b"not an image"), "v1", "a.png") is None
+    assert cache.stats()["misses"] == 1
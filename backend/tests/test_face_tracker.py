@@ -0,0 +1,134 @@
+import numpy as np
+import pytest
+
+pytest.importorskip("insightface")   # face_tracker imports face_extractor, which needs it
+
+from models.face_extractor import CROP_PAD
+from models.face_tracker import FaceTracker, iou
+
+H, W, SIDE = 240, 320, 40
+
+
+def patch(seed: int) -> np.ndarray:
+    """A textured square that template matching can lock onto — a stand-in for a face."""
+    return np.random.default_rng(seed).integers(0, 256, (SIDE, SIDE, 3), dtype=np.uint8)
+
+
+FACES = {seed: patch(seed) for seed in range(4)}
+
+
+def render(faces: dict) -> np.ndarray:
+    """A smooth background with each {seed: (x, y)} face patch pasted at (x, y)."""
+    frame = np.tile(np.linspace(60, 120, W, dtype=np.uint8)[None, :, None], (H, 1, 3))
+    for seed, (x, y) in faces.items():
+        frame[y:y + SIDE, x:x + SIDE] = FACES[seed]
+    return frame
+
+
+class StubDetector:
+    """Reports the faces the current frame was rendered with; records which frames it saw."""
+
+    def __init__(self):
+        self.faces = {}
+        self.calls = 0
+        self.order = None   # optional detection order, e.g. to shuffle two faces
+
+    def __call__(self, rgb: np.ndarray) -> list:
+        self.calls += 1
+        seeds = self.order or list(self.faces)
+        return [{"bbox": (float(x), float(y), float(x + SIDE), float(y + SIDE)), "score": 0.9, "kps": []}
+                for x, y in (self.faces[seed] for seed in seeds if seed in self.faces)]
+
+
+def feed(tracker: FaceTracker, detector: StubDetector, faces: dict) -> list:
+    detector.faces = faces
+    return tracker.update(render(faces))
+
+
+def test_detects_only_on_keyframes_and_tracks_in_between():
+    detector = StubDetector()
+    tracker = FaceTracker(keyframe_interval=5, detect=detector)
+    for i in range(11):
+        x, y = 100 + 2 * i, 80 + i          # slow diagonal motion
+        [face] = feed(tracker, detector, {0: (x, y)})
+        assert face["track_id"] == 1
+        assert face["detected"] == (i % 5 == 0)
+        # The tracked box follows the motion between keyframes
+        assert abs(face["bbox"]["x1"] - (x - CROP_PAD)) <= 1 and abs(face["bbox"]["y1"] - (y - CROP_PAD)) <= 1
+        assert face["confidence"] >= 90
+    assert detector.calls == 3
+    assert tracker.stats() == {"frames": 11, "detections": 3, "tracked_frames": 8}
+
+
+def test_redetects_every_frame_while_nothing_is_tracked():
+    detector = StubDetector()
+    tracker = FaceTracker(keyframe_interval=10, detect=detector)
+    for _ in range(3):
+        assert feed(tracker, detector, {}) == []
+    assert detector.calls == 3
+
+    [face] = feed(tracker, detector, {0: (50, 50)})   # a face walks in between keyframes
+    assert face["detected"] and face["track_id"] == 1
+    feed(tracker, detector, {0: (51, 50)})
+    assert detector.calls == 4
+
+
+def test_face_leaving_resumes_per_frame_detection():
+    detector = StubDetector()
+    tracker = FaceTracker(keyframe_interval=3, detect=detector)
+    for _ in range(3):
+        feed(tracker, detector, {0: (50, 50)})
+    assert feed(tracker, detector, {}) == []           # keyframe: the face is gone
+    feed(tracker, detector, {})
+    feed(tracker, detector, {})
+    assert detector.calls == 4
+
+
+def test_lost_track_is_redetected_at_once():
+    detector = StubDetector()
+    tracker = FaceTracker(keyframe_interval=10, detect=detector)
+    feed(tracker, detector, {0: (50, 50)})
+    feed(tracker, detector, {0: (52, 50)})
+    assert detector.calls == 1
+
+    # A different face appears far from the old one — the template no longer matches
+    [face] = feed(tracker, detector, {1: (250, 180)})
+    assert face["detected"] and detector.calls == 2
+    assert face["track_id"] == 2                       # no overlap with track 1, so a new identity
+
+
+def test_iou_association_keeps_identities_across_keyframes():
+    detector = StubDetector()
+    tracker = FaceTracker(keyframe_interval=2, detect=detector)
+    first = feed(tracker, detector, {0: (40, 40), 1: (200, 120)})
+    ids = {(f["bbox"]["x1"] + CROP_PAD): f["track_id"] for f in first}
+    assert sorted(ids.values()) == [1, 2]
+
+    feed(tracker, detector, {0: (44, 42), 1: (196, 122)})
+    # Keyframe: the detector reports the faces in the other order, and a third one appears
+    detector.order = [2, 1, 0]
+    observed = feed(tracker, detector, {0: (48, 44), 1: (192, 124), 2: (120, 10)})
+    assert all(f["detected"] for f in observed)
+    by_position = {f["bbox"]["x1"] + CROP_PAD: f["track_id"] for f in observed}
+    assert by_position == {48: ids[40], 192: ids[200], 120: 3}
+
+    # Face 0 leaves at the next keyframe — its track ends, the others keep their ids
+    detector.order = None
+    feed(tracker, detector, {1: (190, 124), 2: (120, 12)})
+    observed = feed(tracker, detector, {1: (188, 124), 2: (120, 14)})
+    assert sorted(f["track_id"] for f in observed) == sorted([ids[200], 3])
+
+
+def test_detector_errors_count_as_no_faces():
+    def broken(rgb):
+        raise RuntimeError("onnx session died")
+
+    tracker = FaceTracker(detect=broken)
+    assert tracker.update(render({0: (50, 50)})) == []
+    assert tracker.stats()["detections"] == 1
+
+
+def test_iou():
+    assert iou((0, 0, 10, 10), (0, 0, 10, 10)) == 1.0
+    assert iou((0, 0, 10, 10), (5, 0, 15, 10)) == pytest.approx(50 / 150)
+    assert iou((0, 0, 10, 10), (20, 20, 30, 30)) == 0.0
@@ -0,0 +1,71 @@
+import io
+import os
+import cv2
+import numpy as np
+import pytest
+from PIL import Image
+from models.decoded_image import DecodedImage
+from models.frequency import frequency_analysis
+from tests.frequency_reference import frequency_analysis as reference_analysis
+
+# Score points (0-100) the rewrite may drift from the reference implementation
+TOLERANCE = 0.5
+
+SIZES = [(224, 224), (511, 513), (1080, 1920), (3000, 4000), (4000, 6000)]   # up to 24MP
+PATTERNS = ["noise", "blurred_noise", "gradient", "checkerboard", "periodic"]
+SAMPLE = os.path.join(os.path.dirname(__file__), "..", "..", "test", "REal.webp")
+
+
+def synthetic(pattern: str, height: int, width: int) -> np.ndarray:
+    """HxWx3 uint8 test image — seeded, so every run scores the same pixels."""
+    rng = np.random.default_rng(height * 10007 + width)
+    y, x = np.mgrid[0:height, 0:width]
+    if pattern == "noise":
+        return rng.integers(0, 256, (height, width, 3), dtype=np.uint8)
+    if pattern == "blurred_noise":
+        return cv2.GaussianBlur(synthetic("noise", height, width), (0, 0), 3)
+    if pattern == "gradient":
+        gray = (x / width * 200 + y / height * 55).astype(np.uint8)
+    elif pattern == "checkerboard":
+        # Periodic 8px grid — the kind of artifact the FFT term looks for
+        gray = (((x // 8 + y // 8) % 2) * 180 + 30).astype(np.uint8)
+    else:
+        gray = (127 + 100 * np.sin(x / 3.0) * np.cos(y / 5.0)).astype(np.uint8)
+    return np.dstack([gray] * 3)
+
+
+@pytest.mark.parametrize("height,width", SIZES, ids=[f"{h}x{w}" for h, w in SIZES])
+@pytest.mark.parametrize("pattern", PATTERNS)
+def test_matches_reference(pattern, height, width):
+    pixels = synthetic(pattern, height, width)
+    expected = reference_analysis(DecodedImage.from_array(pixels))
+    actual = frequency_analysis(DecodedImage.from_array(pixels))
+    assert actual == pytest.approx(expected, abs=TOLERANCE)
+
+
+@pytest.mark.parametrize("fmt", ["JPEG", "PNG"])
+def test_matches_reference_on_encoded_uploads(fmt):
+    # Uploads arrive as encoded bytes — same comparison through the decode path
+    buf = io.BytesIO()
+    Image.fromarray(cv2.GaussianBlur(synthetic("noise", 1200, 1600), (0, 0), 1.5)).save(buf, format=fmt)
+    data = buf.getvalue()
+    assert frequency_analysis(data) == pytest.approx(reference_analysis(data), abs=TOLERANCE)
+
+
+@pytest.mark.skipif(not os.path.exists(SAMPLE), reason="sample image not present")
+def test_matches_reference_on_sample_photo():
+    with open(SAMPLE, "rb") as f:
+        data = f.read()
+    assert frequency_analysis(data) == pytest.approx(reference_analysis(data), abs=TOLERANCE)
+
+
+def test_odd_tile_sizes_match_full_spectrum():
+    # The half-spectrum bookkeeping must hold for odd widths/heights as well
+    from models import frequency
+    for size in (511, 512, 513):
+        tile = synthetic("noise", size, size)[:, :, 0].astype(np.float32)
+        magnitude = np.fft.fftshift(np.log1p(np.abs(np.fft.fft2(tile))))
+        c = size // 2
+        r = frequency.CENTER_RADIUS
+        expected = magnitude[c - r:c + r, c - r:c + r].sum() / magnitude.sum()
+        assert frequency._fft_center_ratio(tile) == pytest.approx(expected, rel=1e-6)
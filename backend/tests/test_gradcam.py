@@ -0,0 +1,62 @@
+import numpy as np
+import pytest
+
+torch = pytest.importorskip("torch")
+transformers = pytest.importorskip("transformers")
+
+from models.decoded_image import DecodedImage
+from models.gradcam import GradCamEngine, explain_image, generate_heatmap
+
+
+def tiny_vit():
+    torch.manual_seed(0)
+    config = transformers.ViTConfig(
+        image_size=32, patch_size=8, hidden_size=32, num_hidden_layers=2, num_attention_heads=2,
+        intermediate_size=64, num_labels=2,
+    )
+    return transformers.ViTForImageClassification(config).eval()
+
+
+def pixels() -> torch.Tensor:
+    return torch.randn(1, 3, 32, 32, generator=torch.Generator().manual_seed(0))
+
+
+def test_shared_detector_parameters_are_left_alone():
+    model = tiny_vit()
+    engine = GradCamEngine(model)
+    assert engine.shared and engine.model is model
+    assert all(p.requires_grad for p in model.parameters())
+
+    cam, probs = engine.explain(pixels(), class_idx=1)
+    assert cam.size > 1 and 0 <= cam.min() and cam.max() <= 1
+    assert probs.sum().item() == pytest.approx(1.0)
+    # autograd.grad on the captured activation never fills weight .grad buffers
+    assert all(p.grad is None for p in model.parameters())
+
+
+def test_private_copy_is_frozen_and_the_source_is_not():
+    model = tiny_vit().half()
+    engine = GradCamEngine(model)
+    assert not engine.shared and engine.model is not model
+    assert not any(p.requires_grad for p in engine.model.parameters())
+    assert all(p.requires_grad for p in model.parameters())
+    cam = engine.generate(pixels(), class_idx=0)
+    assert np.isfinite(cam).all()
+
+
+def transform(pil) -> torch.Tensor:
+    array = np.asarray(pil.resize((32, 32)), dtype=np.float32) / 127.5 - 1
+    return torch.from_numpy(array).permute(2, 0, 1)
+
+
+def test_heatmap_explains_the_class_it_is_given():
+    model = tiny_vit()
+    rgb = np.random.default_rng(0).integers(0, 256, (48, 64, 3), dtype=np.uint8)
+    image = DecodedImage.from_array(rgb)
+
+    heatmap = generate_heatmap(model, transform, None, image, class_idx=1)
+    _, fused_heatmap = explain_image(model, transform, image, class_idx=1)
+    assert heatmap.startswith("data:image/jpeg;base64,")
+    # Same class as the fused pass — and not the default label 0
+    assert heatmap == fused_heatmap
+    assert heatmap != generate_heatmap(model, transform, None, image, class_idx=0)
@@ -0,0 +1,134 @@
+import pytest
+import jobs
+from jobs import DONE, ERROR, PENDING, RUNNING, MemoryJobStore, SQLiteJobStore, create_job_store
+
+
+class Clock:
+    """Stands in for the time module in jobs — advances only when told to."""
+
+    def __init__(self):
+        self.now = 1_000_000.0
+
+    def time(self) -> float:
+        return self.now
+
+    def tick(self, seconds: float = 1.0):
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = Clock()
+    monkeypatch.setattr(jobs, "time", fake)
+    return fake
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def make_store(request, tmp_path):
+    def make(ttl_seconds: float = 60, max_entries: int = 100):
+        if request.param == "sqlite":
+            return SQLiteJobStore(str(tmp_path / "jobs.db"), ttl_seconds, max_entries)
+        return MemoryJobStore(ttl_seconds, max_entries)
+    return make
+
+
+def test_lifecycle(make_store, clock):
+    store = make_store()
+    assert store.get("missing") is None
+    store.create("a")
+    assert store.get("a")["status"] == PENDING
+    clock.tick()
+    store.update("a", RUNNING)
+    clock.tick()
+    store.update("a", DONE, result={"verdict": "LIKELY REAL", "scores": [1.5, 2]})
+    job = store.get("a")
+    assert job["status"] == DONE and job["error"] is None
+    assert job["result"] == {"verdict": "LIKELY REAL", "scores": [1.5, 2]}
+    assert job["created_at"] == clock.now - 2 and job["updated_at"] == clock.now
+
+    store.update("b", ERROR, error="decode failed")   # no create() first
+    assert store.get("b")["error"] == "decode failed"
+
+
+def test_ttl_counts_from_the_last_update(make_store, clock):
+    store = make_store(ttl_seconds=10)
+    store.create("old")
+    store.create("busy")
+    clock.tick(8)
+    store.update("busy", RUNNING)
+    clock.tick(5)
+    assert store.get("old") is None
+    assert store.get("busy")["status"] == RUNNING
+    clock.tick(11)
+    assert store.get("busy") is None
+
+
+def test_expired_jobs_are_evicted_on_write(make_store, clock):
+    store = make_store(ttl_seconds=10)
+    for job_id in ("a", "b", "c"):
+        store.create(job_id)
+    clock.tick(11)
+    store.create("d")
+    assert store.stats()["jobs"] == 1 and store.stats()["evicted"] == 3
+
+
+@pytest.mark.parametrize("write", ["create", "update"])
+def test_max_entries_evicts_the_oldest(make_store, clock, write):
+    store = make_store(max_entries=3)
+    for job_id in ("a", "b", "c", "d", "e"):
+        if write == "create":
+            store.create(job_id)
+        else:
+            store.update(job_id, RUNNING)
+        clock.tick()
+    assert store.stats()["jobs"] == 3 and store.stats()["evicted"] == 2
+    assert store.get("a") is None and store.get("b") is None
+    assert all(store.get(job_id) for job_id in ("c", "d", "e"))
+
+
+def test_update_keeps_a_job_from_eviction(make_store, clock):
+    store = make_store(max_entries=2)
+    store.create("a")
+    clock.tick()
+    store.create("b")
+    clock.tick()
+    store.update("a", RUNNING)   # a is now the most recently written
+    clock.tick()
+    store.create("c")
+    assert store.get("a") is not None and store.get("b") is None
+
+
+def test_memory_store_get_counts_as_use(clock):
+    store = MemoryJobStore(ttl_seconds=60, max_entries=2)
+    store.create("a")
+    store.create("b")
+    store.get("a")
+    store.create("c")
+    assert store.get("a") is not None and store.get("b") is None
+
+
+def test_sqlite_store_survives_a_restart(tmp_path, clock):
+    path = str(tmp_path / "jobs.db")
+    store = SQLiteJobStore(path)
+    store.create("a")
+    store.update("a", DONE, result={"faces": [{"score": 91.0}]})
+    store._conn.close()
+
+    reopened = SQLiteJobStore(path)
+    assert reopened.get("a")["result"] == {"faces": [{"score": 91.0}]}
+    # A second process sees writes from the first
+    other = SQLiteJobStore(path)
+    reopened.update("b", RUNNING)
+    assert other.get("b")["status"] == RUNNING
+    assert other.stats() == {"backend": "sqlite", "path": path, "jobs": 2, "evicted": 0}
+
+
+def test_create_job_store_from_env(monkeypatch, tmp_path):
+    assert isinstance(create_job_store(), MemoryJobStore)
+    monkeypatch.setenv("TRUTHLENS_JOB_STORE", "SQLite")
+    monkeypatch.setenv("TRUTHLENS_JOB_DB", str(tmp_path / "env.db"))
+    monkeypatch.setenv("TRUTHLENS_JOB_TTL", "5")
+    monkeypatch.setenv("TRUTHLENS_JOB_MAX", "7")
+    store = create_job_store()
+    assert isinstance(store, SQLiteJobStore)
+    assert (store.path, store.ttl, store.max_entries) == (str(tmp_path / "env.db"), 5.0, 7)
@@ -0,0 +1,169 @@
+import asyncio
+import json
+import time
+import httpx
+import pytest
+from agent import agent
+from agent.agent import VerdictCache, fallback_verdict, run_agent
+from agent.llm import LLMClient, LLMError
+
+
+def completion(content: str) -> httpx.Response:
+    return httpx.Response(200, json={"choices": [{"message": {"content": content}}]})
+
+
+class Server:
+    """MockTransport handler that answers each request with the next scripted response."""
+
+    def __init__(self, *responses):
+        self.responses = list(responses)
+        self.requests = []
+        self.times = []
+
+    def __call__(self, request: httpx.Request) -> httpx.Response:
+        self.requests.append(json.loads(request.content))
+        self.times.append(time.perf_counter())
+        response = self.responses.pop(0)
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+
+def client_for(server: Server, **kwargs) -> LLMClient:
+    kwargs = {"api_key": "", "timeout": 5, "retries": 2, "backoff": 0.01, **kwargs}
+    return LLMClient(base_url="http://llm.test/v1", transport=httpx.MockTransport(server), **kwargs)
+
+
+def chat(client: LLMClient, **kwargs) -> str:
+    async def main():
+        try:
+            return await client.chat([{"role": "user", "content": "hi"}], **kwargs)
+        finally:
+            await client.aclose()
+    return asyncio.run(main())
+
+
+def test_success_returns_the_first_choice():
+    server = Server(completion("hello"))
+    client = client_for(server, model="test-model")
+    assert chat(client) == "hello"
+    assert server.requests[0]["model"] == "test-model"
+    assert client.stats() == {"calls": 1, "retries": 0, "failures": 0}
+
+
+def test_429_waits_as_long_as_retry_after_asks():
+    server = Server(httpx.Response(429, headers={"Retry-After": "0.2"}, text="slow down"), completion("ok"))
+    client = client_for(server, backoff=0)
+    assert chat(client) == "ok"
+    assert server.times[1] - server.times[0] >= 0.2
+    assert client.stats() == {"calls": 1, "retries": 1, "failures": 0}
+
+
+def test_5xx_and_transport_errors_are_retried():
+    server = Server(httpx.Response(503), httpx.ConnectError("refused"), completion("ok"))
+    client = client_for(server)
+    assert chat(client) == "ok"
+    assert len(server.requests) == 3
+    assert client.stats()["retries"] == 2
+
+
+def test_gives_up_after_the_last_retry():
+    server = Server(*(httpx.Response(500, text="boom") for _ in range(3)))
+    client = client_for(server, retries=2)
+    with pytest.raises(LLMError, match="HTTP 500: boom"):
+        chat(client)
+    assert len(server.requests) == 3
+    assert client.stats() == {"calls": 1, "retries": 2, "failures": 1}
+
+
+def test_client_errors_are_not_retried():
+    server = Server(httpx.Response(401, text="bad key"), completion("never"))
+    client = client_for(server)
+    with pytest.raises(LLMError, match="HTTP 401"):
+        chat(client)
+    assert len(server.requests) == 1
+
+
+def test_retry_after_past_the_deadline_gives_up_at_once():
+    server = Server(httpx.Response(429, headers={"Retry-After": "30"}), completion("too late"))
+    client = client_for(server, timeout=1)
+    started = time.perf_counter()
+    with pytest.raises(LLMError, match="HTTP 429"):
+        chat(client)
+    assert time.perf_counter() - started < 0.5
+    assert len(server.requests) == 1
+
+
+def test_backoff_stops_at_the_per_call_deadline():
+    server = Server(*(httpx.Response(502) for _ in range(10)))
+    client = client_for(server, retries=9, backoff=0.1)
+    started = time.perf_counter()
+    with pytest.raises(LLMError):
+        chat(client, timeout=0.5)
+    assert time.perf_counter() - started < 0.6
+    # 0.05-0.1s, 0.1-0.2s, 0.2-0.4s backoffs — the fourth would overrun the deadline
+    assert 2 <= len(server.requests) <= 4
+
+
+def test_stream_retries_until_the_first_delta():
+    events = "".join(f"data: {json.dumps({'choices': [{'delta': {'content': text}}]})}\n\n"
+                     for text in ("Hel", "lo")) + "data: [DONE]\n\n"
+    server = Server(httpx.Response(503), httpx.Response(200, text=events))
+    client = client_for(server)
+
+    async def main():
+        try:
+            return [delta async for delta in client.stream([{"role": "user", "content": "hi"}])]
+        finally:
+            await client.aclose()
+
+    assert asyncio.run(main()) == ["Hel", "lo"]
+    assert server.requests[1]["stream"] is True
+    assert client.stats()["retries"] == 1
+
+
+# ── run_agent with the real client ────────────────────────────────────────────
+
+VERDICT = {"verdict": "LIKELY REAL", "confidence": 80, "summary": "a.jpg looks fine", "reasoning": ["ok"]}
+SIGNALS = {"efficientnet_score": 20.0, "clip_score": 20.0, "freq_score": 20.0, "ensemble_score": 20.0,
+           "exif": {}, "search_results": [], "filename": "a.jpg"}
+
+
+@pytest.fixture
+def server(monkeypatch):
+    """Routes agent.get_client() to a MockTransport client and empties the verdict cache."""
+    scripted = Server()
+    monkeypatch.setattr(agent, "get_client", lambda: client_for(scripted, retries=0))
+    monkeypatch.setattr(agent, "verdict_cache", VerdictCache())
+    return scripted
+
+
+def test_fallback_verdicts_are_never_cached(server):
+    server.responses = [httpx.Response(500), completion("not json at all"), completion(json.dumps(VERDICT))]
+    assert asyncio.run(run_agent(SIGNALS)) == fallback_verdict(20.0)
+    assert asyncio.run(run_agent(SIGNALS)) == fallback_verdict(20.0)
+    assert agent.verdict_cache.stats()["entries"] == 0
+
+    assert asyncio.run(run_agent(SIGNALS)) == VERDICT
+    assert asyncio.run(run_agent(SIGNALS)) == VERDICT   # served from the cache
+    assert len(server.requests) == 3
+    assert agent.verdict_cache.stats()["entries"] == 1
+
+
+def test_verdict_cache_keys_on_the_filename():
+    cache = VerdictCache()
+    cache.put(cache.key(SIGNALS), VERDICT)
+    assert cache.get(cache.key({**SIGNALS, "ensemble_score": 20.3})) == VERDICT   # same rounded scores
+    assert cache.get(cache.key({**SIGNALS, "filename": "b.jpg"})) is None
+    assert cache.get(cache.key({**SIGNALS, "ensemble_score": 60.0})) is None
+
+
+def test_verdict_cache_evicts_least_recently_used():
+    cache = VerdictCache(max_entries=2)
+    keys = [cache.key({**SIGNALS, "filename": name}) for name in ("a", "b", "c")]
+    cache.put(keys[0], VERDICT)
+    cache.put(keys[1], VERDICT)
+    cache.get(keys[0])
+    cache.put(keys[2], VERDICT)
+    assert cache.get(keys[1]) is None
+    assert cache.get(keys[0]) == VERDICT and cache.get(keys[2]) == VERDICT
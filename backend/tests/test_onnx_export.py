@@ -0,0 +1,121 @@
+import argparse
+import os
+import numpy as np
+import pytest
+
+pytest.importorskip("onnxruntime")
+pytest.importorskip("onnx")
+torch = pytest.importorskip("torch")
+transformers = pytest.importorskip("transformers")
+
+import export
+from models import runtime
+from models.clip_classifier import FAKE_PROMPTS, REAL_PROMPTS, _embeds
+
+# Tracing the HF models warns about shape checks frozen into the graph — harmless here
+pytestmark = pytest.mark.filterwarnings("ignore::torch.jit.TracerWarning", "ignore:Exporting aten::index")
+
+# Eager FP32 vs ORT on the same inputs — well inside export.py check's 0.5-point default
+SCORE_TOLERANCE = 0.05
+
+
+@pytest.fixture
+def onnx_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(runtime, "ONNX_DIR", str(tmp_path))
+    return tmp_path
+
+
+def tiny_vit():
+    torch.manual_seed(0)
+    config = transformers.ViTConfig(
+        image_size=32, patch_size=8, hidden_size=32, num_hidden_layers=2, num_attention_heads=2,
+        intermediate_size=64, num_labels=2, id2label={0: "human", 1: "artificial"},
+        label2id={"human": 0, "artificial": 1},
+    )
+    return transformers.ViTForImageClassification(config).eval()
+
+
+def tiny_clip():
+    torch.manual_seed(0)
+    config = transformers.CLIPConfig(
+        text_config={"vocab_size": 64, "hidden_size": 32, "intermediate_size": 64, "num_hidden_layers": 2,
+                     "num_attention_heads": 2, "max_position_embeddings": 16},
+        vision_config={"image_size": 32, "patch_size": 8, "hidden_size": 32, "intermediate_size": 64,
+                       "num_hidden_layers": 2, "num_attention_heads": 2},
+        projection_dim=16,
+    )
+    return transformers.CLIPModel(config).eval()
+
+
+def pixels(batch: int) -> torch.Tensor:
+    return torch.randn(batch, 3, 32, 32, generator=torch.Generator().manual_seed(batch))
+
+
+def prompts(length: int) -> tuple:
+    """Token ids for every real and fake prompt, padded to `length` and ended by the EOS id (2)."""
+    rng = np.random.default_rng(length)
+    count = len(REAL_PROMPTS) + len(FAKE_PROMPTS)
+    ids = rng.integers(3, 64, (count, length))
+    mask = np.ones_like(ids)
+    for row, size in enumerate(rng.integers(2, length + 1, count)):
+        ids[row, size - 1] = 2
+        ids[row, size:] = 0
+        mask[row, size:] = 0
+    return torch.from_numpy(ids), torch.from_numpy(mask)
+
+
+def test_detector_parity(onnx_dir):
+    model = tiny_vit()
+    export._export(export.DetectorLogits(model), (pixels(2),), runtime.artifact_path("detector"),
+                   ["pixel_values"], ["logits"], {"pixel_values": {0: "batch"}, "logits": {0: "batch"}})
+    session = runtime.load_session("detector")
+
+    fake_idx = export._fake_idx(model)
+    assert fake_idx == 1
+    for batch in (1, 5):   # the batch axis is dynamic
+        inputs = pixels(batch)
+        with torch.no_grad():
+            eager = model(pixel_values=inputs).logits
+        onnx = torch.from_numpy(session.run(["logits"], {"pixel_values": inputs.numpy()})[0])
+        assert onnx.shape == eager.shape
+        assert torch.allclose(onnx, eager, atol=1e-4)
+        drift = np.abs(export._fake_scores(eager, fake_idx) - export._fake_scores(onnx, fake_idx))
+        assert drift.max() < SCORE_TOLERANCE
+
+
+def test_clip_parity(onnx_dir):
+    model = tiny_clip()
+    export._export(export.ClipVision(model), (pixels(2),), runtime.artifact_path("clip_vision"),
+                   ["pixel_values"], ["image_embeds"],
+                   {"pixel_values": {0: "batch"}, "image_embeds": {0: "batch"}})
+    export._export(export.ClipText(model), prompts(8), runtime.artifact_path("clip_text"),
+                   ["input_ids", "attention_mask"], ["text_embeds", "logit_scale"],
+                   {"input_ids": {0: "batch", 1: "sequence"}, "attention_mask": {0: "batch", 1: "sequence"},
+                    "text_embeds": {0: "batch"}})
+    vision = runtime.load_session("clip_vision")
+    text = runtime.load_session("clip_text")
+
+    images = pixels(3)
+    input_ids, attention_mask = prompts(6)   # the sequence axis is dynamic too
+    with torch.no_grad():
+        eager_image = _embeds(model.get_image_features(pixel_values=images))
+        eager_text = _embeds(model.get_text_features(input_ids=input_ids, attention_mask=attention_mask))
+        eager_scale = model.logit_scale.exp().item()
+    onnx_image = torch.from_numpy(vision.run(["image_embeds"], {"pixel_values": images.numpy()})[0])
+    onnx_text, onnx_scale = text.run(["text_embeds", "logit_scale"], {
+        "input_ids": input_ids.numpy(), "attention_mask": attention_mask.numpy()})
+    onnx_text = torch.from_numpy(onnx_text)
+
+    assert export._cosine(eager_image, onnx_image) > 0.9999
+    assert export._cosine(eager_text, onnx_text) > 0.9999
+    assert float(onnx_scale) == pytest.approx(eager_scale, rel=1e-5)
+    drift = np.abs(export._clip_scores(eager_image, eager_text, eager_scale)
+                   - export._clip_scores(onnx_image, onnx_text, float(onnx_scale)))
+    assert drift.max() < SCORE_TOLERANCE
+
+
+@pytest.mark.skipif(any(not os.path.exists(runtime.artifact_path(name)) for name in runtime.ONNX_ARTIFACTS),
+                    reason="no exported artifacts — run `python export.py onnx` first")
+def test_exported_artifacts_match_eager_models():
+    # The real artifacts against the real (downloaded) models — `python export.py check`
+    export.check(argparse.Namespace(images=None, samples=4, tolerance=0.5))
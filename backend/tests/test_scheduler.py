@@ -0,0 +1,174 @@
+import asyncio
+import inspect
+import threading
+import time
+import pytest
+from scheduler import Overloaded, Scheduler, StagePool
+
+
+def small(max_active: int = 1, max_queued: int = 1) -> Scheduler:
+    return Scheduler(model_workers=1, cpu_workers=1, io_workers=1,
+                     max_active=max_active, max_queued=max_queued)
+
+
+def jobs(scheduler: Scheduler) -> dict:
+    return scheduler.stats()["jobs"]
+
+
+async def job(release: asyncio.Event, running: list = None):
+    if running is not None:
+        running.append(1)
+    await release.wait()
+    if running is not None:
+        running.pop()
+    return "done"
+
+
+def test_admits_up_to_active_plus_queued_then_rejects():
+    async def main():
+        scheduler = small(max_active=1, max_queued=1)
+        release = asyncio.Event()
+        first = scheduler.submit(job(release))
+        second = scheduler.submit(job(release))
+        assert scheduler.full()
+
+        rejected = job(release)
+        with pytest.raises(Overloaded):
+            scheduler.submit(rejected)
+        # Closed on reject, so it never warns "coroutine was never awaited"
+        assert inspect.getcoroutinestate(rejected) == inspect.CORO_CLOSED
+
+        await asyncio.sleep(0)
+        assert jobs(scheduler)["active"] == 1 and jobs(scheduler)["queued"] == 1
+        release.set()
+        assert await asyncio.gather(first, second) == ["done", "done"]
+        assert not scheduler.full()
+        return jobs(scheduler)
+
+    stats = asyncio.run(main())
+    assert stats["admitted"] == 2 and stats["rejected"] == 1
+    assert stats["active"] == 0 and stats["queued"] == 0
+
+
+def test_never_runs_more_than_max_active():
+    async def main():
+        scheduler = small(max_active=2, max_queued=10)
+        running, peak = [], 0
+        release = asyncio.Event()
+        tasks = [scheduler.submit(job(release, running)) for _ in range(6)]
+        for _ in range(5):
+            await asyncio.sleep(0)
+            peak = max(peak, len(running))
+        assert jobs(scheduler)["queued"] == 4
+        release.set()
+        await asyncio.gather(*tasks)
+        return peak
+
+    assert asyncio.run(main()) == 2
+
+
+def test_cancelled_jobs_give_their_slot_back():
+    async def main():
+        scheduler = small(max_active=1, max_queued=2)
+        release = asyncio.Event()
+        running = scheduler.submit(job(release))
+        waiting_coro = job(release)
+        waiting = scheduler.submit(waiting_coro)
+        await asyncio.sleep(0)           # `waiting` is now blocked on the slot
+        unstarted_coro = job(release)
+        unstarted = scheduler.submit(unstarted_coro)
+        unstarted.cancel()               # cancelled before its task ever ran
+        waiting.cancel()
+        await asyncio.gather(waiting, unstarted, return_exceptions=True)
+
+        assert jobs(scheduler)["queued"] == 0
+        assert inspect.getcoroutinestate(waiting_coro) == inspect.CORO_CLOSED
+        assert inspect.getcoroutinestate(unstarted_coro) == inspect.CORO_CLOSED
+
+        running.cancel()                 # cancelled while holding the slot
+        await asyncio.gather(running, return_exceptions=True)
+        assert jobs(scheduler)["active"] == 0
+
+        # Every slot is free again
+        release.set()
+        results = await asyncio.gather(*(scheduler.submit(job(release)) for _ in range(3)))
+        return results, jobs(scheduler)
+
+    results, stats = asyncio.run(main())
+    assert results == ["done"] * 3
+    assert stats["active"] == 0 and stats["queued"] == 0
+
+
+def test_slot_waits_instead_of_rejecting():
+    async def main():
+        scheduler = small(max_active=1, max_queued=0)
+        release = asyncio.Event()
+        scheduler.submit(job(release))
+        assert scheduler.full()
+        order = []
+
+        async def accepted(name):
+            async with scheduler.slot():
+                order.append(name)
+
+        waiters = [asyncio.create_task(accepted(n)) for n in ("a", "b")]
+        await asyncio.sleep(0)
+        assert jobs(scheduler)["queued"] == 2 and order == []
+        waiters[0].cancel()
+        await asyncio.sleep(0)
+        assert jobs(scheduler)["queued"] == 1
+
+        release.set()
+        await asyncio.gather(*waiters, return_exceptions=True)
+        return order, jobs(scheduler)
+
+    order, stats = asyncio.run(main())
+    assert order == ["b"]
+    assert stats["active"] == 0 and stats["queued"] == 0 and stats["rejected"] == 0
+
+
+def test_stage_pool_bounds_threads_and_counts_the_queue():
+    async def main():
+        pool = StagePool("test", workers=2)
+        threads, peak, lock = set(), [0, 0], threading.Lock()
+
+        def work(x):
+            with lock:
+                peak[0] += 1
+                peak[1] = max(peak[1], peak[0])
+                threads.add(threading.get_ident())
+            time.sleep(0.02)
+            with lock:
+                peak[0] -= 1
+            return x * 2
+
+        results = await asyncio.gather(*(pool.run(work, i) for i in range(8)))
+        stats = pool.stats()
+        pool.shutdown()
+        return results, peak[1], len(threads), stats
+
+    results, peak, threads, stats = asyncio.run(main())
+    assert results == [i * 2 for i in range(8)]
+    assert peak == 2 and threads <= 2
+    assert stats["completed"] == 8 and stats["queued"] == 0 and stats["running"] == 0
+    assert stats["peak_queued"] >= 6
+
+
+def test_stage_pool_cancelled_call_leaves_the_queue():
+    async def main():
+        pool = StagePool("test", workers=1)
+        gate = threading.Event()
+        busy = asyncio.ensure_future(pool.run(gate.wait, 5))
+        queued = asyncio.ensure_future(pool.run(lambda: "never"))
+        await asyncio.sleep(0.05)
+        assert pool.stats()["queued"] == 1
+        queued.cancel()
+        await asyncio.gather(queued, return_exceptions=True)
+        gate.set()
+        await busy
+        stats = pool.stats()
+        pool.shutdown()
+        return stats
+
+    stats = asyncio.run(main())
+    assert stats["queued"] == 0 and stats["completed"] == 1
@@ -0,0 +1,96 @@
+import asyncio
+import time
+import pytest
+from stage_graph import StageGraph
+
+STEP = 0.05   # seconds per stub stage — large enough to tell serial from overlapped
+
+
+def stage(name: str, log: list, seconds: float = STEP, value=None):
+    async def run(inputs):
+        log.append(("start", name, sorted(inputs)))
+        await asyncio.sleep(seconds)
+        log.append(("end", name))
+        return value if value is not None else {dep: result for dep, result in inputs.items()} or name
+    return run
+
+
+def pipeline_graph(log: list) -> StageGraph:
+    """The image pipeline's shape: face → ml, frequency and exif → reverse alongside, agent last."""
+    graph = StageGraph()
+    graph.add("face", stage("face", log))
+    graph.add("ml", stage("ml", log, 2 * STEP), after=("face",))
+    graph.add("frequency", stage("frequency", log))
+    graph.add("exif", stage("exif", log, STEP / 5))
+    graph.add("reverse", stage("reverse", log), after=("exif",))
+    graph.add("agent", stage("agent", log, STEP / 5), after=("ml", "frequency", "reverse"))
+    return graph
+
+
+def test_stage_starts_after_its_dependencies_with_their_results():
+    log = []
+    results, _ = asyncio.run(pipeline_graph(log).run())
+    position = {(event[0], event[1]): i for i, event in enumerate(log)}
+    for name, deps in [("ml", ["face"]), ("reverse", ["exif"]), ("agent", ["ml", "frequency", "reverse"])]:
+        for dep in deps:
+            assert position[("end", dep)] < position[("start", name)]
+    assert ("start", "agent", ["frequency", "ml", "reverse"]) in log
+    assert results["ml"] == {"face": "face"}
+    assert set(results) == {"face", "ml", "frequency", "exif", "reverse", "agent"}
+
+
+def test_independent_stages_overlap():
+    started = time.perf_counter()
+    _, timings = asyncio.run(pipeline_graph([]).run())
+    elapsed = time.perf_counter() - started
+    serial = STEP * (1 + 2 + 1 + 0.2 + 1 + 0.2)
+    # face+ml (3 steps) bound the run; frequency and exif→reverse hide behind them
+    assert elapsed < serial * 0.75
+    stages = timings["stages"]
+    assert stages["frequency"]["start_ms"] < stages["face"]["end_ms"]
+    assert stages["reverse"]["start_ms"] < stages["ml"]["end_ms"]
+
+
+def test_critical_path_follows_the_last_finishing_dependency():
+    _, timings = asyncio.run(pipeline_graph([]).run())
+    assert timings["critical_path"] == ["face", "ml", "agent"]
+    stages = timings["stages"]
+    assert {name for name, s in stages.items() if s["critical"]} == {"face", "ml", "agent"}
+    assert stages["ml"]["duration_ms"] == pytest.approx(2 * STEP * 1000, abs=40)
+    assert timings["total_ms"] == pytest.approx(stages["agent"]["end_ms"])
+    for s in stages.values():
+        assert s["end_ms"] == pytest.approx(s["start_ms"] + s["duration_ms"], abs=0.2)
+
+
+def test_failure_cancels_the_rest_and_propagates():
+    log, cancelled = [], []
+
+    async def broken(inputs):
+        await asyncio.sleep(STEP / 5)
+        raise RuntimeError("detector crashed")
+
+    async def slow(inputs):
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.append("slow")
+            raise
+
+    graph = StageGraph()
+    graph.add("face", broken)
+    graph.add("ml", stage("ml", log), after=("face",))
+    graph.add("reverse", slow)
+
+    started = time.perf_counter()
+    with pytest.raises(RuntimeError, match="detector crashed"):
+        asyncio.run(graph.run())
+    assert time.perf_counter() - started < 1
+    assert cancelled == ["slow"]
+    assert not any(event[1] == "ml" for event in log)   # a dependent of the failure never starts
+
+
+def test_unknown_dependency_is_rejected():
+    graph = StageGraph()
+    graph.add("face", stage("face", []))
+    with pytest.raises(ValueError, match="unknown stage"):
+        graph.add("ml", stage("ml", []), after=("face", "detector"))
@@ -0,0 +1,87 @@
+import json
+import pytest
+from agent.agent import VerdictStream, parse_verdict
+
+VERDICT = {
+    "verdict": "LIKELY AI GENERATED",
+    "confidence": 82,
+    "summary": 'The "portrait" shows café-style lighting — 😀 smooth skin\nand a \\ warped ear.',
+    "reasoning": [
+        "CLIP at 91% agrees with the CNN",
+        'Frequency énergie "spikes" at 8px',
+        "",
+        "No EXIF — expected for WebP \U0001F50D",
+    ],
+}
+
+
+def replies() -> list:
+    """The same verdict as an LLM might write it — pretty, fenced, \\u-escaped, compact."""
+    return [
+        json.dumps(VERDICT, indent=2),
+        "```json\n" + json.dumps(VERDICT, indent=2) + "\n```",
+        json.dumps(VERDICT),                       # every non-ASCII char as \uXXXX (surrogate pairs too)
+        json.dumps(VERDICT, ensure_ascii=False),
+        json.dumps(VERDICT, separators=(",", ":")),
+    ]
+
+
+def stream(text: str, size: int = 1) -> dict:
+    """Feeds `text` in `size`-character chunks; returns the concatenated deltas per slot."""
+    verdict_stream = VerdictStream()
+    out = {}
+    for start in range(0, len(text), size):
+        for delta in verdict_stream.feed(text[start:start + size]):
+            slot = (delta["field"], delta.get("index"))
+            out[slot] = out.get(slot, "") + delta["text"]
+    assert verdict_stream.text == text
+    return out
+
+
+@pytest.mark.parametrize("size", [1, 2, 3, 7])
+@pytest.mark.parametrize("reply", range(len(replies())))
+def test_deltas_rebuild_the_parsed_values(reply, size):
+    text = replies()[reply]
+    expected = parse_verdict(text)
+    out = stream(text, size)
+    assert out[("summary", None)] == expected["summary"]
+    steps = [out.get(("reasoning", i), "") for i in range(len(expected["reasoning"]))]
+    assert steps == expected["reasoning"]
+    assert len([slot for slot in out if slot[0] == "reasoning"]) <= len(expected["reasoning"])
+
+
+def test_escape_split_across_chunks():
+    text = '{"summary": "say \\"hi\\" \\u00e9t\\u00e9 \\ud83d\\ude00 done", "reasoning": []}'
+    expected = json.loads(text)["summary"]
+    cut = text.index("\\u00e9") + 3      # mid-escape: '\\u0' | '0e9'
+    out = stream(text[:cut], len(text))
+    assert expected.startswith(out[("summary", None)])
+    assert out[("summary", None)] == 'say "hi" '
+
+    verdict_stream = VerdictStream()
+    pieces = [text[:cut], text[cut:text.index("\\ude00") + 2], text[text.index("\\ude00") + 2:]]
+    summary = ""
+    for piece in pieces:
+        summary += "".join(d["text"] for d in verdict_stream.feed(piece) if d["field"] == "summary")
+    assert summary == expected
+
+
+def test_every_delta_is_final_text():
+    """A delta is never revised — each one is a prefix extension of the value so far."""
+    text = json.dumps(VERDICT)
+    verdict_stream = VerdictStream()
+    seen = ""
+    for ch in text:
+        for delta in verdict_stream.feed(ch):
+            if delta["field"] == "summary":
+                seen += delta["text"]
+                assert VERDICT["summary"].startswith(seen)
+    assert seen == VERDICT["summary"]
+
+
+def test_nothing_before_the_field_is_open():
+    verdict_stream = VerdictStream()
+    assert verdict_stream.feed('{"verdict": "LIKELY REAL", "confidence": 7') == []
+    assert verdict_stream.feed('0, "summary"') == []
+    assert verdict_stream.feed(': "') == []
+    assert verdict_stream.feed("Re") == [{"field": "summary", "text": "Re"}]
@@ -0,0 +1,74 @@
+import pytest
+from ensemble import compute_ensemble
+from models.video import SUSPICIOUS_FRAME_SCORE, aggregate_timeline
+
+LOW, HIGH = 20.0, 85.0
+
+
+def frame(i: int, score: float, spread: float = 0.0) -> dict:
+    """A sampled frame every 0.5s; the detector reads a little higher than CLIP and frequency."""
+    return {
+        "time": i * 0.5,
+        "efficientnet_score": score + spread,
+        "clip_score": score,
+        "frequency_score": score - spread,
+        "ensemble": score,
+    }
+
+
+def clip(length: int = 40, run: range = range(24, 27), spike: int = 5) -> list:
+    """A long real-looking clip with one short manipulated run and one noisy single frame."""
+    scores = [LOW] * length
+    for i in run:
+        scores[i] = HIGH
+    scores[spike] = 95.0
+    return [frame(i, score, spread=4.0) for i, score in enumerate(scores)]
+
+
+def test_short_high_run_sets_the_peak_window():
+    summary = aggregate_timeline(clip(), window=3)
+    window = summary["peak_window"]
+    assert (window["start_time"], window["end_time"], window["frames"]) == (12.0, 13.0, 3)
+    assert window["ensemble"] == HIGH
+    assert window["efficientnet_score"] == HIGH + 4 and window["frequency_score"] == HIGH - 4
+
+    # The whole-clip mean dilutes the run below the suspicious line; the window does not
+    assert summary["ensemble"]["mean"] < SUSPICIOUS_FRAME_SCORE < window["ensemble"]
+    assert summary["frames_analyzed"] == 40
+    assert summary["suspicious_share"] == pytest.approx(4 / 40)
+
+
+def test_clip_ensemble_comes_from_the_peak_window():
+    # run_video_pipeline scores the clip on the window's per-signal means
+    summary = aggregate_timeline(clip(), window=3)
+    window = summary["peak_window"]
+    clip_ensemble = compute_ensemble(window["efficientnet_score"], window["clip_score"], window["frequency_score"])
+    whole_clip = compute_ensemble(summary["efficientnet_score"]["mean"], summary["clip_score"]["mean"],
+                                  summary["frequency_score"]["mean"])
+    assert whole_clip < SUSPICIOUS_FRAME_SCORE < clip_ensemble
+    assert clip_ensemble == pytest.approx(HIGH, abs=1)
+
+
+def test_one_noisy_frame_cannot_carry_the_window():
+    summary = aggregate_timeline(clip(), window=3)
+    assert summary["peak_time"] == 2.5            # the single 95 frame is still the peak frame
+    assert summary["ensemble"]["max"] == 95.0
+    assert summary["peak_window"]["start_time"] == 12.0
+
+
+def test_window_of_one_is_the_peak_frame():
+    window = aggregate_timeline(clip(), window=1)["peak_window"]
+    assert (window["start_time"], window["end_time"], window["ensemble"]) == (2.5, 2.5, 95.0)
+
+
+def test_window_longer_than_the_clip_covers_every_frame():
+    timeline = [frame(i, score) for i, score in enumerate([10.0, 40.0, 70.0])]
+    summary = aggregate_timeline(timeline, window=8)
+    window = summary["peak_window"]
+    assert (window["start_time"], window["end_time"], window["frames"]) == (0.0, 1.0, 3)
+    assert window["ensemble"] == summary["ensemble"]["mean"] == 40.0
+
+
+def test_empty_timeline_raises():
+    with pytest.raises(ValueError, match="No frames"):
+        aggregate_timeline([])
@@ -0,0 +1,71 @@
+import io
+import os
+import tarfile
+import zipfile
+
+# Archive members with these extensions are analyzed; everything else is skipped
+IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".webp", ".bmp", ".gif", ".tif", ".tiff"}
+
+
+def is_image_name(name: str) -> bool:
+    return os.path.splitext(name)[1].lower() in IMAGE_EXTENSIONS
+
+
+def _source(data):
+    """Archives arrive as bytes (uploads) or as a path on disk (bulk CLI)."""
+    return io.BytesIO(data) if isinstance(data, (bytes, bytearray)) else data
+
+
+def _is_tar(data) -> bool:
+    try:
+        if isinstance(data, (bytes, bytearray)):
+            with tarfile.open(fileobj=io.BytesIO(data), mode="r:*"):
+                return True
+        return tarfile.is_tarfile(data)
+    except (tarfile.TarError, EOFError, OSError):
+        return False
+
+
+def is_archive(data) -> bool:
+    """Zip or (optionally compressed) tar — sniffed from content, not the filename."""
+    return zipfile.is_zipfile(_source(data)) or _is_tar(data)
+
+
+def iter_archive_images(data, max_files: int = 1000, max_bytes: int = 2 * 1024**3):
+    """
+    Yields (member_name, image_bytes) for every image inside a zip/tar archive,
+    given as bytes or a file path. Members are read one at a time, so a large
+    archive on disk is never held in memory whole. Stops with ValueError past
+    `max_files` images or `max_bytes` uncompressed — a guard against archive bombs.
+    """
+    count = 0
+    total = 0
+
+    def check(size: int):
+        nonlocal count, total
+        count += 1
+        total += size
+        if count > max_files:
+            raise ValueError(f"Archive holds more than {max_files} images")
+        if total > max_bytes:
+            raise ValueError(f"Archive expands past {max_bytes // 1024**2}MB")
+
+    if zipfile.is_zipfile(_source(data)):
+        with zipfile.ZipFile(_source(data)) as zf:
+            for info in zf.infolist():
+                if info.is_dir() or not is_image_name(info.filename):
+                    continue
+                check(info.file_size)
+                yield info.filename, zf.read(info)
+        return
+
+    if isinstance(data, (bytes, bytearray)):
+        tf = tarfile.open(fileobj=io.BytesIO(data), mode="r:*")
+    else:
+        tf = tarfile.open(name=data, mode="r|*")   # streaming — no member index in memory
+    with tf:
+        for member in tf:
+            if not member.isfile() or not is_image_name(member.name):
+                continue
+            check(member.size)
+            yield member.name, tf.extractfile(member).read()
@@ -1,13 +1,12 @@
-import io
-from PIL import Image
 from PIL.ExifTags import TAGS
+from models.decoded_image import as_decoded
 
 # These formats almost never carry EXIF — web platforms strip it before serving.
 # Flagging these as "suspicious for no EXIF" causes false positives on real web images.
 _EXIF_OPTIONAL_FORMATS = {"WEBP", "PNG", "GIF", "BMP", "TIFF"}
 
 
-def extract_exif(image_bytes: bytes) -> dict:
+def extract_exif(image) -> dict:
     """
     Extracts EXIF metadata from image.
     Stripped EXIF is a signal of manipulation for JPEG camera photos,
@@ -20,11 +19,11 @@ def extract_exif(image_bytes: bytes) -> dict:
         camera, software, date_taken, gps, raw — standard EXIF fields
     """
     try:
-        image = Image.open(io.BytesIO(image_bytes))
-        fmt = (image.format or "").upper()
+        image = as_decoded(image)
+        fmt = image.format
         exif_optional = fmt in _EXIF_OPTIONAL_FORMATS
 
-        exif_data = image._getexif()
+        exif_data = image.exif
         if not exif_data:
             return {
                 "stripped": True,
@@ -2,14 +2,23 @@
 
 import { Terminal } from "lucide-react";
 
-export default function AgentLog({ reasoning }: { reasoning: string[] }) {
+export default function AgentLog({ reasoning, summary, streaming = false }: {
+  reasoning: string[];
+  summary?: string;
+  streaming?: boolean;
+}) {
   return (
     <div className="rounded border border-[#00ff46]/15 bg-black p-6 space-y-4 font-mono">
       <div className="flex items-center gap-2 border-b border-[#00ff46]/10 pb-3">
         <Terminal className="w-4 h-4 text-[#00ff46]" />
         <h2 className="text-xs text-[#00ff46]/60 uppercase tracking-widest">Agent Reasoning Chain</h2>
-        <span className="ml-auto text-xs text-white/20">{reasoning.length} steps</span>
+        <span className="ml-auto text-xs text-white/20">
+          {streaming ? "streaming..." : `${reasoning.length} steps`}
+        </span>
       </div>
+      {summary && (
+        <p className="text-white/50 leading-relaxed font-sans text-xs">{summary}</p>
+      )}
       <div className="space-y-2">
         {reasoning.map((step, i) => (
           <div key={i} className="flex gap-3 text-sm group">
@@ -18,6 +27,7 @@ export default function AgentLog({ reasoning }: { reasoning: string[] }) {
             </span>
             <p className="text-[#00ff46]/60 leading-relaxed group-hover:text-[#00ff46]/80 transition-colors font-sans text-xs">
               {step}
+              {streaming && i === reasoning.length - 1 && <span className="animate-pulse">▍</span>}
             </p>
           </div>
         ))}
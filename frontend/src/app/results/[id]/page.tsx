@@ -45,6 +45,8 @@ export default function ResultsPage() {
     const [steps,setSteps] = useState<AnalysisStep[]>(INITIAL_STEPS);
     const [ result,setResult] = useState<AnalysisResult | null>(null);
     const [connected,setConnected] = useState(false)
+    // Agent summary / reasoning streamed in before the result arrives
+    const [live,setLive] = useState<{summary:string; reasoning:string[]}>({summary:"",reasoning:[]})
 
 
 
@@ -65,6 +67,22 @@ export default function ResultsPage() {
             if(msg.type === "result"){
                 setResult(msg.data)
             }
+
+            if(msg.type === "agent_delta"){
+                setLive((prev) => {
+                    if(msg.field === "summary"){
+                        return {...prev, summary: prev.summary + msg.text}
+                    }
+                    const reasoning = [...prev.reasoning]
+                    reasoning[msg.index] = (reasoning[msg.index] ?? "") + msg.text
+                    return {...prev, reasoning}
+                })
+            }
+
+            // Fast-path follow-ups (heatmap, search results, agent reasoning) after an early result
+            if(msg.type === "result_update"){
+                setResult((prev) => (prev ? {...prev, ...msg.data} : prev))
+            }
         }
 
 
@@ -109,6 +127,11 @@ export default function ResultsPage() {
         {/* Progress Steps */}
         <AnalysisProgress steps={steps} />
 
+        {/* Agent reasoning as it streams in — replaced by the final result */}
+        {!iscomplete && (live.summary || live.reasoning.length > 0) && (
+          <AgentLog reasoning={live.reasoning} summary={live.summary} streaming />
+        )}
+
         {/* Results — shown once complete */}
         {iscomplete && result && (
           <>